@@ -0,0 +1,68 @@
+from django.contrib import admin
+
+from .models import (
+    ArchivedChatMessage, ArchivedCoreMessage, ArchivedOrder, ArchivedOrderItem,
+    ArchivedPayment, ArchiveRun,
+)
+
+
+class ReadOnlyArchiveAdmin(admin.ModelAdmin):
+    """Archived rows are history: browsable, never edited by hand."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedCoreMessage)
+class ArchivedCoreMessageAdmin(ReadOnlyArchiveAdmin):
+    list_display = ("id", "sender", "receiver", "product", "timestamp", "read")
+    list_filter = ("timestamp",)
+    list_select_related = ("sender", "receiver", "product")
+    search_fields = ("=id", "sender__username", "receiver__username")
+
+
+@admin.register(ArchivedChatMessage)
+class ArchivedChatMessageAdmin(ReadOnlyArchiveAdmin):
+    list_display = ("id", "session_id", "sender", "timestamp", "read")
+    list_filter = ("timestamp",)
+    list_select_related = ("sender",)
+    search_fields = ("=id", "sender__username")
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ReadOnlyArchiveAdmin):
+    list_display = ("id", "user", "status", "total_price", "created_at", "archived_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("=id", "user__username")
+    inlines = [ArchivedOrderItemInline]
+
+
+@admin.register(ArchivedPayment)
+class ArchivedPaymentAdmin(ReadOnlyArchiveAdmin):
+    list_display = ("id", "user", "order_id", "amount", "status", "reference", "created_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("=id", "reference", "user__username")
+
+
+@admin.register(ArchiveRun)
+class ArchiveRunAdmin(ReadOnlyArchiveAdmin):
+    list_display = (
+        "table", "cutoff", "moved", "hot_rows_before", "hot_rows_after",
+        "started_at", "finished_at",
+    )
+    list_filter = ("table",)
@@ -0,0 +1,53 @@
+# archive/lookups.py
+"""
+Read helpers that fall back to the archive, so pages that look up old
+records by id keep working after the rows have moved out of the hot tables.
+"""
+from django.db.models import Q
+from django.http import Http404
+
+from cart.models import Order
+from payments.models import Payment
+
+from .models import ArchivedChatMessage, ArchivedCoreMessage, ArchivedOrder, ArchivedPayment
+
+
+def get_order_or_404(user, order_id):
+    order = Order.objects.filter(id=order_id, user=user).first()
+    if order is None:
+        order = ArchivedOrder.objects.filter(id=order_id, user=user).first()
+    if order is None:
+        raise Http404("Order not found")
+    return order
+
+
+def hot_orders(user):
+    return Order.objects.filter(user=user).order_by("-created_at")
+
+
+def orders_for(user):
+    """The user's orders, newest first: hot ones, then the archived (older) ones."""
+    return list(hot_orders(user)) + list(ArchivedOrder.objects.filter(user=user).order_by("-created_at"))
+
+
+def get_payment(**lookup):
+    """A payment from the hot table or the archive; None if neither has it."""
+    return Payment.objects.filter(**lookup).first() or ArchivedPayment.objects.filter(**lookup).first()
+
+
+def archived_conversation(user, product):
+    """The user's archived messages about `product`, oldest first (all of them were read)."""
+    return list(
+        ArchivedCoreMessage.objects.filter(product=product)
+        .filter(Q(sender=user) | Q(receiver=user))
+        .select_related("sender", "receiver")
+        .order_by("id")
+    )
+
+
+def archived_session_messages(session, before=None, limit=None):
+    """A chat session's archived messages, newest first, older than message id `before`."""
+    qs = ArchivedChatMessage.objects.filter(session_id=session.id).select_related("sender").order_by("-id")
+    if before:
+        qs = qs.filter(id__lt=before)
+    return list(qs[:limit] if limit else qs)
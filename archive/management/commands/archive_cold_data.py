@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from archive.tiering import SESSION_TABLE, TIERS, archive_table, get_tier, purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Move rows older than the archive horizon out of the hot message, order and "
+        "payment tables in resumable batches, and purge expired sessions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Horizon in days (default: ARCHIVE_HORIZON_DAYS).")
+        parser.add_argument("--batch-size", type=int, help="Rows per transaction (default: ARCHIVE_BATCH_SIZE).")
+        parser.add_argument("--max-batches", type=int, help="Stop after this many batches per table; rerun to resume.")
+        parser.add_argument(
+            "--table", action="append", dest="tables",
+            help=f"Only these tables (repeatable): {', '.join([t.table for t in TIERS] + [SESSION_TABLE])}",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = None
+        if options["days"] is not None:
+            if options["days"] < 1:
+                raise CommandError("--days must be at least 1")
+            cutoff = timezone.now() - timedelta(days=options["days"])
+
+        tables = options["tables"] or [t.table for t in TIERS] + [SESSION_TABLE]
+
+        for table in tables:
+            if table == SESSION_TABLE:
+                run = purge_expired_sessions(options["batch_size"])
+            else:
+                try:
+                    tier = get_tier(table)
+                except KeyError:
+                    raise CommandError(f"Unknown table: {table}")
+                run = archive_table(tier, cutoff, options["batch_size"], options["max_batches"])
+            self._report(run)
+
+    def _report(self, run):
+        if run.finished_at is None:
+            self.stdout.write(self.style.WARNING(
+                f"{run.table}: moved {run.moved} rows so far (stopped at id {run.last_pk}, rerun to resume)"
+            ))
+            return
+
+        shrink = run.hot_rows_before - run.hot_rows_after
+        line = f"{run.table}: moved {run.moved} rows, {run.hot_rows_before} -> {run.hot_rows_after} hot rows"
+        if run.hot_rows_before:
+            line += f" (-{shrink * 100 / run.hot_rows_before:.1f}%)"
+        if run.hot_bytes_before is not None and run.hot_bytes_after is not None:
+            line += f", {run.hot_bytes_before // 1024} -> {run.hot_bytes_after // 1024} KiB"
+        self.stdout.write(self.style.SUCCESS(line))
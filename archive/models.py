@@ -0,0 +1,123 @@
+from django.contrib.auth.models import User
+from django.db import models
+
+from core.models import Order as CoreOrder, Product
+from chat.models import ChatSession
+
+
+# Archived rows keep their original primary keys and column values so old
+# records can still be looked up by id. Foreign keys into hot tables are not
+# enforced by the database (db_constraint=False): the archive must never block
+# deletes elsewhere.
+def _cold_fk(to, **kwargs):
+    return models.ForeignKey(
+        to, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+", **kwargs
+    )
+
+
+class ArchivedModel(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+
+# ---------- MESSAGES ----------
+class ArchivedCoreMessage(ArchivedModel):
+    """Cold copy of core.Message (buyer/seller product conversations)."""
+    sender = _cold_fk(User)
+    receiver = _cold_fk(User)
+    product = _cold_fk(Product, null=True, blank=True)
+    content = models.TextField()
+    timestamp = models.DateTimeField()
+    read = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["timestamp"]
+
+    def __str__(self):
+        return f"{self.sender} → {self.receiver} (archived)"
+
+
+class ArchivedChatMessage(ArchivedModel):
+    """Cold copy of chat.Message."""
+    session = _cold_fk(ChatSession)
+    sender = _cold_fk(User)
+    content = models.TextField()
+    timestamp = models.DateTimeField()
+    read = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["timestamp"]
+
+    def __str__(self):
+        return f"Message by {self.sender_id} at {self.timestamp} (archived)"
+
+
+# ---------- ORDERS ----------
+class ArchivedOrder(ArchivedModel):
+    """Cold copy of cart.Order; its items move with it."""
+    user = _cold_fk(User)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20)
+
+    is_archived = True
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Order #{self.id} (archived)"
+
+
+class ArchivedOrderItem(ArchivedModel):
+    order = models.ForeignKey(ArchivedOrder, related_name="items", on_delete=models.CASCADE)
+    product = _cold_fk(Product)
+    quantity = models.PositiveIntegerField(default=1)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def total_price(self):
+        return self.price * self.quantity
+
+    def __str__(self):
+        return f"{self.product_id} × {self.quantity} (archived)"
+
+
+# ---------- PAYMENTS ----------
+class ArchivedPayment(ArchivedModel):
+    """Cold copy of payments.Payment."""
+    user = _cold_fk(User)
+    order = _cold_fk(CoreOrder, null=True, blank=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=20)
+    reference = models.CharField(max_length=100, db_index=True)
+    created_at = models.DateTimeField()
+
+    is_archived = True
+
+    def __str__(self):
+        return f"Payment #{self.id} ({self.status}, archived)"
+
+
+# ---------- BOOKKEEPING ----------
+class ArchiveRun(models.Model):
+    """One archival pass over one hot table; the cursor lets an interrupted pass resume."""
+    table = models.CharField(max_length=50, db_index=True)
+    cutoff = models.DateTimeField()
+    last_pk = models.BigIntegerField(default=0)
+    moved = models.PositiveIntegerField(default=0)
+    hot_rows_before = models.PositiveBigIntegerField(null=True, blank=True)
+    hot_rows_after = models.PositiveBigIntegerField(null=True, blank=True)
+    hot_bytes_before = models.PositiveBigIntegerField(null=True, blank=True)
+    hot_bytes_after = models.PositiveBigIntegerField(null=True, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"{self.table} before {self.cutoff:%Y-%m-%d} ({self.moved} rows)"
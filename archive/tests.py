@@ -0,0 +1,94 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cart.models import Order, OrderItem
+from chat.lookups import get_session
+from chat.models import Message as ChatMessage
+from chat.views import _latest_messages
+from core.messaging import sync_conversation
+from core.models import Category, Message, Product
+from payments.models import Payment
+
+from .lookups import get_payment, orders_for
+from .models import ArchivedCoreMessage, ArchivedOrder, ArchivedPayment
+from .tiering import archive_table, get_tier
+
+
+def archive(model):
+    """Move every archivable row of `model` to the archive."""
+    return archive_table(get_tier(model._meta.db_table), cutoff=timezone.now() + timedelta(days=1))
+
+
+class ArchiveLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyer = User.objects.create_user("buyer", password="pw")
+        self.seller = User.objects.create_user("seller", password="pw")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            category=category, name="Phone", description="", base_price=Decimal("100"), approved=True
+        )
+        self.client.force_login(self.buyer)
+
+    def test_archived_orders_are_still_shown(self):
+        old = Order.objects.create(user=self.buyer, total_price=Decimal("200"), status="paid")
+        OrderItem.objects.create(order=old, product=self.product, quantity=2, price=Decimal("100"))
+        archive(Order)
+        new = Order.objects.create(user=self.buyer, total_price=Decimal("100"), status="pending")
+
+        self.assertTrue(ArchivedOrder.objects.filter(pk=old.pk).exists())
+        self.assertEqual([o.pk for o in orders_for(self.buyer)], [new.pk, old.pk])
+        response = self.client.get(reverse("cart:order_detail", args=[old.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse("cart:order_history")).status_code, 200)
+
+    def test_someone_elses_archived_order_is_a_404(self):
+        order = Order.objects.create(user=self.seller, total_price=Decimal("100"), status="paid")
+        archive(Order)
+        self.assertEqual(self.client.get(reverse("cart:order_detail", args=[order.pk])).status_code, 404)
+
+    @mock.patch("payments.views.requests.get")
+    def test_replayed_callback_for_an_archived_payment_changes_nothing(self, verify):
+        Payment.objects.create(user=self.buyer, amount=Decimal("100"), status="FAILED", reference="ref-1")
+        archive(Payment)
+
+        self.assertIsInstance(get_payment(reference="ref-1"), ArchivedPayment)
+        response = self.client.get(reverse("payments:dpo_callback"), {"merchant_reference": "ref-1"})
+        self.assertRedirects(response, reverse("cart:cart_detail"), fetch_redirect_response=False)
+        verify.assert_not_called()
+        self.assertFalse(Payment.objects.exists())
+
+    def test_full_sync_includes_archived_messages(self):
+        old = Message.objects.create(
+            sender=self.seller, receiver=self.buyer, product=self.product, content="old", read=True
+        )
+        archive(Message)
+        new = Message.objects.create(sender=self.seller, receiver=self.buyer, product=self.product, content="new")
+
+        self.assertTrue(ArchivedCoreMessage.objects.filter(pk=old.pk).exists())
+        messages, read_ids, _ = sync_conversation(self.buyer, self.product)
+        self.assertEqual([m.id for m in messages], [old.pk, new.pk])
+        self.assertEqual(read_ids, [new.pk])
+        self.assertEqual([m.id for m in sync_conversation(self.buyer, self.product, since=old.pk)[0]], [new.pk])
+
+    @override_settings(CHAT_PAGE_SIZE=2)
+    def test_chat_history_pages_across_the_archive(self):
+        session = get_session(self.buyer, self.product)
+        ids = [
+            ChatMessage.objects.create(session_id=session.id, sender=self.buyer, content=str(i), read=True).id
+            for i in range(3)
+        ]
+        archive(ChatMessage)
+        ids.append(ChatMessage.objects.create(session_id=session.id, sender=self.seller, content="3").id)
+
+        page, has_more = _latest_messages(session)
+        self.assertEqual(([m.id for m in page], has_more), (ids[2:], True))
+        page, has_more = _latest_messages(session, before=ids[2])
+        self.assertEqual(([m.id for m in page], has_more), (ids[:2], False))
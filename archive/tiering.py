@@ -0,0 +1,174 @@
+# archive/tiering.py
+"""
+Hot/cold tiering: move rows older than a horizon out of the hot tables into
+the archive tables, one committed batch at a time.
+
+Every batch copies the rows (and their children) into the archive and deletes
+them from the hot table inside one transaction, then advances the run's
+cursor, so an interrupted run can be resumed without losing or double-moving
+anything.
+"""
+import contextvars
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import connection, transaction
+from django.utils import timezone
+
+from cart.models import Order, OrderItem
+from chat.models import Message as ChatMessage
+from core.models import Message as CoreMessage
+from payments.models import Payment
+
+from .models import (
+    ArchivedChatMessage, ArchivedCoreMessage, ArchivedOrder, ArchivedOrderItem,
+    ArchivedPayment, ArchiveRun,
+)
+
+
+class Tier:
+    """How one hot table is archived."""
+
+    def __init__(self, model, archive_model, date_field, filters=None, children=()):
+        self.model = model
+        self.archive_model = archive_model
+        self.date_field = date_field
+        self.filters = filters or {}
+        # (hot child model, archive child model, fk attname pointing at the parent)
+        self.children = children
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+    def cold_rows(self, cutoff):
+        return self.model.objects.filter(
+            **{f"{self.date_field}__lt": cutoff}, **self.filters
+        ).order_by("pk")
+
+
+TIERS = [
+    # unread messages stay hot so unread counts never need the archive
+    Tier(CoreMessage, ArchivedCoreMessage, "timestamp", filters={"read": True}),
+    Tier(ChatMessage, ArchivedChatMessage, "timestamp", filters={"read": True}),
+    Tier(Order, ArchivedOrder, "created_at", children=[(OrderItem, ArchivedOrderItem, "order_id")]),
+    # pending payments may still get a gateway callback
+    Tier(Payment, ArchivedPayment, "created_at", filters={"status__in": ["SUCCESS", "FAILED"]}),
+]
+
+SESSION_TABLE = Session._meta.db_table
+
+# True while a batch deletes the rows it has just copied, so post_delete
+# receivers can tell a move to the archive from a real delete
+archiving = contextvars.ContextVar("archiving", default=False)
+
+
+def get_tier(table):
+    for tier in TIERS:
+        if tier.table == table:
+            return tier
+    raise KeyError(table)
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=settings.ARCHIVE_HORIZON_DAYS)
+
+
+def _copy(obj, archive_model):
+    return archive_model(**{f.attname: getattr(obj, f.attname) for f in obj._meta.concrete_fields})
+
+
+def table_size(table):
+    """(rows, bytes) for a table; bytes is only known on Postgres."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+        rows = cursor.fetchone()[0]
+        size = None
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+            size = cursor.fetchone()[0]
+    return rows, size
+
+
+def _move_batch(tier, batch, run):
+    ids = [obj.pk for obj in batch]
+    with transaction.atomic():
+        tier.archive_model.objects.bulk_create(
+            [_copy(obj, tier.archive_model) for obj in batch], ignore_conflicts=True
+        )
+        token = archiving.set(True)
+        try:
+            for child_model, archive_child, parent_attname in tier.children:
+                children = child_model.objects.filter(**{f"{parent_attname}__in": ids})
+                archive_child.objects.bulk_create(
+                    [_copy(child, archive_child) for child in children], ignore_conflicts=True
+                )
+                children.delete()
+            tier.model.objects.filter(pk__in=ids).delete()
+        finally:
+            archiving.reset(token)
+
+        run.last_pk = ids[-1]
+        run.moved += len(ids)
+        run.save(update_fields=["last_pk", "moved"])
+
+
+def archive_table(tier, cutoff=None, batch_size=None, max_batches=None):
+    """
+    Archive one table. Resumes the table's last unfinished run if there is one
+    (keeping that run's cutoff), otherwise starts a new run at `cutoff`.
+    """
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+
+    run = ArchiveRun.objects.filter(table=tier.table, finished_at__isnull=True).first()
+    if run is None:
+        rows, size = table_size(tier.table)
+        run = ArchiveRun.objects.create(
+            table=tier.table,
+            cutoff=cutoff or default_cutoff(),
+            hot_rows_before=rows,
+            hot_bytes_before=size,
+        )
+
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batch = list(tier.cold_rows(run.cutoff).filter(pk__gt=run.last_pk)[:batch_size])
+        if not batch:
+            rows, size = table_size(tier.table)
+            run.hot_rows_after = rows
+            run.hot_bytes_after = size
+            run.finished_at = timezone.now()
+            run.save(update_fields=["hot_rows_after", "hot_bytes_after", "finished_at"])
+            break
+        _move_batch(tier, batch, run)
+        batches += 1
+
+    return run
+
+
+def purge_expired_sessions(batch_size=None):
+    """
+    Expired sessions are dead data, so they are deleted rather than archived.
+    Returns an ArchiveRun describing the purge.
+    """
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    now = timezone.now()
+    rows, size = table_size(SESSION_TABLE)
+    run = ArchiveRun.objects.create(
+        table=SESSION_TABLE, cutoff=now, hot_rows_before=rows, hot_bytes_before=size
+    )
+
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now).values_list("session_key", flat=True)[:batch_size]
+        )
+        if not keys:
+            break
+        deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+        run.moved += deleted
+
+    run.hot_rows_after, run.hot_bytes_after = table_size(SESSION_TABLE)
+    run.finished_at = timezone.now()
+    run.save()
+    return run
@@ -82,6 +82,9 @@ class Order(models.Model):
         default='pending'
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['user', '-created_at'], name='cart_order_user_recent')]
+
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
 
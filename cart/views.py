@@ -11,6 +11,9 @@ from .cart import Cart as SessionCart   # ✅ session cart
 from django.urls import reverse
 from django_dpo import DPOGateway
 
+from archive.lookups import get_order_or_404, orders_for
+from core.metrics import checkouts
+
 
 # ✅ JSON cart endpoint for sidebar
 # returns current cart items and subtotal
@@ -111,6 +114,7 @@ def checkout(request):
     session_cart.clear()  # ✅ clear guest cart
 
     if cart.items.count() == 0:
+        checkouts.inc(flow="cart", outcome="empty")
         messages.warning(request, "Your cart is empty.")
         return redirect('/')
 
@@ -128,6 +132,7 @@ def checkout(request):
 
     # ✅ Clear db cart
     cart.items.all().delete()
+    checkouts.inc(flow="cart", outcome="placed")
 
     # ✅ Email
     send_mail(
@@ -143,19 +148,19 @@ def checkout(request):
 
 @login_required
 def order_confirmation(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_order_or_404(request.user, order_id)
     return render(request, 'order_confirmation.html', {'order': order})
 
 
 @login_required
 def order_history(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    orders = orders_for(request.user)  # includes archived orders
     return render(request, 'order_history.html', {'orders': orders})
 
 
 @login_required
 def order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_order_or_404(request.user, order_id)
     return render(request, 'order_detail.html', {'order': order})
 
 
@@ -170,7 +175,7 @@ def dpo_pay(request):
         return redirect('cart:cart_detail')
 
     gateway = DPOGateway()
-    redirect_url = request.build_absolute_uri(reverse('dpo_callback'))
+    redirect_url = request.build_absolute_uri(reverse('cart:dpo_callback'))
     back_url = request.build_absolute_uri(reverse('cart:cart_detail'))
 
     gateway.set_redirect_url(redirect_url)
@@ -191,6 +196,7 @@ def dpo_callback(request):
     trans_id = request.GET.get('TransID')
 
     if not trans_id:
+        checkouts.inc(flow="cart_dpo", outcome="invalid")
         messages.error(request, "Payment failed.")
         return redirect('cart:cart_detail')
 
@@ -214,7 +220,13 @@ def dpo_callback(request):
 
         cart.items.all().delete()  # clear cart
 
+        # mark paid only once the items exist so the sales rollups see them
+        order.status = 'paid'
+        order.save(update_fields=['status', 'updated_at'])
+        checkouts.inc(flow="cart_dpo", outcome="paid")
+
         return redirect('cart:order_confirmation', order_id=order.id)
     else:
+        checkouts.inc(flow="cart_dpo", outcome="declined")
         messages.error(request, "Payment not successful.")
         return redirect('cart:cart_detail')
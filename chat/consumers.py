@@ -0,0 +1,67 @@
+# chat/consumers.py
+from asgiref.sync import async_to_sync
+from channels.generic.websocket import JsonWebsocketConsumer
+
+from core.messaging import MessagingError, send_product_message
+
+from . import realtime
+from .models import ChatSession, Message
+
+
+class ChatConsumer(JsonWebsocketConsumer):
+    """
+    One socket per browser tab at /ws/chat/.
+
+    Server -> client:  {"type": "message", "kind": "product"|"session", ...}
+                       {"type": "read", "kind": ..., "ids": [...]}
+                       {"type": "error", "error": "..."}
+    Client -> server:  {"action": "send", "product_id", "content", "receiver_id"?}
+                       {"action": "send", "session_id", "content"}
+    """
+
+    def connect(self):
+        self.user = self.scope["user"]
+        if not self.user.is_authenticated:
+            self.close()
+            return
+
+        self.group = realtime.user_group(self.user.id)
+        async_to_sync(self.channel_layer.group_add)(self.group, self.channel_name)
+        self.accept()
+
+    def disconnect(self, code):
+        if getattr(self, "group", None):
+            async_to_sync(self.channel_layer.group_discard)(self.group, self.channel_name)
+
+    def receive_json(self, content, **kwargs):
+        if content.get("action") != "send":
+            self.send_json({"type": "error", "error": "Unknown action"})
+            return
+
+        # the post_save signal pushes the new message back to both sides
+        if content.get("session_id"):
+            self._send_session_message(content)
+        else:
+            try:
+                send_product_message(
+                    self.user, content.get("product_id"), content.get("content"), content.get("receiver_id")
+                )
+            except MessagingError as e:
+                self.send_json({"type": "error", "error": e.message})
+
+    def _send_session_message(self, content):
+        session = ChatSession.objects.select_related("product__seller").filter(id=content["session_id"]).first()
+        if session is None or self.user.id not in realtime.session_participants(session):
+            self.send_json({"type": "error", "error": "Invalid session"})
+            return
+        if not content.get("content"):
+            self.send_json({"type": "error", "error": "Message is empty"})
+            return
+        Message.objects.create(session=session, sender=self.user, content=content["content"])
+
+    # ---------- channel layer events ----------
+    def chat_message(self, event):
+        self.send_json({"type": "message", **event["message"]})
+
+    def chat_read(self, event):
+        self.send_json({"type": "read", **event["receipt"]})
@@ -0,0 +1,47 @@
+# chat/lookups.py
+"""
+Chat session resolution.
+
+Opening a chat page used to run get_or_create on every request; the session
+id for a (user, product) pair never changes, so it is cached and the database
+is only asked the first time.
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import ChatSession
+
+SESSION_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def session_cache_key(user_id, product_id):
+    return f"chat:session:{user_id}:{product_id or 0}"
+
+
+def _get_or_create_session(user, product):
+    if product is None:
+        # product-less sessions (product deleted) aren't covered by the unique constraint
+        session = ChatSession.objects.filter(user=user, product=None).order_by("id").first()
+        return session or ChatSession.objects.create(user=user, product=None)
+
+    try:
+        with transaction.atomic():
+            session, _ = ChatSession.objects.get_or_create(user=user, product=product)
+    except IntegrityError:
+        # a concurrent open created it between our SELECT and INSERT
+        session = ChatSession.objects.get(user=user, product=product)
+    return session
+
+
+def session_id_for(user, product):
+    key = session_cache_key(user.id, product.id if product else None)
+    session_id = cache.get(key)
+    if session_id is None:
+        session_id = _get_or_create_session(user, product).id
+        cache.set(key, session_id, SESSION_CACHE_TIMEOUT)
+    return session_id
+
+
+def get_session(user, product):
+    """The user's chat session about `product`, without a query once its id is cached."""
+    return ChatSession(id=session_id_for(user, product), user=user, product=product)
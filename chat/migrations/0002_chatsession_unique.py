@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_sessions(apps, schema_editor):
+    """Fold duplicate (user, product) sessions into the oldest one, messages included."""
+    ChatSession = apps.get_model('chat', 'ChatSession')
+    Message = apps.get_model('chat', 'Message')
+    ArchivedChatMessage = apps.get_model('archive', 'ArchivedChatMessage')
+
+    duplicates = (
+        ChatSession.objects.filter(product__isnull=False)
+        .values('user_id', 'product_id')
+        .annotate(sessions=Count('id'), keep=Min('id'))
+        .filter(sessions__gt=1)
+    )
+    for group in duplicates:
+        extra = list(
+            ChatSession.objects.filter(user_id=group['user_id'], product_id=group['product_id'])
+            .exclude(id=group['keep'])
+            .values_list('id', flat=True)
+        )
+        Message.objects.filter(session_id__in=extra).update(session_id=group['keep'])
+        ArchivedChatMessage.objects.filter(session_id__in=extra).update(session_id=group['keep'])
+        ChatSession.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+        ('archive', '0001_initial'),
+        ('core', '0007_backfill_conversations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_sessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='chatsession',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='uniq_chat_session'),
+        ),
+    ]
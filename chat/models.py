@@ -7,7 +7,13 @@ class ChatSession(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chats')
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    class Meta:
+        # one session per buyer and product (sessions whose product was deleted aren't covered)
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='uniq_chat_session'),
+        ]
+
     def __str__(self):
         return f"ChatSession {self.id} for {self.user.username}"
 
@@ -0,0 +1,94 @@
+# chat/realtime.py
+"""
+Push chat events to connected WebSocket clients through the channel layer.
+
+Every user's sockets join one group (``user.<id>``), so a new message or a
+read receipt is delivered by sending to the groups of the people in the
+conversation. Works from sync code (views, signals); if no channel layer is
+configured the calls are no-ops and clients fall back to polling.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from core.messaging import serialize_message
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(user_id):
+    return f"user.{user_id}"
+
+
+def _send(user_ids, event):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    for user_id in set(user_ids):
+        if user_id is None:
+            continue
+        try:
+            async_to_sync(layer.group_send)(user_group(user_id), event)
+        except Exception:
+            # a broken layer must never fail the request that saved the message
+            logger.exception("Failed to push %s to user %s", event.get("type"), user_id)
+
+
+def session_participants(session):
+    """The buyer who opened a chat session and the seller of its product."""
+    participants = [session.user_id]
+    product = session.product
+    if product is not None and product.seller_id:
+        participants.append(product.seller.user_id)
+    return participants
+
+
+def serialize_session_message(msg):
+    return {
+        "id": msg.id,
+        "session_id": msg.session_id,
+        "sender": msg.sender.username,
+        "sender_id": msg.sender_id,
+        "content": msg.content,
+        "timestamp": msg.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+        "read": msg.read,
+    }
+
+
+def push_product_message(msg):
+    _send(
+        [msg.sender_id, msg.receiver_id],
+        {"type": "chat.message", "message": {"kind": "product", **serialize_message(msg)}},
+    )
+
+
+def push_session_message(msg):
+    _send(
+        session_participants(msg.session),
+        {"type": "chat.message", "message": {"kind": "session", **serialize_session_message(msg)}},
+    )
+
+
+def push_product_read(reader, product_id, message_ids, other_user_ids):
+    """Tell the other side of a product conversation that `reader` has read their messages."""
+    if not message_ids:
+        return
+    _send(other_user_ids, {"type": "chat.read", "receipt": {
+        "kind": "product",
+        "product_id": product_id,
+        "reader_id": reader.id,
+        "ids": list(message_ids),
+    }})
+
+
+def push_session_read(reader, session, message_ids):
+    if not message_ids:
+        return
+    others = [uid for uid in session_participants(session) if uid != reader.id]
+    _send(others, {"type": "chat.read", "receipt": {
+        "kind": "session",
+        "session_id": session.id,
+        "reader_id": reader.id,
+        "ids": list(message_ids),
+    }})
@@ -0,0 +1,28 @@
+# chat/signals.py
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Message as ProductMessage
+
+from . import realtime
+from .lookups import session_cache_key
+from .models import ChatSession, Message as SessionMessage
+
+
+@receiver(post_save, sender=ProductMessage)
+def push_new_product_message(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: realtime.push_product_message(instance))
+
+
+@receiver(post_save, sender=SessionMessage)
+def push_new_session_message(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: realtime.push_session_message(instance))
+
+
+@receiver(post_delete, sender=ChatSession)
+def forget_session_id(sender, instance, **kwargs):
+    cache.delete(session_cache_key(instance.user_id, instance.product_id))
@@ -0,0 +1,101 @@
+// chat/static/chat/js/live_chat.js
+// Live chat transport: a WebSocket to /ws/chat/ when the server supports it,
+// otherwise (or while reconnecting) poll a JSON endpoint for new messages.
+//
+//   LiveChat({
+//     pollUrl: "/chat/fetch/12/",       // optional: JSON {messages: [...]} fallback
+//     pollParam: "since",               // optional: send the last seen id as ?since=<id>
+//     onMessage: function (msg) {},     // msg.kind is "product" or "session"
+//     onRead: function (receipt) {},
+//   })
+(function () {
+  "use strict";
+
+  function LiveChat(options) {
+    this.options = Object.assign(
+      { pollInterval: 5000, reconnectDelay: 2000, maxReconnectDelay: 30000 },
+      options
+    );
+    this.seen = {};
+    this.lastId = options.lastId || 0;
+    this.pollTimer = null;
+    this.socket = null;
+    this.delay = this.options.reconnectDelay;
+    this.connect();
+  }
+
+  LiveChat.prototype.deliver = function (msg) {
+    // the same message can arrive through both transports during a switch-over
+    var key = (msg.kind || "") + ":" + msg.id;
+    if (this.seen[key]) return;
+    this.seen[key] = true;
+    if (msg.id > this.lastId) this.lastId = msg.id;
+    if (this.options.onMessage) this.options.onMessage(msg);
+  };
+
+  LiveChat.prototype.connect = function () {
+    var self = this;
+    if (!("WebSocket" in window)) return this.startPolling();
+
+    var scheme = window.location.protocol === "https:" ? "wss://" : "ws://";
+    var socket = new WebSocket(scheme + window.location.host + "/ws/chat/");
+    this.socket = socket;
+
+    socket.onopen = function () {
+      self.delay = self.options.reconnectDelay;
+      self.stopPolling();
+    };
+    socket.onmessage = function (event) {
+      var data = JSON.parse(event.data);
+      if (data.type === "message") self.deliver(data);
+      else if (data.type === "read" && self.options.onRead) self.options.onRead(data);
+      else if (data.type === "error") console.warn("chat:", data.error);
+    };
+    socket.onclose = function () {
+      self.socket = null;
+      self.startPolling();
+      setTimeout(function () { self.connect(); }, self.delay);
+      self.delay = Math.min(self.delay * 2, self.options.maxReconnectDelay);
+    };
+  };
+
+  // Returns false when there is no open socket; callers then POST instead.
+  LiveChat.prototype.send = function (payload) {
+    if (!this.socket || this.socket.readyState !== WebSocket.OPEN) return false;
+    this.socket.send(JSON.stringify(Object.assign({ action: "send" }, payload)));
+    return true;
+  };
+
+  LiveChat.prototype.poll = function () {
+    var self = this;
+    var url = this.options.pollUrl;
+    if (this.options.pollParam) {
+      url += (url.indexOf("?") === -1 ? "?" : "&") + this.options.pollParam + "=" + this.lastId;
+    }
+
+    return fetch(url, { credentials: "same-origin" })
+      .then(function (response) { return response.json(); })
+      .then(function (data) {
+        (data.messages || []).forEach(function (msg) {
+          if (!msg.kind) msg.kind = self.options.kind;
+          self.deliver(msg);
+        });
+      });
+  };
+
+  LiveChat.prototype.startPolling = function () {
+    var self = this;
+    if (this.pollTimer || !this.options.pollUrl) return;
+    this.poll().catch(function () {});
+    this.pollTimer = setInterval(function () {
+      self.poll().catch(function () {});
+    }, this.options.pollInterval);
+  };
+
+  LiveChat.prototype.stopPolling = function () {
+    if (this.pollTimer) clearInterval(this.pollTimer);
+    this.pollTimer = null;
+  };
+
+  window.LiveChat = LiveChat;
+})();
@@ -1,3 +1,168 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.models import Category, Message as ProductMessage, Product, Seller
+
+from .consumers import ChatConsumer
+from .lookups import get_session, session_id_for
+from .models import ChatSession, Message
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class Socket(ApplicationCommunicator):
+    """
+    A WebSocket client for ChatConsumer, as user `user`. (channels.testing's
+    WebsocketCommunicator does the same, but importing it needs daphne, and
+    we serve with uvicorn.)
+    """
+
+    def __init__(self, user):
+        super().__init__(ChatConsumer.as_asgi(), {
+            "type": "websocket", "path": "/ws/chat/", "headers": [], "subprotocols": [], "user": user,
+        })
+
+    async def connect(self):
+        await self.send_input({"type": "websocket.connect"})
+        return (await self.receive_output(1))["type"] == "websocket.accept"
+
+    async def send_json_to(self, data):
+        await self.send_input({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json_from(self):
+        return json.loads((await self.receive_output(1))["text"])
+
+    async def disconnect(self):
+        await self.send_input({"type": "websocket.disconnect", "code": 1000})
+        await self.wait(1)
+
+
+# TransactionTestCase: the consumer runs its queries in worker threads, and
+# pushes only go out once the message's transaction commits
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class LiveChatTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyer = User.objects.create_user("buyer", password="pw")
+        self.seller = User.objects.create_user("seller", password="pw")
+        self.stranger = User.objects.create_user("stranger", password="pw")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            category=category, seller=Seller.objects.create(user=self.seller, business_name="Phones Ltd"),
+            name="Phone", description="", base_price=Decimal("100"), approved=True,
+        )
+        self.session = ChatSession.objects.create(user=self.buyer, product=self.product)
+
+    async def connect(self, user):
+        socket = Socket(user)
+        self.assertTrue(await socket.connect())
+        return socket
+
+    async def test_anonymous_sockets_are_closed(self):
+        self.assertFalse(await Socket(AnonymousUser()).connect())
+
+    async def test_session_message_is_pushed_to_both_participants(self):
+        buyer, seller = await self.connect(self.buyer), await self.connect(self.seller)
+        await buyer.send_json_to({"action": "send", "session_id": self.session.id, "content": "still available?"})
+        for communicator in (buyer, seller):
+            event = await communicator.receive_json_from()
+            self.assertEqual((event["type"], event["kind"], event["content"]), ("message", "session", "still available?"))
+            await communicator.disconnect()
+
+    async def test_socket_rejects_a_session_the_user_is_not_in(self):
+        stranger = await self.connect(self.stranger)
+        await stranger.send_json_to({"action": "send", "session_id": self.session.id, "content": "hi"})
+        self.assertEqual(await stranger.receive_json_from(), {"type": "error", "error": "Invalid session"})
+        await stranger.disconnect()
+        self.assertFalse(await Message.objects.aexists())
+
+    async def test_saved_product_message_is_pushed(self):
+        seller = await self.connect(self.seller)
+        await database_sync_to_async(ProductMessage.objects.create)(
+            sender=self.buyer, receiver=self.seller, product=self.product, content="hello"
+        )
+        event = await seller.receive_json_from()
+        self.assertEqual((event["kind"], event["product_id"], event["content"]), ("product", self.product.id, "hello"))
+        await seller.disconnect()
+
+    async def test_http_send_is_pushed_to_the_socket(self):
+        seller = await self.connect(self.seller)
+        await sync_to_async(self.client.force_login)(self.buyer)
+        response = await sync_to_async(self.client.post)(
+            reverse("chat:send_message"), {"session_id": self.session.id, "content": "over http"}
+        )
+        self.assertEqual(response.status_code, 200)
+        event = await seller.receive_json_from()
+        self.assertEqual(event["content"], "over http")
+        await seller.disconnect()
+
+    def test_http_send_rejects_a_session_the_user_is_not_in(self):
+        self.client.force_login(self.stranger)
+        response = self.client.post(reverse("chat:send_message"), {"session_id": self.session.id, "content": "hi"})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Message.objects.exists())
+
+
+class ChatSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyer = User.objects.create_user("buyer", password="pw")
+        self.seller = User.objects.create_user("seller", password="pw")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            category=category, seller=Seller.objects.create(user=self.seller, business_name="Phones Ltd"),
+            name="Phone", description="", base_price=Decimal("100"), approved=True,
+        )
+
+    def test_session_id_is_cached_after_the_first_lookup(self):
+        session_id = session_id_for(self.buyer, self.product)
+        with self.assertNumQueries(0):
+            session = get_session(self.buyer, self.product)
+        self.assertEqual((session.id, session.product), (session_id, self.product))
+        cache.clear()
+        self.assertEqual(session_id_for(self.buyer, self.product), session_id)
+        self.assertEqual(ChatSession.objects.count(), 1)
+
+    def test_one_session_per_user_and_product(self):
+        ChatSession.objects.create(user=self.buyer, product=self.product)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ChatSession.objects.create(user=self.buyer, product=self.product)
+
+    def test_concurrently_created_session_is_reused(self):
+        existing = ChatSession.objects.create(user=self.buyer, product=self.product)
+        # the other request's INSERT lands between our SELECT and INSERT
+        with mock.patch.object(ChatSession.objects, "get_or_create", side_effect=IntegrityError):
+            self.assertEqual(session_id_for(self.buyer, self.product), existing.id)
+
+    def test_productless_sessions_are_reused(self):
+        session_id = session_id_for(self.buyer, None)
+        cache.clear()
+        self.assertEqual(session_id_for(self.buyer, None), session_id)
+        self.assertEqual(ChatSession.objects.filter(product=None).count(), 1)
+
+    @override_settings(CHAT_PAGE_SIZE=2)
+    def test_history_is_paged_oldest_first(self):
+        session = ChatSession.objects.create(user=self.buyer, product=self.product)
+        ids = [Message.objects.create(session=session, sender=self.seller, content=str(i)).id for i in range(5)]
+        self.client.force_login(self.buyer)
+
+        response = self.client.get(reverse("chat:chat_session", args=[self.product.id]))
+        self.assertEqual([m.id for m in response.context["messages"]], ids[3:])
+        self.assertTrue(response.context["has_more"])
+
+        url = reverse("chat:session_messages", args=[session.id])
+        page = self.client.get(url, {"before": ids[3]}).json()
+        self.assertEqual(([m["id"] for m in page["messages"]], page["has_more"]), (ids[1:3], True))
+        page = self.client.get(url, {"before": ids[1]}).json()
+        self.assertEqual(([m["id"] for m in page["messages"]], page["has_more"]), (ids[:1], False))
+        self.assertEqual(self.client.get(url, {"before": "x"}).status_code, 400)
@@ -6,7 +6,9 @@ app_name = 'chat'
 urlpatterns = [
     path("", views.chat_home, name="chat"),
     path('session/<int:product_id>/', views.chat_session, name='chat_session'),
-    path('send/', views.send_message, name='send_message'),
+    path('session/<int:session_id>/messages/', views.session_messages, name='session_messages'),
+    # not "send/": core's chat/send/ (product messages) is matched first
+    path('session/send/', views.send_message, name='send_message'),
 ]
 
 
@@ -1,9 +1,35 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
+from archive.lookups import archived_session_messages
+from .lookups import get_session
 from .models import ChatSession, Message
+from .realtime import push_session_read, serialize_session_message, session_participants
 from core.models import Product
 
+
+def _mark_session_read(user, session):
+    """Flip the other side's unread messages to read and send a read receipt."""
+    unread = session.messages.filter(read=False).exclude(sender=user)
+    ids = list(unread.values_list("id", flat=True))
+    if ids:
+        Message.objects.filter(id__in=ids).update(read=True)
+        push_session_read(user, session, ids)
+
+
+def _latest_messages(session, before=None):
+    """One page of messages, oldest first, ending just before message id `before`; plus has_more."""
+    limit = settings.CHAT_PAGE_SIZE + 1
+    qs = session.messages.select_related("sender").order_by("-id")
+    if before:
+        qs = qs.filter(id__lt=before)
+    # older read messages may have moved to the archive; page over both by id
+    page = list(qs[:limit]) + archived_session_messages(session, before, limit)
+    page = sorted(page, key=lambda msg: msg.id, reverse=True)[:limit]
+    return page[:settings.CHAT_PAGE_SIZE][::-1], len(page) > settings.CHAT_PAGE_SIZE
+
+
 @login_required
 def chat_session(request, product_id=None):
     """Get or create a chat session for the user (optionally for a product)"""
@@ -11,10 +37,50 @@ def chat_session(request, product_id=None):
     if product_id:
         product = get_object_or_404(Product, id=product_id)
 
-    session, created = ChatSession.objects.get_or_create(user=request.user, product=product)
-    messages = session.messages.all()
-    
-    return render(request, 'chat/chat.html', {'session': session, 'messages': messages})
+    session = get_session(request.user, product)
+    messages, has_more = _latest_messages(session)
+    _mark_session_read(request.user, session)
+
+    return render(request, 'chat/chat.html', {
+        'session': session,
+        'messages': messages,
+        'has_more': has_more,
+        'last_id': messages[-1].id if messages else 0,
+    })
+
+
+@login_required
+def session_messages(request, session_id):
+    """
+    Polling fallback for clients without a WebSocket: messages newer than
+    ?after=<id>. With ?before=<id> it returns the page of history before that
+    message instead, for loading older messages on scroll.
+    """
+    session = get_object_or_404(ChatSession.objects.select_related("product__seller"), id=session_id)
+    if request.user.id not in session_participants(session):
+        raise Http404("Chat session not found")
+
+    if "before" in request.GET:
+        try:
+            before = int(request.GET["before"])
+        except ValueError:
+            return JsonResponse({"error": "Invalid cursor"}, status=400)
+        older, has_more = _latest_messages(session, before=before)
+        return JsonResponse({
+            "messages": [serialize_session_message(msg) for msg in older],
+            "has_more": has_more,
+        })
+
+    try:
+        after = int(request.GET.get("after", 0))
+    except ValueError:
+        after = 0
+
+    new_messages = session.messages.filter(id__gt=after).select_related("sender")
+    data = [serialize_session_message(msg) for msg in new_messages]
+    _mark_session_read(request.user, session)
+
+    return JsonResponse({"messages": data})
 
 
 @login_required
@@ -24,7 +90,13 @@ def send_message(request):
         session_id = request.POST.get('session_id')
         content = request.POST.get('content')
 
-        session = get_object_or_404(ChatSession, id=session_id)
+        session = get_object_or_404(ChatSession.objects.select_related("product__seller"), id=session_id)
+        # the same checks as the WebSocket consumer
+        if request.user.id not in session_participants(session):
+            raise Http404("Chat session not found")
+        if not content:
+            return JsonResponse({'error': 'Message is empty'}, status=400)
+        # WebSocket clients get the message pushed by chat.signals
         msg = Message.objects.create(session=session, sender=request.user, content=content)
 
         return JsonResponse({
@@ -39,4 +111,4 @@ def send_message(request):
 
 
 def chat_home(request):
-    return render(request, "chat_home.html")
\ No newline at end of file
+    return render(request, "chat_home.html")
@@ -6,7 +6,8 @@ from .models import (
     Category, SubCategory, Product, PriceOption,
     Supplier, Review, ProductImage, Seller
 )
-from .models import Message
+from .models import Conversation, MediaUpload, Message
+from search.index import PRODUCT, message_ids
 
 from .models import SupportTicket
 
@@ -34,7 +35,18 @@ class SubCategoryInline(admin.TabularInline):
 
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
-    list_display = ("product", "color")
+    list_display = ("product", "color", "status")
+    list_filter = ("status",)
+
+
+@admin.register(MediaUpload)
+class MediaUploadAdmin(admin.ModelAdmin):
+    list_display = ("content_type", "object_id", "field", "status", "attempts", "created_at", "finished_at")
+    list_filter = ("status", "content_type")
+    readonly_fields = [f.name for f in MediaUpload._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
 
 # ---------------------
 # CATEGORY ADMIN
@@ -73,6 +85,7 @@ class ReviewAdmin(admin.ModelAdmin):
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 5
+    readonly_fields = ("status",)  # images upload in the background (core.media)
 
 # core/admin.py
 @admin.register(Product)
@@ -84,6 +97,7 @@ class ProductAdmin(admin.ModelAdmin):
         "base_price",
         "seller",
         "approved",
+        "main_image_status",
     )
 
     list_filter = (
@@ -102,6 +116,8 @@ class ProductAdmin(admin.ModelAdmin):
         "recommended_from_supplier",
     )
 
+    readonly_fields = ("views", "main_image_status")
+
     inlines = [ProductImageInline]
 
     class Media:
@@ -151,7 +167,29 @@ class SellerAdmin(admin.ModelAdmin):
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('sender', 'receiver', 'product', 'timestamp', 'read')
     list_filter = ('read', 'timestamp')
-    search_fields = ('sender__username', 'receiver__username', 'content')
+    search_fields = ('sender__username', 'receiver__username')
+
+    def get_search_results(self, request, queryset, search_term):
+        # content goes through the full-text index instead of a LIKE scan
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        ids = message_ids(PRODUCT, search_term)
+        if ids:
+            results |= queryset.filter(id__in=ids)
+        return results, may_have_duplicates
+
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    """Maintained from Message saves; read-only here."""
+    list_display = ('buyer', 'seller', 'product', 'last_message_at', 'buyer_unread', 'seller_unread')
+    search_fields = ('buyer__username', 'seller__username', 'product__name')
+    list_select_related = ('buyer', 'seller', 'product')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 
@@ -217,6 +255,7 @@ class HelpArticleAdmin(admin.ModelAdmin):
     )
     search_fields = ("title", "summary", "content")
     prepopulated_fields = {"slug": ("title",)}
+    readonly_fields = ("views", "is_popular")
 
 
 @admin.register(Promotion)
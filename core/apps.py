@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # keep the conversation inbox in step with new messages
+        from . import signals  # noqa: F401
+        from . import budgets  # noqa: F401  (registers the VIEW_BUDGETS system check)
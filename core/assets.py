@@ -0,0 +1,250 @@
+# core/assets.py
+"""
+Static asset build, run as part of `collectstatic`.
+
+StaticAssetStorage extends WhiteNoise's compressed manifest storage:
+
+  * STATIC_BUNDLES are concatenated into single files,
+  * the project's own CSS and JS are minified before they're fingerprinted
+    (files from installed packages are left alone),
+  * CRITICAL_CSS files are extracted from a stylesheet, keeping only the rules
+    whose selectors appear in the given templates; base.html inlines the
+    result with {% critical_css %} and loads the full stylesheet without
+    blocking first paint.
+
+WhiteNoise then writes .gz and, with the `brotli` package installed, .br copies
+of everything, and serves fingerprinted names with a far-future immutable
+Cache-Control.
+"""
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from django.template.loader import get_template
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+_CSS_STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_CSS_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', re.S)
+_CSS_SPACE = re.compile(r"\s+")
+_CSS_PUNCT = re.compile(r"\s*([{};,>])\s*")
+
+_TEMPLATE_TAG = re.compile(r"{%.*?%}|{{.*?}}|{#.*?#}", re.S)
+_CLASS_ATTR = re.compile(r'\bclass\s*=\s*["\']([^"\']*)["\']')
+_ID_ATTR = re.compile(r'\bid\s*=\s*["\']([^"\']*)["\']')
+_SELECTOR_CLASS = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+_SELECTOR_ID = re.compile(r"#(-?[_a-zA-Z][\w-]*)")
+
+
+def _minify_css_code(css):
+    css = _CSS_SPACE.sub(" ", css)
+    css = _CSS_PUNCT.sub(r"\1", css)
+    css = re.sub(r":\s+", ":", css)  # "color: red" -> "color:red"; selectors never have space after ':'
+    return css.replace(";}", "}")
+
+
+def minify_css(css):
+    """Drops comments and collapses whitespace; quoted strings (content:, url("...")) are kept as they are."""
+    css = _CSS_STRING_OR_COMMENT.sub(lambda m: m.group(1) or "", css)
+    parts = _CSS_STRING.split(css)  # odd items are the strings
+    return "".join(part if i % 2 else _minify_css_code(part) for i, part in enumerate(parts)).strip()
+
+
+def _js_line_state(line, in_template, in_comment):
+    """Whether a template literal or block comment is still open at the end of `line`."""
+    quote = None
+    i = 0
+    while i < len(line):
+        ch = line[i]
+        if in_comment:
+            if line.startswith("*/", i):
+                in_comment = False
+                i += 1
+        elif in_template:
+            if ch == "\\":
+                i += 1
+            elif ch == "`":
+                in_template = False
+        elif quote:
+            if ch == "\\":
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif line.startswith("//", i):
+            break
+        elif line.startswith("/*", i):
+            in_comment = True
+            i += 1
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "`":
+            in_template = True
+        i += 1
+    return in_template, in_comment
+
+
+def minify_js(js):
+    """
+    Conservative: drops whole-line comments, indentation and blank lines but
+    keeps every line break, so automatic semicolon insertion is unaffected.
+    Lines inside a multi-line template literal are kept exactly.
+    """
+    out = []
+    in_template = in_comment = False
+    for line in js.splitlines():
+        if in_template:
+            out.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not (stripped.startswith("//") and not in_comment):
+                out.append(stripped)
+        in_template, in_comment = _js_line_state(line, in_template, in_comment)
+    return "\n".join(out) + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+# --------------------------
+# Critical CSS
+# --------------------------
+
+def _split_blocks(css):
+    """Top-level (prelude, body) pairs of minified CSS; statements like @import have body None."""
+    blocks, depth, start, prelude = [], 0, 0, None
+    for i, ch in enumerate(css):
+        if ch == "{":
+            if depth == 0:
+                prelude, start = css[start:i].strip(), i + 1
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[start:i]))
+                start = i + 1
+        elif ch == ";" and depth == 0:
+            blocks.append((css[start:i].strip(), None))
+            start = i + 1
+    return blocks
+
+
+def _template_names(templates):
+    """Class and id tokens used by `templates` (template tags stripped)."""
+    classes, ids = set(), set()
+    for name in templates:
+        source = _TEMPLATE_TAG.sub(" ", get_template(name).template.source)
+        for value in _CLASS_ATTR.findall(source):
+            classes.update(value.split())
+        for value in _ID_ATTR.findall(source):
+            ids.update(value.split())
+    return classes, ids
+
+
+def _selector_used(selector, classes, ids):
+    return (set(_SELECTOR_CLASS.findall(selector)) <= classes
+            and set(_SELECTOR_ID.findall(selector)) <= ids)
+
+
+def _critical_rules(css, classes, ids):
+    out = []
+    for prelude, body in _split_blocks(css):
+        if body is None:
+            continue  # @import/@charset: the full stylesheet still has them
+        if prelude.startswith("@media") or prelude.startswith("@supports"):
+            inner = _critical_rules(body, classes, ids)
+            if inner:
+                out.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith("@"):
+            continue  # @keyframes, @font-face: not needed for first paint
+        else:
+            used = [s for s in prelude.split(",") if _selector_used(s, classes, ids)]
+            if used:
+                out.append(f"{','.join(used)}{{{body}}}")
+    return "".join(out)
+
+
+def extract_critical_css(css, templates):
+    """The rules of `css` that can match markup in `templates`, minified."""
+    classes, ids = _template_names(templates)
+    return _critical_rules(minify_css(css), classes, ids)
+
+
+def _source_text(name):
+    path = finders.find(name)
+    if path is None:
+        raise ValueError(f"static file {name!r} not found")
+    return Path(path).read_text(encoding="utf-8")
+
+
+def _build_critical(name):
+    spec = settings.CRITICAL_CSS[name]
+    return extract_critical_css(_source_text(spec["source"]), spec["templates"])
+
+
+@lru_cache(maxsize=None)
+def critical_css(name):
+    """
+    The critical CSS `name` from STATIC_ROOT, or built from the sources when
+    collectstatic hasn't run (DEBUG, tests).
+    """
+    if staticfiles_storage.exists(name):
+        with staticfiles_storage.open(name) as f:
+            return f.read().decode("utf-8")
+    return _build_critical(name)
+
+
+# --------------------------
+# Storage
+# --------------------------
+
+def _project_file(storage, path):
+    """
+    Whether a collected file is the project's own: a bundle built here, or a
+    source under BASE_DIR. Files from installed packages (the admin, allauth)
+    are copied as they are.
+    """
+    if isinstance(storage, StaticAssetStorage):
+        return True
+    location = getattr(storage, "location", None)
+    return location is not None and Path(location).resolve().is_relative_to(Path(settings.BASE_DIR).resolve())
+
+
+class StaticAssetStorage(CompressedManifestStaticFilesStorage):
+    """Bundles, minifies and extracts critical CSS, then fingerprints and precompresses."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            self._build_assets(paths)
+        yield from super().post_process(paths, dry_run, **options)
+
+    def _replace(self, name, text):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(text.encode("utf-8")))
+
+    def _build_assets(self, paths):
+        # Sources are read from STATIC_ROOT (already copied there) and the
+        # results written back; pointing `paths` at this storage makes the
+        # manifest step hash the built files rather than the originals.
+        for bundle, sources in getattr(settings, "STATIC_BUNDLES", {}).items():
+            parts = []
+            for source in sources:
+                with self.open(source) as f:
+                    parts.append(f.read().decode("utf-8"))
+            self._replace(bundle, "\n".join(parts))
+            paths[bundle] = (self, bundle)
+
+        for name in list(paths):
+            minify = MINIFIERS.get(Path(name).suffix)
+            if minify is None or name.endswith((".min.css", ".min.js")) or not _project_file(*paths[name]):
+                continue
+            with self.open(name) as f:
+                self._replace(name, minify(f.read().decode("utf-8")))
+            paths[name] = (self, name)
+
+        for name in getattr(settings, "CRITICAL_CSS", {}):
+            self._replace(name, _build_critical(name))
+            paths[name] = (self, name)
@@ -0,0 +1,235 @@
+# core/benchmark.py
+"""
+Per-URL benchmark over the core, cart, chat and payments URLconfs.
+
+Every named URL in those namespaces is requested through the Django test
+client against the current database, normally one loaded with
+`manage.py generate_catalog`. URL arguments are filled from sample rows,
+such as an approved product or one of the benchmark user's orders. For each
+URL we record the latency percentiles, the queries per request and the peak
+memory that Python allocates while one request is handled. The report can be
+written as JSON and compared with an earlier run.
+
+Only read-only pages are requested. URLs that write (cart changes, checkout,
+sending messages, marking messages read), log the client out or call the
+payment gateway are skipped. The caches get a key prefix of their own for
+the run (isolated_caches), so the benchmark neither serves nor evicts the
+site's entries, and --cold moves to a fresh key version instead of clearing
+a cache that other workers share.
+"""
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+
+from cart.models import Order as CartOrder
+from payments.loadtest import percentile
+
+from .budgets import QueryCounter
+from .models import Category, HelpArticle, HelpCategory, Message, Product, Review, SubCategory
+
+BENCHMARK_NAMESPACES = ("core", "cart", "chat", "payments")
+
+SKIPPED = {
+    # end the benchmark user's session
+    "core:logout": "logs out",
+    "core:seller-logout": "logs out",
+    # change the user's cart, place orders (and email them) or send messages
+    "cart:cart_add": "writes",
+    "cart:cart_remove": "writes",
+    "cart:checkout": "writes",
+    "core:send_message": "writes",
+    "chat:send_message": "writes",
+    # mark the other side's messages read, or create a chat session
+    "core:fetch_messages": "writes",
+    "chat:chat_session": "writes",
+    "chat:session_messages": "writes",
+    # redirect to, or are called back by, the DPO gateway
+    "core:buy_now": "payment gateway",
+    "cart:dpo_pay": "payment gateway",
+    "cart:dpo_callback": "payment gateway",
+    "payments:dpo_payment": "payment gateway",
+    "payments:dpo_payment_cart": "payment gateway",
+    "payments:dpo_callback": "payment gateway",
+}
+
+
+def benchmark_urls():
+    """(view name, URLPattern) for every named URL in BENCHMARK_NAMESPACES."""
+    resolver = get_resolver()
+    for namespace in BENCHMARK_NAMESPACES:
+        if namespace not in resolver.namespace_dict:
+            continue
+        _, app_resolver = resolver.namespace_dict[namespace]
+        for pattern in app_resolver.url_patterns:
+            if isinstance(pattern, URLPattern) and pattern.name:
+                yield f"{namespace}:{pattern.name}", pattern
+
+
+def sample_arguments(user):
+    """URL kwargs taken from the loaded data, keyed by argument name or "view name:argument"."""
+    product = Product.objects.filter(approved=True, messages__isnull=False).order_by("-pk").first() \
+        or Product.objects.filter(approved=True).order_by("-pk").first()
+    if product is None:
+        return None
+    subcategory = product.subcategory or SubCategory.objects.filter(category_id=product.category_id).first()
+    order = CartOrder.objects.filter(user=user).order_by("-created_at").first() if user is not None else None
+    help_category = HelpCategory.objects.first()
+    help_article = HelpArticle.objects.filter(is_published=True).first()
+
+    return {
+        "product_id": product.pk,
+        "category_id": product.category_id,
+        "subcategory_id": subcategory.pk if subcategory else None,
+        "order_id": order.pk if order else None,
+        "slug_path": "/".join(s for s in (product.category.slug, subcategory and subcategory.slug) if s),
+        "core:deals-page:slug": "clearance",
+        "core:help-category:slug": help_category.slug if help_category else None,
+        "core:help-detail:slug": help_article.slug if help_article else None,
+    }
+
+
+def _kwargs(name, pattern, arguments):
+    kwargs = {}
+    for arg in pattern.pattern.converters:
+        value = arguments.get(f"{name}:{arg}", arguments.get(arg))
+        if value is None:
+            return None
+        kwargs[arg] = value
+    return kwargs
+
+
+def dataset_counts():
+    return {
+        model._meta.label_lower: model.objects.count()
+        for model in (User, Category, SubCategory, Product, Review, Message, CartOrder)
+    }
+
+
+def isolated_caches():
+    """settings.CACHES with a key prefix for this run, for override_settings(CACHES=...)."""
+    prefix = f"bench-{os.getpid()}-{time.time_ns()}"
+    return {
+        alias: {**config, "KEY_PREFIX": f"{prefix}:{config.get('KEY_PREFIX', '')}"}
+        for alias, config in settings.CACHES.items()
+    }
+
+
+def _cold_start():
+    """Make everything the benchmark cached unreachable, without touching anyone else's keys."""
+    for alias in settings.CACHES:
+        caches[alias].version += 1
+
+
+def _request(client, path, cold):
+    if cold:
+        _cold_start()
+    counter = QueryCounter()
+    started = time.perf_counter()
+    with connection.execute_wrapper(counter):
+        response = client.get(path)
+    return (time.perf_counter() - started) * 1000, counter.count, response.status_code
+
+
+def _peak_kb(client, path, cold):
+    if cold:
+        _cold_start()
+    tracemalloc.start()
+    try:
+        client.get(path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def run(user=None, iterations=20, warmup=2, cold=False, only=None):
+    """
+    Benchmark every URL, logged in as `user` (None: anonymous); returns the
+    report as a JSON-serialisable dict. Run it under isolated_caches().
+    """
+    client = Client(raise_request_exception=False)
+    if user is not None:
+        client.force_login(user)
+    arguments = sample_arguments(user)
+    if arguments is None:
+        raise ValueError("No approved products; load data with `manage.py generate_catalog` first.")
+
+    results, skipped = {}, {}
+    for name, pattern in benchmark_urls():
+        if only and not any(part in name for part in only):
+            continue
+        if name in SKIPPED:
+            skipped[name] = SKIPPED[name]
+            continue
+        kwargs = _kwargs(name, pattern, arguments)
+        if kwargs is None:
+            skipped[name] = "no sample data"
+            continue
+        path = reverse(name, kwargs=kwargs)
+
+        for _ in range(warmup):
+            _request(client, path, cold)
+        timings, queries, statuses = [], [], set()
+        for _ in range(iterations):
+            elapsed, count, status = _request(client, path, cold)
+            timings.append(elapsed)
+            queries.append(count)
+            statuses.add(status)
+
+        results[name] = {
+            "path": path,
+            "status": sorted(statuses),
+            "mean_ms": round(statistics.fmean(timings), 2),
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "queries": max(queries),
+            "peak_kb": _peak_kb(client, path, cold),
+        }
+
+    return {
+        "meta": {
+            "at": timezone.now().isoformat(),
+            "user": user.get_username() if user is not None else None,
+            "iterations": iterations,
+            "cold": cold,
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "dataset": dataset_counts(),
+        },
+        "urls": results,
+        "skipped": skipped,
+    }
+
+
+def compare(current, previous, threshold=10.0):
+    """
+    Per-URL changes against an earlier report. A URL regressed when its p95
+    grew by more than `threshold` percent or it runs more queries than before.
+    """
+    rows = []
+    for name, now in current["urls"].items():
+        before = previous.get("urls", {}).get(name)
+        if before is None:
+            continue
+        change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        rows.append({
+            "name": name,
+            "p95_before": before["p95_ms"],
+            "p95_now": now["p95_ms"],
+            "p95_change": round(change, 1),
+            "queries_before": before["queries"],
+            "queries_now": now["queries"],
+            "regressed": change > threshold or now["queries"] > before["queries"],
+        })
+    return rows
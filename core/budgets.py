@@ -0,0 +1,92 @@
+# core/budgets.py
+"""
+Per-view query and time budgets.
+
+VIEW_BUDGETS maps URL names to (max queries, max milliseconds); None leaves
+that side unlimited. BudgetMiddleware counts the queries every request runs,
+through a connection execute wrapper, so it works with DEBUG off. It also
+times the request. A request over its view's budget raises BudgetExceeded
+when VIEW_BUDGET_MODE is "raise" (tests, CI), so the N+1 that caused it
+fails the run. In "log" mode (production) it is logged instead.
+
+Views without an entry get VIEW_BUDGET_DEFAULT. The system check below
+reports every core/cart/payments/chat URL that has no budget of its own.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.db import connection
+from django.urls import URLPattern, get_resolver
+
+logger = logging.getLogger(__name__)
+
+BUDGETED_NAMESPACES = ("core", "cart", "payments", "chat")
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def check_budget(view_name, queries, elapsed_ms):
+    max_queries, max_ms = settings.VIEW_BUDGETS.get(view_name, settings.VIEW_BUDGET_DEFAULT)
+    over = []
+    if max_queries is not None and queries > max_queries:
+        over.append(f"{queries} queries (budget {max_queries})")
+    if max_ms is not None and elapsed_ms > max_ms:
+        over.append(f"{elapsed_ms:.0f} ms (budget {max_ms})")
+    if not over:
+        return
+    message = f"{view_name} over budget: {', '.join(over)}"
+    if settings.VIEW_BUDGET_MODE == "raise":
+        raise BudgetExceeded(message)
+    logger.warning(message)
+
+
+class BudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        if match is not None and match.view_name:
+            check_budget(match.view_name, counter.count, elapsed_ms)
+        return response
+
+
+@checks.register(checks.Tags.urls)
+def check_view_budgets(app_configs, **kwargs):
+    resolver = get_resolver()
+    errors = []
+    for namespace in BUDGETED_NAMESPACES:
+        if namespace not in resolver.namespace_dict:
+            continue
+        _, app_resolver = resolver.namespace_dict[namespace]
+        for pattern in app_resolver.url_patterns:
+            # included third-party URLs (allauth under core) aren't ours to budget
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            name = f"{namespace}:{pattern.name}"
+            if name not in settings.VIEW_BUDGETS:
+                errors.append(checks.Error(
+                    f"{name} has no entry in VIEW_BUDGETS.",
+                    hint="Add (max queries, max ms) for it in settings.VIEW_BUDGETS.",
+                    id="core.E001",
+                ))
+    return errors
@@ -0,0 +1,193 @@
+# core/caching.py
+"""
+Two-tier cache.
+
+TieredCache is the "default" cache backend: a small in-process LRU in front
+of a shared backend (CACHES["shared"]: Redis in production, files locally).
+Reads are answered from process memory when they can; writes go to both
+tiers. Local copies live at most LOCAL_TIMEOUT seconds, so a change made by
+another worker is seen within that time. add/incr/decr go to the shared tier
+only, which keeps them usable as cross-worker locks and counters.
+
+get_or_compute() is for expensive values. Only one worker recomputes a key
+(single flight); the others serve the old value meanwhile, or, when there is
+none yet, wait up to a second for it and then compute it themselves rather
+than hold the request any longer. A key is refreshed a little before it
+expires, at a random point weighted by how long it took to compute, so
+workers don't all miss at the same moment.
+
+Hits and misses per tier and key prefix are counted in `stats`.
+"""
+import math
+import pickle
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+_MISSING = object()
+
+
+class CacheStats:
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, key, outcome):
+        """outcome: local_hit, shared_hit, miss, recompute, early_refresh, waited."""
+        family = str(key).split(":", 1)[0]
+        with self._lock:
+            self._counts[(family, outcome)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+stats = CacheStats()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = options.get("SHARED", "shared")
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self._local = OrderedDict()  # key -> (expires at, pickled value)
+        self._lock = threading.Lock()
+
+    @cached_property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # -- local tier --
+
+    def _local_get(self, local_key):
+        with self._lock:
+            item = self._local.get(local_key)
+            if item is None:
+                return _MISSING
+            expires, pickled = item
+            if expires <= time.monotonic():
+                del self._local[local_key]
+                return _MISSING
+            self._local.move_to_end(local_key)
+        return pickle.loads(pickled)
+
+    def _local_set(self, local_key, value, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        ttl = self._local_timeout if timeout is None else min(timeout, self._local_timeout)
+        if ttl <= 0:
+            self._local_delete(local_key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + ttl, pickled)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, local_key):
+        with self._lock:
+            self._local.pop(local_key, None)
+
+    # -- cache API --
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            stats.record(key, "local_hit")
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            stats.record(key, "miss")
+            return default
+        stats.record(key, "shared_hit")
+        self._local_set(local_key, value, DEFAULT_TIMEOUT)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        return self._local_get(local_key) is not _MISSING or self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.decr(key, delta, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+
+def get_or_compute(key, compute, timeout, beta=1.0, lock_timeout=30, max_wait=1.0):
+    """
+    The cached value of `key`, computing it with `compute()` when it is
+    missing or due for an early refresh. `beta` > 1 refreshes earlier.
+    """
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None:
+        # XFetch: refresh early with a probability that grows towards expiry
+        early = entry["delta"] * beta * -math.log(1.0 - random.random())
+        if now + early < entry["expires"]:
+            return entry["value"]
+
+    lock_key = f"{key}:lock"
+    locked = cache.add(lock_key, 1, lock_timeout)
+    if not locked:
+        if entry is not None:
+            return entry["value"]  # someone else is refreshing it
+        # nothing to serve yet: wait briefly for the worker that holds the lock
+        deadline = now + max_wait
+        delay = 0.05
+        while time.time() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, max(0.0, deadline - time.time()))
+            entry = cache.get(key)
+            if entry is not None:
+                stats.record(key, "waited")
+                return entry["value"]
+
+    stats.record(key, "early_refresh" if entry is not None else "recompute")
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        # kept past its expiry so it can still be served while being refreshed
+        cache.set(key, {"value": value, "delta": delta, "expires": started + timeout},
+                  timeout + lock_timeout)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
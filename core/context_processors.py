@@ -2,5 +2,6 @@ from .models import Category
 
 def categories_processor(request):
     return {
-        "all_categories": Category.objects.all()
+        # the navbar lists every category's subcategories
+        "all_categories": Category.objects.prefetch_related("subcategories")
     }
@@ -0,0 +1,156 @@
+# core/counters.py
+"""
+Buffered view counters.
+
+Page views are counted in process memory and written back periodically as a
+single ``UPDATE ... SET views = views + n`` per object, instead of a
+read-modify-write on every hit (which loses increments under concurrency).
+A hit flushes when VIEW_COUNTER_FLUSH_SECONDS have passed. A background
+thread also flushes on that schedule, so a worker that goes idle doesn't sit
+on its counts, and so does the worker's exit (except under test).
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+
+from .models import HelpArticle, Product
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    def __init__(self, model, field="views", on_flush=None):
+        self.model = model
+        self.field = field
+        self.on_flush = on_flush  # called after counts were written
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def hit(self, pk, count=1):
+        _start_flusher()
+        with self._lock:
+            self._pending[pk] = self._pending.get(pk, 0) + count
+            due = time.monotonic() - self._last_flush >= settings.VIEW_COUNTER_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def pending(self, pk):
+        """Views counted for `pk` that are not in the database yet."""
+        with self._lock:
+            return self._pending.get(pk, 0)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            # all or nothing, so a failure part-way doesn't leave written counts to be retried
+            with transaction.atomic():
+                for pk, count in pending.items():
+                    self.model.objects.filter(pk=pk).update(**{self.field: F(self.field) + count})
+        except Exception:
+            # nothing was written; put the counts back so the next flush retries them
+            logger.exception("Failed to flush %s view counts", self.model.__name__)
+            with self._lock:
+                for pk, count in pending.items():
+                    self._pending[pk] = self._pending.get(pk, 0) + count
+            return 0
+
+        if self.on_flush:
+            self.on_flush()
+        return len(pending)
+
+
+def refresh_popular_articles():
+    """The most viewed published help articles are the popular ones."""
+    top_ids = list(
+        HelpArticle.objects.filter(is_published=True)
+        .order_by("-views")
+        .values_list("id", flat=True)[:settings.HELP_POPULAR_ARTICLES]
+    )
+    HelpArticle.objects.filter(is_popular=True).exclude(id__in=top_ids).update(is_popular=False)
+    HelpArticle.objects.filter(id__in=top_ids, is_popular=False).update(is_popular=True)
+
+
+help_article_views = ViewCounter(HelpArticle, on_flush=refresh_popular_articles)
+product_views = ViewCounter(Product)
+
+
+# by model label, so a view counted on a cached page can be replayed (core.pagecache)
+COUNTERS = {c.model._meta.label_lower: c for c in (help_article_views, product_views)}
+
+
+def count_view(request, counter, pk):
+    """Count a page view and note it on the request; a page cache hit counts it again."""
+    if request.method != "GET":  # HEAD is a link checker or a monitor, not a visitor
+        return
+    counter.hit(pk)
+    request.counted_views = getattr(request, "counted_views", []) + [(counter.model._meta.label_lower, pk)]
+
+
+def flush_all():
+    for counter in COUNTERS.values():
+        counter.flush()
+
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.VIEW_COUNTER_FLUSH_SECONDS)
+        try:
+            flush_all()
+        except Exception:
+            # keep the thread alive; the counts stay buffered for the next round
+            logger.exception("Periodic view count flush failed")
+        finally:
+            connections.close_all()  # this thread's connections only
+
+
+def _start_flusher():
+    """Start this process's flush thread (again after a fork, which doesn't copy threads)."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid != os.getpid():
+            _flusher_pid = os.getpid()
+            threading.Thread(target=_flush_periodically, name="view-counter-flush", daemon=True).start()
+
+
+def _database_usable():
+    connection = connections[DEFAULT_DB_ALIAS]
+    try:
+        connection.ensure_connection()
+        return connection.is_usable()
+    except Exception:
+        return False
+
+
+def _flush_at_exit():
+    """Don't drop buffered counts when a worker shuts down."""
+    # a test run's database is gone by now, and most processes never counted a view
+    if settings.TESTING or not any(counter._pending for counter in COUNTERS.values()):
+        return
+    if not _database_usable():
+        logger.warning("Database unavailable at exit; dropping buffered view counts")
+        return
+    try:
+        flush_all()
+    except Exception:
+        logger.exception("View count flush at exit failed")
+
+
+atexit.register(_flush_at_exit)
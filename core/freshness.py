@@ -0,0 +1,99 @@
+# core/freshness.py
+"""
+Conditional GET for catalog pages and JSON endpoints.
+
+Each view gets a validator function that returns "stamps": the query cache
+generations (core.querycache) of the tables the page is built from. A
+generation is bumped on every save or delete of a tracked model and by
+touch_products, so it changes whenever the page could. Reading them is one
+cache round trip and no SQL, so a client holding a current copy gets a 304
+without the catalog being scanned. The price is that any product change
+revalidates every catalog page, not just the ones showing that product.
+
+Pages that show the navbar depend on the signed-in user, so their ETag
+includes the user and they are sent `private`. The deploy is part of every
+ETag too, so new templates are never answered with a 304.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import Category, Product, SubCategory
+from .pagecache import invalidate_pages
+from .querycache import bump, generations
+
+
+def touch_products(**filters):
+    """Bump updated_at of the matching products, for changes made through a
+    related model or a queryset update (which auto_now doesn't see)."""
+    Product.objects.filter(**filters).update(updated_at=timezone.now())
+    bump(Product)
+    invalidate_pages()
+
+
+def navigation_stamps():
+    """The category menu every page renders (base.html)."""
+    return generations(Category, SubCategory)
+
+
+def conditional(validators, **cache_control):
+    """
+    Answer GET/HEAD with 304 when the client's copy is still current.
+
+    `validators(request, *args, **kwargs)` returns a list of stamps, or None
+    to skip conditional handling.
+    `cache_control` goes to patch_cache_control; with private=True the ETag
+    is per user.
+    """
+    private = cache_control.get("private", False)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            stamps = None
+            if request.method in ("GET", "HEAD"):
+                stamps = validators(request, *args, **kwargs)
+            if stamps is None:
+                return view(request, *args, **kwargs)
+
+            key = [settings.CATALOG_ETAG_SALT, stamps]
+            if private:
+                key.append(request.user.pk)
+            # weak: the rendered page can differ byte-wise (csrf tokens)
+            etag = 'W/"%s"' % hashlib.md5(repr(key).encode()).hexdigest()
+            last_modified = max(stamps) // 10**9 if stamps else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response.headers.setdefault("ETag", etag)
+                if last_modified:
+                    response.headers.setdefault("Last-Modified", http_date(last_modified))
+                patch_cache_control(response, **cache_control)
+                if private:
+                    patch_vary_headers(response, ["Cookie"])
+            return response
+        return wrapper
+    return decorator
+
+
+# --------------------------
+# Validators, one per view
+# --------------------------
+
+def subcategories_stamps(request, category_id=None):
+    return generations(SubCategory)
+
+
+def catalog_stamps(request, *args, **kwargs):
+    """Product pages and listings: the products (a deleted one included) and the menu."""
+    return generations(Product) + navigation_stamps()
+
+
+product_stamps = category_stamps = subcategory_stamps = new_products_stamps = catalog_stamps
@@ -0,0 +1,122 @@
+# core/images.py
+"""
+Responsive image URLs.
+
+Templates ask for an image in one of a few named slots ("card", "hero", ...)
+and get a src plus a srcset of sized, auto-format, auto-quality variants, so
+phones stop downloading full-size originals. URL building goes through a
+backend: Cloudinary transformations in production, a local MEDIA_URL backend
+that needs no network for development and tests. The local backend can't
+resize, so its images get a plain src and no srcset.
+
+URLs are memoized per (image, variant) since the same product images are
+rendered on every page.
+"""
+import io
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+Variant = namedtuple("Variant", "widths sizes")
+
+# the image slots our templates use; widths are CSS pixels at 1x-3x
+VARIANTS = {
+    "thumb": Variant((80, 160, 240), "80px"),
+    "card": Variant((200, 300, 400, 600), "(max-width: 600px) 45vw, 200px"),
+    "hero": Variant((480, 800, 1200, 1600), "100vw"),
+    "gallery": Variant((400, 600, 800, 1200), "(max-width: 768px) 100vw, 600px"),
+}
+
+Source = namedtuple("Source", "public_id version format")
+
+
+class CloudinaryBackend:
+    """Cloudinary on-the-fly transformations: resized, f_auto, q_auto."""
+
+    resizes = True
+
+    def url(self, source, width):
+        from cloudinary import CloudinaryImage
+
+        return CloudinaryImage(source.public_id, version=source.version, format=source.format).build_url(
+            width=width, crop="limit", fetch_format="auto", quality="auto", secure=True
+        )
+
+    def open(self, source):
+        """The untransformed original, as a file object."""
+        from cloudinary import CloudinaryImage
+
+        url = CloudinaryImage(source.public_id, version=source.version, format=source.format).build_url(secure=True)
+        with urlopen(url, timeout=30) as response:
+            return io.BytesIO(response.read())
+
+
+class LocalBackend:
+    """Offline stand-in: originals under MEDIA_URL, whatever the width."""
+
+    resizes = False
+
+    def url(self, source, width=None):
+        name = f"{source.public_id}.{source.format}" if source.format else source.public_id
+        return f"{settings.MEDIA_URL}{name}"
+
+    def open(self, source):
+        name = f"{source.public_id}.{source.format}" if source.format else source.public_id
+        return open(Path(settings.MEDIA_ROOT) / name, "rb")
+
+
+@lru_cache(maxsize=None)
+def get_backend(path=None):
+    return import_string(path or settings.IMAGE_URL_BACKEND)()
+
+
+def source_for(image):
+    """A hashable description of a CloudinaryField value, or None for anything else."""
+    public_id = getattr(image, "public_id", None)
+    if not public_id:
+        return None
+    return Source(public_id, getattr(image, "version", None), getattr(image, "format", None))
+
+
+@lru_cache(maxsize=4096)
+def _variant_urls(backend_path, source, variant):
+    backend = get_backend(backend_path)
+    if not backend.resizes:
+        # every width would be the same full-size file
+        return backend.url(source), ""
+    widths = VARIANTS[variant].widths
+    urls = [(backend.url(source, width), width) for width in widths]
+    # the middle width is a sensible src for browsers that ignore srcset
+    src = urls[len(urls) // 2][0]
+    return src, ", ".join(f"{url} {width}w" for url, width in urls)
+
+
+def responsive_urls(image, variant):
+    """(src, srcset, sizes) for an image in a named slot; srcset/sizes are empty
+    for images we can't transform (plain ImageFields, the local backend)."""
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown image variant {variant!r}")
+    if not image:
+        return "", "", ""
+
+    source = source_for(image)
+    if source is None:
+        return image.url, "", ""
+    src, srcset = _variant_urls(settings.IMAGE_URL_BACKEND, source, variant)
+    return src, srcset, VARIANTS[variant].sizes if srcset else ""
+
+
+def image_url(image, variant):
+    return responsive_urls(image, variant)[0]
+
+
+def open_original(image):
+    """The stored original of a CloudinaryField value, through the URL backend."""
+    source = source_for(image)
+    if source is None:
+        raise ValueError(f"Not a stored image: {image!r}")
+    return get_backend().open(source)
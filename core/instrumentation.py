@@ -0,0 +1,135 @@
+# core/instrumentation.py
+"""
+Hooks around the slow things a request does.
+
+install() wraps, once per process:
+
+    db          every SQL statement (an execute wrapper on each connection)
+    template    Template.render
+    cache       get/set/add/delete/... on every configured cache backend
+    http        requests.Session.send (the DPO gateway and any other API)
+    mail        EmailMessage.send (send_mail included)
+    cloudinary  cloudinary.utils.cloudinary_url (image URL building)
+
+Observers registered with add_observer() are called as
+observer(kind, label, info) at the start of each call. They return a context
+manager that is held for the duration of the call, or None when they are not
+interested, which is the common, cheap case. `info` is a dict that is filled
+in before the context manager exits, e.g. {"status": 502} for an HTTP call
+or {"error": "ReadTimeout"} when the call raised. For HTTP calls it holds
+the outgoing PreparedRequest under "request" from the start, so observers can
+add headers to it.
+"""
+import functools
+from contextlib import ExitStack
+
+from django.core.cache import caches
+from django.core.mail import EmailMessage
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+CACHE_METHODS = ("get", "set", "add", "delete", "get_many", "set_many", "delete_many", "incr", "decr", "touch",
+                 "has_key", "get_or_set")
+
+_observers = []
+_installed = False
+
+
+def add_observer(observer):
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def observed(kind, label, call, describe=None, info=None):
+    """Run `call()` inside every interested observer; `describe(result)` adds to info."""
+    if not _observers:
+        return call()
+    info = info if info is not None else {}
+    managers = [m for m in (observer(kind, label, info) for observer in _observers) if m is not None]
+    if not managers:
+        return call()
+    with ExitStack() as stack:
+        for manager in managers:
+            stack.enter_context(manager)
+        try:
+            result = call()
+        except Exception as exc:
+            info["error"] = type(exc).__name__
+            raise
+        if describe is not None:
+            info.update(describe(result))
+        return result
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    return observed("db", sql, lambda: execute(sql, params, many, context))
+
+
+def _add_sql_wrapper(connection, **kwargs):
+    # first in the list: execute_wrapper() pops the last one, and connections are
+    # usually opened inside some request's execute_wrapper() block
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _sql_wrapper)
+
+
+def _wrap(owner, name, kind, label, describe=None, start=None):
+    original = getattr(owner, name)
+    if getattr(original, "_instrumented", False):
+        return
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        info = start(*args, **kwargs) if start is not None else None
+        return observed(kind, label(*args, **kwargs), lambda: original(*args, **kwargs), describe, info)
+
+    wrapper._instrumented = True
+    setattr(owner, name, wrapper)
+
+
+def _http_label(session, request, **kwargs):
+    host = request.url.split("/")[2] if "://" in request.url else request.url
+    return f"{request.method} {host}"
+
+
+def _cache_label(method):
+    def label(backend, key=None, *args, **kwargs):
+        return f"{method} {key}" if isinstance(key, str) else method
+    return label
+
+
+def install():
+    """Wrap the hooked calls; safe to call more than once."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    connection_created.connect(_add_sql_wrapper, dispatch_uid="core.instrumentation")
+    for connection in connections.all(initialized_only=True):
+        _add_sql_wrapper(connection)
+
+    _wrap(Template, "render", "template", lambda template, *a, **kw: template.origin.template_name or "<string>")
+
+    for alias in caches:
+        backend = type(caches[alias])
+        for method in CACHE_METHODS:
+            _wrap(backend, method, "cache", _cache_label(method))
+
+    _wrap(EmailMessage, "send", "mail", lambda message, *a, **kw: f"send {len(message.recipients())} recipient(s)")
+
+    try:
+        import requests
+    except ImportError:
+        pass
+    else:
+        _wrap(requests.Session, "send", "http", _http_label,
+              describe=lambda response: {"status": response.status_code},
+              start=lambda session, request, **kwargs: {"request": request})
+
+    try:
+        from cloudinary import utils as cloudinary_utils
+    except ImportError:
+        pass
+    else:
+        _wrap(cloudinary_utils, "cloudinary_url", "cloudinary", lambda source, *a, **kw: "url")
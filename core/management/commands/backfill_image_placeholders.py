@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from core.media import INGESTED_FIELDS, READY, backfill_meta
+
+
+class Command(BaseCommand):
+    help = "Record the intrinsic size and blurred placeholder of product images ingested before they were computed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, help="Stop after this many images per field.")
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        for model, fields in INGESTED_FIELDS.items():
+            for field_name, status_field in fields.items():
+                missing = (
+                    model.objects.filter(**{status_field: READY, f"{field_name}_placeholder": ""})
+                    .exclude(**{f"{field_name}__isnull": True})
+                    .exclude(**{field_name: ""})
+                    .order_by("pk")
+                )
+                if options["limit"]:
+                    missing = missing[:options["limit"]]
+                for instance in missing.iterator():
+                    try:
+                        if backfill_meta(instance, field_name):
+                            done += 1
+                    except Exception as exc:
+                        failed += 1
+                        self.stderr.write(f"{model._meta.label} {instance.pk} {field_name}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recorded placeholders for {done} images, {failed} failed."
+        ))
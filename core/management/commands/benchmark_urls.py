@@ -0,0 +1,97 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every core/cart/chat/payments URL through the test client and report "
+        "p50/p95/p99 latency, queries and peak memory per URL, optionally compared with an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        who = parser.add_mutually_exclusive_group(required=True)
+        who.add_argument("--user", help="Username of a test account to log in as; its orders and inbox are read.")
+        who.add_argument("--anonymous", action="store_true", help="Benchmark logged out.")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--cold", action="store_true",
+                            help="Start every request with an empty cache (a fresh key version for the run's keys).")
+        parser.add_argument("--only", nargs="+", help="Only URL names containing one of these strings.")
+        parser.add_argument("--json", dest="json_path", help="Write the report to this file.")
+        parser.add_argument("--compare", help="An earlier --json report to compare against.")
+        parser.add_argument("--threshold", type=float, default=10.0,
+                            help="p95 growth (percent) that counts as a regression in --compare.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1")
+
+        user = None
+        if options["user"]:
+            user = User.objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}")
+
+        setup_test_environment()  # testserver host
+        try:
+            # budgets are reported here, not enforced; no mail leaves the machine,
+            # and the run's cache entries live under their own key prefix
+            with override_settings(
+                VIEW_BUDGET_MODE="log",
+                EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+                CACHES=benchmark.isolated_caches(),
+            ):
+                report = benchmark.run(
+                    user=user,
+                    iterations=options["iterations"],
+                    warmup=options["warmup"],
+                    cold=options["cold"],
+                    only=options["only"],
+                )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        finally:
+            teardown_test_environment()
+
+        self._print(report)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['json_path']}")
+
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                previous = json.load(fh)
+            rows = benchmark.compare(report, previous, options["threshold"])
+            self._print_comparison(rows)
+            regressed = [row for row in rows if row["regressed"]]
+            if regressed:
+                raise CommandError(f"{len(regressed)} URL(s) regressed against {options['compare']}.")
+
+    def _print(self, report):
+        meta = report["meta"]
+        self.stdout.write(f"user={meta['user'] or 'anonymous'} iterations={meta['iterations']} "
+                          f"cold={meta['cold']} db={meta['database']}")
+        self.stdout.write("dataset: " + ", ".join(f"{k}={v}" for k, v in meta["dataset"].items()))
+        self.stdout.write(f"{'url':<40} {'status':<10} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'peak kB':>9}")
+        for name, row in report["urls"].items():
+            self.stdout.write(
+                f"{name:<40} {','.join(map(str, row['status'])):<10} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+                f"{row['p99_ms']:>8} {row['queries']:>8} {row['peak_kb']:>9}"
+            )
+        for name, reason in report["skipped"].items():
+            self.stdout.write(f"{name:<40} skipped ({reason})")
+
+    def _print_comparison(self, rows):
+        self.stdout.write(f"{'url':<40} {'p95 before':>11} {'p95 now':>9} {'change':>8} {'queries':>9}")
+        for row in rows:
+            line = (
+                f"{row['name']:<40} {row['p95_before']:>11} {row['p95_now']:>9} {row['p95_change']:>7}% "
+                f"{row['queries_before']:>4}->{row['queries_now']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if row["regressed"] else line)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.queryplans import analyze, check, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, EXPLAIN the hot catalog/help/message/order queries "
+        "and fail if any of them falls back to a sequential scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=5000)
+        parser.add_argument("--messages", type=int, default=20000)
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every plan, not just failures.")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            ids = seed(products=options["products"], messages=options["messages"])
+            analyze()
+            results = check(ids)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        failed = [r for r in results if r.seq_scans]
+        for result in results:
+            if result.seq_scans:
+                self.stdout.write(self.style.ERROR(
+                    f"  SEQ SCAN  {result.query.name}: {', '.join(result.seq_scans)}"
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"  ok        {result.query.name}"))
+            if result.seq_scans or options["verbose_plans"]:
+                for line in result.plan.splitlines():
+                    self.stdout.write(f"              {line}")
+
+        if failed:
+            raise CommandError(f"{len(failed)} of {len(results)} hot queries use a sequential scan.")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} hot queries use an index."))
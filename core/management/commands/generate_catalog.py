@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import DEFAULTS, CatalogGenerator, scaled
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load a synthetic catalog (users, sellers, categories, products with price options "
+        "and images, reviews, orders, messages) into the configured database for benchmarking."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1.0,
+                            help="Multiply the default row counts (1.0 = 100k products, 2M reviews, 2M messages).")
+        for name in DEFAULTS:
+            parser.add_argument(f"--{name}", type=int, help=f"Override the {name} count.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Random seed; also prefixes usernames and slugs so runs can be stacked.")
+        parser.add_argument("--yes", action="store_true", help="Required when DEBUG is off.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["yes"]:
+            raise CommandError("DEBUG is off; pass --yes if you really mean to load synthetic data here.")
+
+        counts = scaled(options["scale"])
+        for name in DEFAULTS:
+            if options[name] is not None:
+                counts[name] = options[name]
+        if counts["sellers"] > counts["users"]:
+            raise CommandError("--sellers cannot be larger than --users")
+
+        self.stdout.write("Generating: " + ", ".join(f"{v} {k}" for k, v in counts.items()))
+        CatalogGenerator(counts, batch_size=options["batch_size"], seed=options["seed"],
+                         progress=self._progress).run()
+        self.stdout.write(self.style.SUCCESS("Done."))
+        self.stdout.write("Run `manage.py rebuild_message_search` to index the generated messages.")
+
+    def _progress(self, label, done, total):
+        # a line per ~10% rather than one per batch
+        step = max(1, total // 10)
+        if done == total or done // step != (done - 1) // step:
+            self.stdout.write(f"  {label}: {done}/{total}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.media import process_all, retryable_uploads
+
+
+class Command(BaseCommand):
+    help = "Push staged image uploads that failed or were left behind to the storage backend."
+
+    def handle(self, *args, **options):
+        upload_ids = retryable_uploads()
+        live = process_all(upload_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(upload_ids)} staged uploads, {live} now live."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.messaging import rebuild_inbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the inbox read model (Conversation and InboxCounter) from the messages. "
+        "Messages sent while it runs may be missed; run it when traffic is low."
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_inbox()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} conversations."))
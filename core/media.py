@@ -0,0 +1,249 @@
+# core/media.py
+"""
+Background media ingestion.
+
+Saving a product with a freshly uploaded image used to push the file to
+Cloudinary inside the request, serially for every admin inline. Now the file
+is written to a local staging area, the image is marked pending, and a small
+bounded thread pool pushes it to the storage backend after the request's
+transaction commits. The image field is filled in (and marked ready) when the
+upload finishes.
+
+Uploads that fail are retried by ``manage.py process_media_uploads``, which
+also drains anything left behind by a worker that died.
+"""
+import logging
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import UploadedFile
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .freshness import touch_products
+from .images import open_original
+from .models import MediaUpload, Product, ProductImage
+from .placeholders import describe, meta_fields
+
+logger = logging.getLogger(__name__)
+
+PENDING, READY, FAILED = "pending", "ready", "failed"
+
+# model -> {image field: status field}
+INGESTED_FIELDS = {
+    Product: {"main_image": "main_image_status"},
+    ProductImage: {"image": "status"},
+}
+
+# an upload "in progress" for this long belonged to a worker that died
+STALE_UPLOAD_MINUTES = 15
+
+
+# ---------- STORAGE BACKENDS ----------
+class CloudinaryUploader:
+    def upload(self, path, folder):
+        from cloudinary import uploader
+
+        return uploader.upload_resource(path, folder=folder, type="upload", resource_type="image")
+
+
+class StubUploader:
+    """
+    Offline stand-in for tests and development: copies the file under
+    MEDIA_ROOT where core.images.LocalBackend serves it from.
+    """
+    uploaded = []  # (path, folder) of every upload, for assertions
+
+    def upload(self, path, folder):
+        stem, ext = os.path.splitext(os.path.basename(path))
+        public_id = f"{folder}/{stem}"
+        target = Path(settings.MEDIA_ROOT) / f"{public_id}{ext}"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, target)
+        self.uploaded.append((path, folder))
+        return CloudinaryResource(
+            public_id=public_id, format=ext.lstrip(".") or None, version="1",
+            type="upload", resource_type="image",
+        )
+
+
+def get_uploader():
+    return import_string(settings.MEDIA_UPLOAD_BACKEND)()
+
+
+# ---------- STAGING ----------
+def take_uploads(instance):
+    """
+    Pull freshly uploaded files off `instance` before it is saved, so the
+    storage field doesn't upload them inline. The field keeps its previous
+    value (nothing, for a new object) and is marked pending.
+    """
+    fields = INGESTED_FIELDS.get(type(instance), {})
+    taken = {}
+    for field_name, status_field in fields.items():
+        value = getattr(instance, field_name)
+        if not isinstance(value, UploadedFile):
+            continue
+        taken[field_name] = value
+        previous = None
+        if instance.pk:
+            previous = type(instance).objects.filter(pk=instance.pk).values_list(field_name, flat=True).first()
+        setattr(instance, field_name, previous)
+        setattr(instance, status_field, PENDING)
+    return taken
+
+
+def _stage_file(uploaded):
+    root = Path(settings.MEDIA_STAGING_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    ext = os.path.splitext(uploaded.name)[1].lower()
+    path = root / f"{uuid.uuid4().hex}{ext}"
+    if hasattr(uploaded, "seek"):
+        uploaded.seek(0)
+    with open(path, "wb") as out:
+        for chunk in uploaded.chunks():
+            out.write(chunk)
+    return path
+
+
+def queue_uploads(instance, taken):
+    """Stage the files taken off a just-saved `instance` and hand them to the workers."""
+    content_type = ContentType.objects.get_for_model(instance)
+    for field_name, uploaded in taken.items():
+        upload = MediaUpload.objects.create(
+            content_type=content_type,
+            object_id=instance.pk,
+            field=field_name,
+            staged_path=str(_stage_file(uploaded)),
+            original_name=uploaded.name[:255],
+        )
+        transaction.on_commit(lambda upload_id=upload.id: submit(upload_id))
+
+
+# ---------- WORKERS ----------
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.MEDIA_UPLOAD_WORKERS, thread_name_prefix="media-upload"
+            )
+        return _executor
+
+
+def _run(upload_id):
+    try:
+        return process_upload(upload_id)
+    except Exception:
+        logger.exception("Media upload %s crashed", upload_id)
+        return False
+    finally:
+        close_old_connections()
+
+
+def submit(upload_id):
+    return _pool().submit(_run, upload_id)
+
+
+def process_upload(upload_id):
+    """Push one staged file to the storage backend; True when the image is live."""
+    now = timezone.now()
+    claimed = MediaUpload.objects.filter(id=upload_id, status__in=["pending", "failed"]).update(
+        status="uploading", attempts=F("attempts") + 1, started_at=now
+    )
+    if not claimed:
+        return False  # another worker has it, or it is already done
+
+    upload = MediaUpload.objects.select_related("content_type").get(id=upload_id)
+    model = upload.content_type.model_class()
+    status_field = INGESTED_FIELDS[model][upload.field]
+    folder = f"{model._meta.model_name}s"
+
+    try:
+        meta = meta_fields(upload.field, describe(upload.staged_path))
+    except Exception:
+        logger.warning("Could not read image %s for its placeholder", upload.staged_path, exc_info=True)
+        meta = {}
+
+    try:
+        resource = get_uploader().upload(upload.staged_path, folder=folder)
+    except Exception as exc:
+        logger.exception("Upload of %s failed", upload.staged_path)
+        MediaUpload.objects.filter(id=upload.id).update(status="failed", error=str(exc)[:1000])
+        if upload.attempts >= settings.MEDIA_UPLOAD_MAX_ATTEMPTS:
+            model.objects.filter(pk=upload.object_id).update(**{status_field: FAILED})
+            _touch_product(model, upload.object_id)
+        return False
+
+    newer = MediaUpload.objects.filter(
+        content_type=upload.content_type, object_id=upload.object_id, field=upload.field, id__gt=upload.id
+    ).exists()
+    with transaction.atomic():
+        # a later upload for the same field wins, whichever finishes first
+        if not newer:
+            model.objects.filter(pk=upload.object_id).update(
+                **{upload.field: resource.get_prep_value(), status_field: READY}, **meta
+            )
+            _touch_product(model, upload.object_id)
+        MediaUpload.objects.filter(id=upload.id).update(status="done", error="", finished_at=timezone.now())
+
+    try:
+        os.remove(upload.staged_path)
+    except OSError:
+        pass
+    return not newer
+
+
+def _touch_product(model, pk):
+    # queryset updates skip auto_now; catalog ETags (core.freshness) need the bump
+    if model is Product:
+        touch_products(pk=pk)
+    else:
+        touch_products(images__pk=pk)
+
+
+def retryable_uploads(now=None):
+    """Failed uploads with attempts left, and pending/stuck ones no worker is on."""
+    now = now or timezone.now()
+    stale = now - timedelta(minutes=STALE_UPLOAD_MINUTES)
+    # a worker that died mid-upload leaves the row "uploading"; let it be claimed again
+    MediaUpload.objects.filter(status="uploading", started_at__lt=stale).update(status="failed")
+    return list(
+        MediaUpload.objects.filter(status__in=["pending", "failed"], created_at__lt=now)
+        .filter(attempts__lt=settings.MEDIA_UPLOAD_MAX_ATTEMPTS)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def backfill_meta(instance, field_name):
+    """Compute the size and placeholder of an image that was ingested before
+    they were recorded; True when they were saved."""
+    image = getattr(instance, field_name)
+    if not image:
+        return False
+    with open_original(image) as f:
+        meta = meta_fields(field_name, describe(f))
+    type(instance).objects.filter(pk=instance.pk).update(**meta)
+    _touch_product(type(instance), instance.pk)
+    return True
+
+
+def process_all(upload_ids):
+    """Run uploads on the bounded pool and wait; returns how many went live."""
+    futures = [submit(upload_id) for upload_id in upload_ids]
+    return sum(1 for future in futures if future.result())
@@ -0,0 +1,260 @@
+# core/messaging.py
+"""
+Buyer/seller product conversations (core.Message).
+
+Shared by the HTTP views and the WebSocket consumer so both transports
+validate and record messages the same way.
+"""
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from archive.lookups import archived_conversation
+from archive.models import ArchivedCoreMessage
+
+from .models import Conversation, InboxCounter, Message, Product
+
+
+class MessagingError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def serialize_message(msg):
+    return {
+        "id": msg.id,
+        "product_id": msg.product_id,
+        "sender": msg.sender.username,
+        "sender_id": msg.sender_id,
+        "receiver": msg.receiver.username,
+        "receiver_id": msg.receiver_id,
+        "content": msg.content,
+        "timestamp": msg.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+        "read": msg.read,
+    }
+
+
+def send_product_message(sender, product_id, content, receiver_id=None):
+    """Record a message about a product; defaults the receiver to the product's seller."""
+    if not content:
+        raise MessagingError("Message is empty")
+
+    product = Product.objects.select_related("seller__user").filter(id=product_id).first()
+    if not product:
+        raise MessagingError("Invalid product")
+
+    # Determine receiver dynamically
+    if receiver_id:
+        receiver = User.objects.filter(id=receiver_id).first()
+        if not receiver:
+            raise MessagingError("Receiver not found")
+    else:
+        # fallback: send to seller
+        receiver = product.seller.user if product.seller else None
+        if not receiver:
+            raise MessagingError("Seller not found")
+
+    return Message.objects.create(
+        sender=sender,
+        receiver=receiver,
+        product=product,
+        content=content,
+    )
+
+
+def conversation_messages(user, product, since=0):
+    """The user's messages about `product` newer than message id `since`, oldest first."""
+    return (
+        Message.objects.filter(product=product, id__gt=since)
+        .filter(Q(sender=user) | Q(receiver=user))
+        .select_related("sender", "receiver")
+        .order_by("id")
+    )
+
+
+def unread_messages(user, product):
+    return Message.objects.filter(product=product, receiver=user, read=False)
+
+
+def sync_conversation(user, product, since=0):
+    """
+    The user's messages about `product` newer than message id `since`,
+    oldest first, with everything they have received marked read.
+
+    Returns (messages, read_ids, sender_ids) so callers can send read receipts.
+    """
+    messages = list(conversation_messages(user, product, since))
+    if not since:
+        # a full load includes the archived history; messages are archived long
+        # after any open client has synced past them, so incremental syncs skip it
+        messages = sorted(archived_conversation(user, product) + messages, key=lambda msg: msg.id)
+
+    unread = unread_messages(user, product)
+    if since:
+        # everything up to `since` was marked read by the sync that returned it
+        candidates = [m.id for m in messages if m.receiver_id == user.id and not m.read]
+        unread = unread.filter(id__in=candidates) if candidates else None
+
+    read_ids, unread_pairs = [], []
+    if unread is not None:
+        with transaction.atomic():
+            # locked, so a concurrent sync (another tab, the long-poll racing the
+            # page load) waits here and then finds these already read
+            unread_pairs = list(unread.select_for_update().values_list("id", "sender_id"))
+            read_ids = [msg_id for msg_id, _ in unread_pairs]
+            if read_ids:
+                # one UPDATE for the whole conversation instead of a save() per message
+                Message.objects.filter(id__in=read_ids, read=False).update(read=True)
+                record_read(user, product, unread_pairs)
+
+    flipped = set(read_ids)
+    for msg in messages:
+        if msg.id in flipped:
+            msg.read = True
+
+    return messages, read_ids, {sender_id for _, sender_id in unread_pairs}
+
+
+# ---------- INBOX READ MODEL ----------
+def conversation_sides(product_seller_user_id, sender_id, receiver_id):
+    """(buyer_id, seller_id) for a message; the product's seller is the seller side."""
+    if sender_id == product_seller_user_id:
+        return receiver_id, sender_id
+    # buyer writing to the seller (or, for seller-less products, to whoever answers)
+    return sender_id, receiver_id
+
+
+def record_new_message(msg):
+    """Fold a new message into its Conversation and the receiver's unread counter."""
+    if msg.sender_id == msg.receiver_id:
+        return
+
+    product = msg.product
+    seller_user_id = product.seller.user_id if product is not None and product.seller_id else None
+    buyer_id, seller_id = conversation_sides(seller_user_id, msg.sender_id, msg.receiver_id)
+    unread_field = "seller_unread" if msg.receiver_id == seller_id else "buyer_unread"
+
+    with transaction.atomic():
+        conversation, _ = Conversation.objects.get_or_create(
+            buyer_id=buyer_id, seller_id=seller_id, product_id=msg.product_id
+        )
+        # never let a late commit replace a newer last message
+        Conversation.objects.filter(pk=conversation.pk).filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lte=msg.timestamp)
+        ).update(
+            last_message=msg,
+            last_message_preview=msg.content[:255],
+            last_message_at=msg.timestamp,
+        )
+
+        if msg.read:
+            return
+        Conversation.objects.filter(pk=conversation.pk).update(**{unread_field: F(unread_field) + 1})
+        InboxCounter.objects.get_or_create(user_id=msg.receiver_id)
+        InboxCounter.objects.filter(pk=msg.receiver_id).update(unread=F("unread") + 1)
+
+
+def _thread(model, buyer_id, seller_id, product_id):
+    return model.objects.filter(
+        Q(sender_id=buyer_id, receiver_id=seller_id) | Q(sender_id=seller_id, receiver_id=buyer_id),
+        product_id=product_id,
+    )
+
+
+def record_deleted_message(msg):
+    """Take a deleted message out of its Conversation and the receiver's unread counter."""
+    if msg.sender_id == msg.receiver_id:
+        return
+
+    # the product may be going too (a cascade), so don't load it
+    seller_user_id = Product.objects.filter(pk=msg.product_id).values_list("seller__user_id", flat=True).first()
+    buyer_id, seller_id = conversation_sides(seller_user_id, msg.sender_id, msg.receiver_id)
+    unread_field = "seller_unread" if msg.receiver_id == seller_id else "buyer_unread"
+    conversation = Conversation.objects.filter(buyer_id=buyer_id, seller_id=seller_id, product_id=msg.product_id)
+
+    with transaction.atomic():
+        if not msg.read:
+            conversation.update(**{unread_field: Greatest(F(unread_field) - 1, 0)})
+            InboxCounter.objects.filter(pk=msg.receiver_id).update(unread=Greatest(F("unread") - 1, 0))
+
+        # the delete already set last_message to NULL; was it this message?
+        if not conversation.filter(last_message__isnull=True, last_message_at=msg.timestamp).exists():
+            return
+        hot = _thread(Message, buyer_id, seller_id, msg.product_id).order_by("-timestamp", "-id").first()
+        cold = _thread(ArchivedCoreMessage, buyer_id, seller_id, msg.product_id).order_by("-timestamp", "-id").first()
+        latest = max((m for m in (hot, cold) if m is not None), key=lambda m: m.timestamp, default=None)
+        if latest is None:
+            conversation.delete()
+            return
+        conversation.update(
+            last_message=latest if latest is hot else None,
+            last_message_preview=latest.content[:255],
+            last_message_at=latest.timestamp,
+        )
+
+
+def rebuild_inbox():
+    """
+    Recompute every Conversation and InboxCounter from the messages, hot and
+    archived (archived ones are all read). Returns the number of conversations.
+    """
+    seller_of = dict(Product.objects.values_list("id", "seller__user_id"))
+    conversations = {}
+    unread = Counter()
+
+    fields = ("id", "sender_id", "receiver_id", "product_id", "content", "timestamp", "read")
+    for model in (ArchivedCoreMessage, Message):
+        for msg_id, sender_id, receiver_id, product_id, content, timestamp, read in (
+            model.objects.order_by("id").values_list(*fields).iterator()
+        ):
+            if sender_id == receiver_id:
+                continue
+            buyer_id, seller_id = conversation_sides(seller_of.get(product_id), sender_id, receiver_id)
+            conv = conversations.setdefault(
+                (buyer_id, seller_id, product_id),
+                Conversation(buyer_id=buyer_id, seller_id=seller_id, product_id=product_id),
+            )
+            if conv.last_message_at is None or timestamp >= conv.last_message_at:
+                conv.last_message_id = msg_id if model is Message else None
+                conv.last_message_preview = content[:255]
+                conv.last_message_at = timestamp
+            if not read:
+                if receiver_id == seller_id:
+                    conv.seller_unread += 1
+                else:
+                    conv.buyer_unread += 1
+                unread[receiver_id] += 1
+
+    with transaction.atomic():
+        Conversation.objects.all().delete()
+        InboxCounter.objects.all().delete()
+        Conversation.objects.bulk_create(conversations.values(), batch_size=500)
+        InboxCounter.objects.bulk_create(
+            [InboxCounter(user_id=user_id, unread=count) for user_id, count in unread.items()], batch_size=500
+        )
+    return len(conversations)
+
+
+def record_read(reader, product, unread):
+    """Take messages the reader just read ((id, sender_id) pairs) off the unread counters."""
+    if not unread:
+        return
+
+    with transaction.atomic():
+        for sender_id, count in Counter(sender_id for _, sender_id in unread).items():
+            Conversation.objects.filter(seller=reader, buyer_id=sender_id, product=product).update(
+                seller_unread=Greatest(F("seller_unread") - count, 0)
+            )
+            Conversation.objects.filter(buyer=reader, seller_id=sender_id, product=product).update(
+                buyer_unread=Greatest(F("buyer_unread") - count, 0)
+            )
+        InboxCounter.objects.filter(pk=reader.pk).update(unread=Greatest(F("unread") - len(unread), 0))
+
+
+def unread_total(user):
+    return InboxCounter.objects.filter(pk=user.pk).values_list("unread", flat=True).first() or 0
@@ -0,0 +1,407 @@
+# core/metrics.py
+"""
+Prometheus metrics.
+
+Counters and histograms live in process memory, like the view counters in
+core.counters. Every METRICS_FLUSH_SECONDS, and when it exits, a worker that
+has served requests writes a snapshot of its totals to its own file in
+METRICS_DIR. /ops/metrics/ adds up the files of every worker on the host, including
+workers that have since exited so that counters never go backwards, and
+renders the sums in the Prometheus text format. Gunicorn workers therefore
+need a shared directory, not shared memory. A scrape folds the files of
+workers that are no longer running into one cumulative file, so the directory
+doesn't grow with every restart. On POSIX systems that is done under a
+lock on the directory. METRICS_DIR must not be shared across hosts, because
+whether a pid is running is only known locally.
+
+MetricsMiddleware records request latency, queries and DB time per request,
+and session writes, all labelled with the URL name. Outbound HTTP (the DPO
+gateway) and email sends are timed through core.instrumentation. Cache
+hit/miss counts come from core.caching and core.querycache when a snapshot
+is taken. Checkout outcomes are counted in the cart and payments views.
+"""
+import atexit
+import bisect
+import contextvars
+import json
+import os
+import re
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no compaction, files of exited workers are kept
+    fcntl = None
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import instrumentation
+
+PREFIX = "wazitrade_"
+EXITED_FILE = "exited-workers.json"  # {"files": [compacted file names], "metrics": snapshot}
+LOCK_FILE = ".lock"
+WORKER_FILE = re.compile(r"^(\d+)-\d+\.json$")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _labels(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(k), v if not isinstance(v, list) else list(v)] for k, v in self._values.items()]
+        return {"kind": self.kind, "help": self.documentation, "labelnames": list(self.labelnames),
+                "values": values, **self._extra()}
+
+    def _extra(self):
+        return {}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        key = self._labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # per bucket (not cumulative), then +Inf, sum
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def _extra(self):
+        return {"buckets": list(self.buckets)}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []  # callables returning {name: snapshot} of totals kept elsewhere
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._path = None
+        self._pid = None
+        self._served_pid = None  # the process that last handled a request
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def snapshot(self):
+        data = {metric.name: metric.snapshot() for metric in self.metrics}
+        for collector in self.collectors:
+            data.update(collector())
+        return data
+
+    def _file(self):
+        # a fresh file per process, also after a fork
+        if self._pid != os.getpid() or os.path.dirname(self._path) != str(settings.METRICS_DIR):
+            self._pid = os.getpid()
+            self._path = os.path.join(settings.METRICS_DIR, f"{self._pid}-{time.time_ns()}.json")
+        return self._path
+
+    def flush(self):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            _write(self._file(), self.snapshot())
+
+    def mark_served(self):
+        self._served_pid = os.getpid()
+
+    @property
+    def served(self):
+        """Whether this process has handled a request (not inherited through a fork)."""
+        return self._served_pid == os.getpid()
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_SECONDS:
+            self.flush()
+
+
+registry = Registry()
+
+
+def _merge(total, snapshot):
+    for name, metric in snapshot.items():
+        merged = total.setdefault(name, {**metric, "values": {}})
+        for labels, value in metric["values"]:
+            key = tuple(labels)
+            if isinstance(value, list):
+                current = merged["values"].get(key) or [0] * len(value)
+                merged["values"][key] = [a + b for a, b in zip(current, value)]
+            else:
+                merged["values"][key] = merged["values"].get(key, 0) + value
+
+
+def _as_snapshot(total):
+    return {name: {**metric, "values": [[list(k), v] for k, v in metric["values"].items()]}
+            for name, metric in total.items()}
+
+
+def _read(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None  # being replaced right now; it is counted on the next scrape
+
+
+def _write(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # running as another user
+    return True
+
+
+@contextmanager
+def _locked(exclusive):
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(settings.METRICS_DIR, LOCK_FILE), "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _worker_files():
+    return sorted(f for f in os.listdir(settings.METRICS_DIR) if WORKER_FILE.match(f))
+
+
+def _exited():
+    return _read(os.path.join(settings.METRICS_DIR, EXITED_FILE)) or {"files": [], "metrics": {}}
+
+
+def compact():
+    """Fold the files of workers that have exited into EXITED_FILE and delete them."""
+    if fcntl is None:
+        return
+    with _locked(exclusive=True):
+        files = _worker_files()
+        exited = _exited()
+        # a crash after writing EXITED_FILE but before deleting leaves files it already counts
+        done = [f for f in exited["files"] if f in files]
+        dead = [f for f in files if f not in done and not _running(int(WORKER_FILE.match(f).group(1)))]
+        if not dead and done == exited["files"]:
+            return
+        total = {}
+        _merge(total, exited["metrics"])
+        for filename in dead:
+            snapshot = _read(os.path.join(settings.METRICS_DIR, filename))
+            if snapshot is not None:
+                _merge(total, snapshot)
+        _write(os.path.join(settings.METRICS_DIR, EXITED_FILE),
+               {"files": done + dead, "metrics": _as_snapshot(total)})
+        for filename in done + dead:
+            os.remove(os.path.join(settings.METRICS_DIR, filename))
+        _write(os.path.join(settings.METRICS_DIR, EXITED_FILE), {"files": [], "metrics": _as_snapshot(total)})
+
+
+def collect():
+    """Sums over every worker's last snapshot (this worker's is written first)."""
+    registry.flush()
+    compact()
+    total = {}
+    with _locked(exclusive=False):
+        exited = _exited()
+        _merge(total, exited["metrics"])
+        for filename in _worker_files():
+            if filename in exited["files"]:
+                continue
+            snapshot = _read(os.path.join(settings.METRICS_DIR, filename))
+            if snapshot is not None:
+                _merge(total, snapshot)
+    return total
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def exposition(total):
+    """Prometheus text format (version 0.0.4)."""
+    lines = []
+    for name in sorted(total):
+        metric = total[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labelnames"]
+        for values, value in sorted(metric["values"].items()):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_label_text(names, values)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric["buckets"] + ["+Inf"], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_label_text(names, values, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(names, values)} {value[-1]}")
+            lines.append(f"{name}_count{_label_text(names, values)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# -- the metrics --
+
+request_latency = Histogram("http_request_duration_seconds", "Request latency by URL name.",
+                            ["view", "method", "status"])
+request_queries = Histogram("db_queries_per_request", "SQL queries per request.", ["view"], QUERY_BUCKETS)
+request_db_time = Histogram("db_time_per_request_seconds", "Time spent in SQL per request.", ["view"])
+session_writes = Counter("session_writes_total", "Requests that saved their session.", ["view"])
+outbound_latency = Histogram("outbound_http_duration_seconds",
+                             "Outbound HTTP calls (DPO gateway and other APIs) by host and outcome.",
+                             ["host", "method", "outcome"])
+email_latency = Histogram("email_send_duration_seconds", "EmailMessage.send calls by outcome.", ["outcome"])
+checkouts = Counter("checkouts_total", "Checkout and payment outcomes.", ["flow", "outcome"])
+
+
+def _cache_collector():
+    from .caching import stats as cache_stats
+    from .querycache import stats as query_cache_stats
+
+    def counter(name, documentation, labelnames, counts):
+        return {PREFIX + name: {"kind": "counter", "help": documentation, "labelnames": labelnames,
+                                "values": [[list(key), n] for key, n in counts.items()]}}
+    return {
+        **counter("cache_requests_total", "Tiered cache lookups by key family and outcome.",
+                  ["family", "outcome"], cache_stats.snapshot()),
+        **counter("query_cache_requests_total", "Query cache lookups by queryset name and outcome.",
+                  ["name", "outcome"], query_cache_stats.snapshot()),
+    }
+
+
+registry.collectors.append(_cache_collector)
+
+
+# -- per-request accounting --
+
+class _RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+@contextmanager
+def _timed_db(stats):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+@contextmanager
+def _timed(histogram, info, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if "error" in info:
+            outcome = info["error"]
+        elif "status" in info:
+            outcome = f"{info['status'] // 100}xx"
+        else:
+            outcome = "ok"
+        histogram.observe(time.perf_counter() - started, outcome=outcome, **labels)
+
+
+def _observer(kind, label, info):
+    if kind == "db":
+        stats = _current.get()
+        return _timed_db(stats) if stats is not None else None
+    if kind == "http":
+        method, _, host = label.partition(" ")
+        return _timed(outbound_latency, info, host=host, method=method)
+    if kind == "mail":
+        return _timed(email_latency, info)
+    return None
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrumentation.install()
+        instrumentation.add_observer(_observer)
+
+    def __call__(self, request):
+        stats = _RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            match = request.resolver_match
+            view = match.view_name if match and match.view_name else "<unresolved>"
+            request_latency.observe(elapsed, view=view, method=request.method, status=status)
+            request_queries.observe(stats.queries, view=view)
+            request_db_time.observe(stats.db_seconds, view=view)
+            session = getattr(request, "session", None)
+            if session is not None and (session.modified or settings.SESSION_SAVE_EVERY_REQUEST) \
+                    and not session.is_empty():
+                session_writes.inc(view=view)
+            registry.mark_served()
+            registry.maybe_flush()
+        return response
+
+
+def _flush_at_exit():
+    # management commands and test runs never served a request; they leave no file
+    if settings.TESTING or not registry.served:
+        return
+    registry.flush()
+
+
+# don't lose the last few seconds of a worker's counts
+atexit.register(_flush_at_exit)
@@ -0,0 +1,25 @@
+# core/migration_operations.py
+"""
+Migration operations shared by the apps.
+
+AddIndexConcurrently builds the index with CREATE INDEX CONCURRENTLY on
+PostgreSQL, so adding an index to a busy table doesn't block writes while it
+builds; other databases get a plain CREATE INDEX. Postgres can't do that
+inside a transaction, so migrations using it must set `atomic = False`.
+"""
+from django.db import migrations
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    def _concurrently(self, schema_editor):
+        return {"concurrently": True} if schema_editor.connection.vendor == "postgresql" else {}
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, **self._concurrently(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, **self._concurrently(schema_editor))
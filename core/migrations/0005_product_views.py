@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_promotion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='views',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='helparticle',
+            name='is_popular',
+            field=models.BooleanField(default=False, editable=False, help_text='Set automatically for the most viewed articles'),
+        ),
+        migrations.AlterField(
+            model_name='helparticle',
+            name='views',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+def backfill_conversations(apps, schema_editor):
+    """Build the inbox read model from the messages that already exist."""
+    Message = apps.get_model('core', 'Message')
+    Product = apps.get_model('core', 'Product')
+    Conversation = apps.get_model('core', 'Conversation')
+    InboxCounter = apps.get_model('core', 'InboxCounter')
+
+    seller_of = dict(Product.objects.values_list('id', 'seller__user_id'))
+    conversations = {}
+    unread = {}
+
+    rows = Message.objects.order_by('id').values_list(
+        'id', 'sender_id', 'receiver_id', 'product_id', 'content', 'timestamp', 'read'
+    )
+    for msg_id, sender_id, receiver_id, product_id, content, timestamp, read in rows.iterator():
+        if sender_id == receiver_id:
+            continue
+        # same rule as core.messaging.conversation_sides
+        if sender_id == seller_of.get(product_id):
+            buyer_id, seller_id = receiver_id, sender_id
+        else:
+            buyer_id, seller_id = sender_id, receiver_id
+
+        conv = conversations.setdefault(
+            (buyer_id, seller_id, product_id),
+            Conversation(buyer_id=buyer_id, seller_id=seller_id, product_id=product_id),
+        )
+        if conv.last_message_at is None or timestamp >= conv.last_message_at:
+            conv.last_message_id = msg_id
+            conv.last_message_preview = content[:255]
+            conv.last_message_at = timestamp
+        if not read:
+            if receiver_id == seller_id:
+                conv.seller_unread += 1
+            else:
+                conv.buyer_unread += 1
+            unread[receiver_id] = unread.get(receiver_id, 0) + 1
+
+    Conversation.objects.bulk_create(conversations.values(), batch_size=500)
+    InboxCounter.objects.bulk_create(
+        [InboxCounter(user_id=user_id, unread=count) for user_id, count in unread.items()],
+        batch_size=500,
+    )
+
+
+def clear_conversations(apps, schema_editor):
+    apps.get_model('core', 'Conversation').objects.all().delete()
+    apps.get_model('core', 'InboxCounter').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_conversation_inbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_conversations, clear_conversations),
+    ]
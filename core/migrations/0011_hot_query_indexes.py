@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:55
+
+from django.db import migrations, models
+
+from core.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False  # CREATE INDEX CONCURRENTLY on PostgreSQL
+
+    dependencies = [
+        ('core', '0010_catalog_updated_at'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('approved', True)), fields=['-created_at'],
+                               name='product_listed_new'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('approved', True)), fields=['category', '-created_at'],
+                               name='product_listed_by_category'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('approved', True)), fields=['subcategory', '-created_at'],
+                               name='product_listed_by_subcat'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('approved', True)), fields=['-views'],
+                               name='product_listed_popular'),
+        ),
+        AddIndexConcurrently(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'read'], name='message_receiver_unread'),
+        ),
+        AddIndexConcurrently(
+            model_name='message',
+            index=models.Index(fields=['product', 'sender', 'receiver', 'timestamp'], name='message_thread'),
+        ),
+        AddIndexConcurrently(
+            model_name='helparticle',
+            index=models.Index(fields=['category', 'is_published'], name='helparticle_category_published'),
+        ),
+    ]
@@ -1,7 +1,8 @@
 # core/models.py
 from django.db import models
-from django.db.models import Avg
+from django.db.models import Avg, Q
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 
 from django.utils.text import slugify
 
@@ -16,12 +17,15 @@ from cloudinary.models import CloudinaryField
 
 from django.db import models
 
+from .placeholders import meta_for
+
 # ---------- CATEGORY ----------
 class Category(models.Model):
     name = models.CharField(max_length=150)
     slug = models.SlugField(unique=True, blank=True)
     description = models.TextField(blank=True, null=True)
     image = CloudinaryField("image", blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
    
 
 
@@ -47,6 +51,7 @@ class SubCategory(models.Model):
     name = models.CharField(max_length=150)
     slug = models.SlugField(unique=True, blank=True)
     description = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.category.name} - {self.name}"
@@ -68,12 +73,25 @@ class Seller(models.Model):
         return self.business_name
 
 
+# upload state of images ingested in the background (core.media)
+UPLOAD_STATUS_CHOICES = [
+    ('pending', 'Pending'),
+    ('ready', 'Ready'),
+    ('failed', 'Failed'),
+]
+
+
 class Product(models.Model):
 
     seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name="products", null=True, blank=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="products")
     subcategory = models.ForeignKey(SubCategory, on_delete=models.SET_NULL, related_name="products", null=True, blank=True)
     main_image = CloudinaryField("image", blank=True, null=True)
+    main_image_status = models.CharField(max_length=10, choices=UPLOAD_STATUS_CHOICES, default='ready', editable=False)
+    # intrinsic size and blurred preview, filled in at ingestion (core.placeholders)
+    main_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    main_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    main_image_placeholder = models.TextField(blank=True, editable=False)
     name = models.CharField(max_length=255)
     short_description = models.CharField(max_length=300, blank=True, null=True)
      #color_options = models.JSONField(blank=True, null=True)  # store available colors ['red','blue']
@@ -97,6 +115,8 @@ class Product(models.Model):
     shipping_info = models.TextField(blank=True, null=True)
     product_protection = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # also bumped when its images, price options or reviews change (core.freshness)
+    updated_at = models.DateTimeField(auto_now=True)
 
     related_searches = models.ManyToManyField(
         'self',
@@ -111,6 +131,20 @@ class Product(models.Model):
     related_name='recommended_products'
     )
     approved = models.BooleanField(default=False)
+    views = models.PositiveIntegerField(default=0, editable=False)  # flushed from core.counters
+
+    class Meta:
+        # listings: approved products, newest first, site-wide / per category / per subcategory,
+        # and most viewed first on the home page.
+        # Partial, because SQLite only matches `WHERE "approved"` against an index with the same condition.
+        indexes = [
+            models.Index(fields=['-created_at'], name='product_listed_new', condition=Q(approved=True)),
+            models.Index(fields=['category', '-created_at'], name='product_listed_by_category',
+                         condition=Q(approved=True)),
+            models.Index(fields=['subcategory', '-created_at'], name='product_listed_by_subcat',
+                         condition=Q(approved=True)),
+            models.Index(fields=['-views'], name='product_listed_popular', condition=Q(approved=True)),
+        ]
 
 
     def __str__(self):
@@ -131,6 +165,15 @@ class Product(models.Model):
     def review_count(self):
         return self.reviews.count()
 
+    @property
+    def main_image_meta(self):
+        return meta_for(self, 'main_image')
+
+    @property
+    def ready_images(self):
+        """Gallery images whose upload has finished."""
+        return self.images.filter(status='ready')
+
 
 
 class PriceOption(models.Model):
@@ -169,11 +212,50 @@ class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = CloudinaryField("image")
     color = models.CharField(max_length=50, blank=True, null=True)  # color for this image
+    status = models.CharField(max_length=10, choices=UPLOAD_STATUS_CHOICES, default='ready', editable=False)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.product.name}"
 
+    @property
+    def image_meta(self):
+        return meta_for(self, 'image')
+
+
+
+
+class MediaUpload(models.Model):
+    """
+    An uploaded image waiting in the local staging area to be pushed to the
+    storage backend by a background worker (core.media).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('uploading', 'Uploading'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    field = models.CharField(max_length=50)
+    staged_path = models.CharField(max_length=500)
+    original_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['content_type', 'object_id', 'field'], name='media_upload_target')]
 
+    def __str__(self):
+        return f"{self.content_type.model} #{self.object_id} {self.field} ({self.status})"
 
 
 # ---------- CART ITEM ----------
@@ -216,10 +298,57 @@ class Message(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['receiver', 'read'], name='message_receiver_unread'),
+            models.Index(fields=['product', 'sender', 'receiver', 'timestamp'], name='message_thread'),
+        ]
+
     def __str__(self):
         return f"{self.sender} → {self.receiver} ({self.read})"
 
 
+# ---------- INBOX READ MODEL ----------
+class Conversation(models.Model):
+    """
+    One buyer/seller thread about a product, kept in sync from core.messaging
+    so inbox pages never have to scan Message.
+    """
+    buyer = models.ForeignKey(User, related_name='buyer_conversations', on_delete=models.CASCADE)
+    seller = models.ForeignKey(User, related_name='seller_conversations', on_delete=models.CASCADE)
+    product = models.ForeignKey('Product', related_name='conversations', on_delete=models.CASCADE, null=True, blank=True)
+    last_message = models.ForeignKey(Message, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    last_message_preview = models.CharField(max_length=255, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    buyer_unread = models.PositiveIntegerField(default=0)
+    seller_unread = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['buyer', 'seller', 'product'], name='uniq_conversation'),
+            # NULLs are distinct in a unique constraint, so threads without a product need their own
+            models.UniqueConstraint(fields=['buyer', 'seller'], condition=models.Q(product__isnull=True),
+                                    name='uniq_conversation_no_product'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', '-last_message_at'], name='conversation_seller_inbox'),
+            models.Index(fields=['buyer', '-last_message_at'], name='conversation_buyer_inbox'),
+        ]
+
+    def __str__(self):
+        return f"{self.buyer} ↔ {self.seller} about {self.product}"
+
+
+class InboxCounter(models.Model):
+    """Total unread messages per user: the unread badge is a single primary-key read."""
+    user = models.OneToOneField(User, primary_key=True, related_name='inbox_counter', on_delete=models.CASCADE)
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user}: {self.unread} unread"
+
+
 
 class Deal(models.Model):
     name = models.CharField(max_length=200)
@@ -281,10 +410,13 @@ class HelpArticle(models.Model):
     slug = models.SlugField(unique=True)
     summary = models.CharField(max_length=255)
     content = models.TextField()
-    views = models.PositiveIntegerField(default=0)
-    is_popular = models.BooleanField(default=False)
+    views = models.PositiveIntegerField(default=0, editable=False)  # flushed from core.counters
+    is_popular = models.BooleanField(default=False, editable=False, help_text="Set automatically for the most viewed articles")
     is_published = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['category', 'is_published'], name='helparticle_category_published')]
+
     def __str__(self):
         return self.title
 
@@ -0,0 +1,134 @@
+# core/pagecache.py
+"""
+Full-page cache for anonymous catalog and help pages.
+
+Only GET/HEAD requests to PAGE_CACHE_VIEWS are cached, and only for visitors
+with nothing of their own on the page: no signed-in user, no cart in the
+session and no pending flash messages. Entries are keyed on the path and the
+query string (sorted, with tracking parameters dropped).
+
+Each entry records the catalog version it was rendered under. Saving a
+product, category, promotion or help article bumps the version
+(invalidate_pages), which makes every entry stale at once without deleting
+anything. A stale entry is still served while a single request, holding a
+short lock, renders the replacement. When that render fails on a database
+error, the stale page is served instead of the error.
+"""
+import hashlib
+import logging
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.utils.cache import get_conditional_response
+
+from .counters import COUNTERS
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "pagecache:version"
+
+
+def catalog_version():
+    return cache.get_or_set(VERSION_KEY, time.time_ns, None)
+
+
+def invalidate_pages():
+    """Mark every cached page stale; they are re-rendered on their next request."""
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def page_key(request):
+    params = sorted(
+        (k, v) for k, values in request.GET.lists() for v in values
+        if v and k not in settings.PAGE_CACHE_IGNORED_PARAMS and not k.startswith("utm_")
+    )
+    raw = f"{request.path}?{urlencode(params)}"
+    return "pagecache:" + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _anonymous(request):
+    """True when nothing on the page can be specific to this visitor."""
+    if "messages" in request.COOKIES:
+        return False
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    session = request.session
+    return not (SESSION_KEY in session or session.get(settings.CART_SESSION_ID) or session.get("_messages"))
+
+
+class PageCacheMiddleware:
+    """Must come after the session, auth and messages middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, "_page_cache_key", None)
+        if key is None:
+            return response
+        if not getattr(request, "_page_cache_served", False) and self._storable(request, response):
+            cache.set(key, {
+                "version": request._page_cache_version,
+                "fresh_until": time.time() + settings.PAGE_CACHE_SECONDS,
+                "response": response,
+                "views": getattr(request, "counted_views", []),
+            }, settings.PAGE_CACHE_SECONDS + settings.PAGE_CACHE_STALE_SECONDS)
+            response.headers["X-Page-Cache"] = "miss"
+        if getattr(request, "_page_cache_locked", False):
+            cache.delete(key + ":lock")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return None
+        if request.resolver_match.view_name not in settings.PAGE_CACHE_VIEWS:
+            return None
+        try:
+            if not _anonymous(request):
+                return None
+            version = catalog_version()
+        except DatabaseError:
+            return None  # can't tell whose session it is
+
+        key = request._page_cache_key = page_key(request)
+        request._page_cache_version = version
+        entry = request._page_cache_entry = cache.get(key)
+        if entry is None:
+            return None
+        if entry["version"] == version and time.time() < entry["fresh_until"]:
+            return self._serve(request, entry, "hit")
+        if cache.add(key + ":lock", 1, settings.PAGE_CACHE_LOCK_SECONDS):
+            request._page_cache_locked = True
+            return None  # this request renders the fresh copy
+        return self._serve(request, entry, "stale")
+
+    def process_exception(self, request, exception):
+        entry = getattr(request, "_page_cache_entry", None)
+        if entry is None or not isinstance(exception, DatabaseError):
+            return None
+        logger.warning("Serving stale %s after a database error", request.path, exc_info=exception)
+        return self._serve(request, entry, "stale-error")
+
+    def _storable(self, request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")  # the page holds a csrf token
+        )
+
+    def _serve(self, request, entry, state):
+        request._page_cache_served = True
+        response = entry["response"]
+        response.headers["X-Page-Cache"] = state
+        # 304 when the visitor already has this copy
+        response = get_conditional_response(request, etag=response.get("ETag"), response=response)
+        if request.method == "GET" and response.status_code == 200:  # a page view, as in the view itself
+            for label, pk in entry["views"]:
+                COUNTERS[label].hit(pk)
+        return response
@@ -0,0 +1,171 @@
+# core/profiling.py
+"""
+Sampling request profiler.
+
+ProfilingMiddleware profiles a request when a staff user sends the
+REQUEST_PROFILE_HEADER ("X-Profile: 1", or "X-Profile: cprofile" to also run
+cProfile), and it profiles a random REQUEST_PROFILE_SAMPLE_RATE fraction of
+all other requests. A profile splits the request's wall time into SQL,
+template rendering, cache calls, outbound HTTP (the DPO gateway), mail and
+Cloudinary URL building, using the hooks in core.instrumentation. Time spent
+inside a nested call counts once, towards the innermost call; SQL run lazily
+while a template renders is SQL, not template. Whatever is left over is
+"python". The slowest individual calls are kept with their SQL or labels.
+
+Profiles go into a ring buffer of REQUEST_PROFILE_BUFFER_SIZE slots in the
+shared cache, so all workers write to the same buffer. Staff browse it at
+/ops/profiles/ (an admin page) or /ops/profiles.json.
+"""
+import cProfile
+import contextvars
+import io
+import pstats
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import instrumentation
+
+KINDS = ("db", "template", "cache", "http", "mail", "cloudinary")
+SEQ_KEY = "profiles:seq"
+SLOT_KEY = "profiles:slot:%d"
+SLOWEST_CALLS = 10
+
+_active = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = dict.fromkeys(KINDS, 0.0)
+        self.calls = dict.fromkeys(KINDS, 0)
+        self.slowest = []  # (seconds, kind, label)
+        self._open = []  # [kind, resumed at, started at] of the calls in progress
+
+    @contextmanager
+    def timing(self, kind, label):
+        now = time.perf_counter()
+        parent = self._open[-1] if self._open else None
+        if parent is not None:
+            self.seconds[parent[0]] += now - parent[1]  # pause the enclosing call
+        self._open.append([kind, now, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, resumed, started = self._open.pop()
+            self.seconds[kind] += now - resumed
+            if parent is None or parent[0] != kind:  # a cache call inside a cache call is one call
+                self.calls[kind] += 1
+            if parent is not None:
+                parent[1] = now
+            self._keep_slowest(now - started, kind, label)
+
+    def _keep_slowest(self, seconds, kind, label):
+        if len(self.slowest) < SLOWEST_CALLS or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, kind, str(label)[:500]))
+            self.slowest.sort(key=lambda call: call[0], reverse=True)
+            del self.slowest[SLOWEST_CALLS:]
+
+    def as_dict(self, request, response, trigger):
+        total = time.perf_counter() - self.started
+        breakdown = {kind: round(s * 1000, 2) for kind, s in self.seconds.items()}
+        breakdown["python"] = round(max(0.0, total - sum(self.seconds.values())) * 1000, 2)
+        match = request.resolver_match
+        return {
+            "at": timezone.now().isoformat(),
+            "method": request.method,
+            "path": request.get_full_path()[:500],
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "user": request.user.pk if getattr(request, "user", None) and request.user.is_authenticated else None,
+            "trigger": trigger,
+            "total_ms": round(total * 1000, 2),
+            "breakdown_ms": breakdown,
+            "calls": self.calls,
+            "slowest": [{"kind": k, "ms": round(s * 1000, 2), "label": label} for s, k, label in self.slowest],
+        }
+
+
+def _observer(kind, label, info):
+    profile = _active.get()
+    return profile.timing(kind, label) if profile is not None else None
+
+
+# -- ring buffer --
+
+def save(record):
+    cache.add(SEQ_KEY, 0, None)
+    record["id"] = cache.incr(SEQ_KEY)
+    cache.set(SLOT_KEY % (record["id"] % settings.REQUEST_PROFILE_BUFFER_SIZE), record,
+              settings.REQUEST_PROFILE_TTL)
+    return record["id"]
+
+
+def recent():
+    """Stored profiles, newest first, without their cProfile output."""
+    keys = [SLOT_KEY % slot for slot in range(settings.REQUEST_PROFILE_BUFFER_SIZE)]
+    records = [
+        {k: v for k, v in record.items() if k != "cprofile"}
+        for record in cache.get_many(keys).values()
+    ]
+    return sorted(records, key=lambda record: record["id"], reverse=True)
+
+
+def get(profile_id):
+    record = cache.get(SLOT_KEY % (profile_id % settings.REQUEST_PROFILE_BUFFER_SIZE))
+    return record if record and record["id"] == profile_id else None
+
+
+def _cprofile_text(profiler):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+    return out.getvalue()
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrumentation.install()
+        instrumentation.add_observer(_observer)
+
+    def _trigger(self, request):
+        value = request.headers.get(settings.REQUEST_PROFILE_HEADER)
+        if value and request.user.is_staff:
+            return "cprofile" if value.lower() == "cprofile" else "header"
+        if settings.REQUEST_PROFILE_SAMPLE_RATE and random.random() < settings.REQUEST_PROFILE_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    def __call__(self, request):
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        profiler = None
+        if trigger == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is already running in this thread
+                profiler = None
+        token = _active.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _active.reset(token)
+            if profiler is not None:
+                profiler.disable()
+
+        record = profile.as_dict(request, response, trigger)
+        if profiler is not None:
+            record["cprofile"] = _cprofile_text(profiler)
+        profile_id = save(record)
+        if trigger != "sample":
+            response["X-Profile-Id"] = str(profile_id)
+        return response
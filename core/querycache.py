@@ -0,0 +1,108 @@
+# core/querycache.py
+"""
+Cache-aside for hot, read-mostly querysets.
+
+    promotion = cached_first(Promotion.objects.filter(active=True), timeout=300)
+    subcategories = cached(SubCategory.objects.filter(category_id=category_id))
+
+What is cached is the rows, one tuple of column values per object, under a
+fingerprint of the SQL and its parameters. Model instances are rebuilt with
+Model.from_db on every read, so they behave like freshly loaded objects and
+the cache never holds pickled models.
+
+Every table a query reads has a generation number, and it is part of the
+key. Saving or deleting a row of a tracked model (QUERY_CACHE_MODELS) bumps
+its table's generation. Every cached query over that table then misses and
+is read again, and nothing has to be found and deleted. Queryset .update()
+sends no signals, so code that uses it on a tracked model calls bump()
+itself.
+
+Only plain querysets are accepted. select_related, prefetch_related,
+annotations and values() would be silently lost, so they raise.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from .caching import CacheStats
+
+GEN_KEY = "qc:gen:%s"
+
+stats = CacheStats()
+
+
+def bump(model):
+    """Invalidate every cached query that reads `model`'s table."""
+    cache.set(GEN_KEY % model._meta.db_table, time.time_ns(), None)
+
+
+def generations(*models):
+    """The current generation of each model's table (a time.time_ns() value)."""
+    keys = [GEN_KEY % model._meta.db_table for model in models]
+    gens = cache.get_many(keys)
+    # a table that hasn't changed since the cache was emptied starts a generation now
+    return [gens[key] if key in gens else cache.get_or_set(key, time.time_ns, None) for key in keys]
+
+
+def _bump_on_change(sender, **kwargs):
+    bump(sender)
+
+
+def track(*models):
+    """Bump the table generation whenever a row of `models` is saved or deleted."""
+    for model in models:
+        uid = f"querycache:{model._meta.label_lower}"
+        post_save.connect(_bump_on_change, sender=model, dispatch_uid=uid, weak=False)
+        post_delete.connect(_bump_on_change, sender=model, dispatch_uid=uid, weak=False)
+
+
+def _check(queryset):
+    query = queryset.query
+    if queryset._prefetch_related_lookups or query.select_related or query.annotations or queryset._fields:
+        raise ValueError(
+            "cached() only handles plain querysets "
+            "(no select_related/prefetch_related/annotate/values)"
+        )
+
+
+def _key(queryset):
+    compiler = queryset.query.get_compiler(queryset.db)
+    sql, params = compiler.as_sql()
+    tables = sorted(
+        {queryset.model._meta.db_table}
+        | {join.table_name for join in compiler.query.alias_map.values()}
+    )
+    gens = cache.get_many([GEN_KEY % t for t in tables])
+    raw = repr((queryset.db, sql, params, [gens.get(GEN_KEY % t, 0) for t in tables]))
+    return "qc:" + hashlib.md5(raw.encode()).hexdigest()
+
+
+def cached(queryset, timeout=None, name=None):
+    """The objects of `queryset`, from its cached rows when they are current."""
+    _check(queryset)
+    model = queryset.model
+    name = name or model._meta.label_lower
+    attnames = [f.attname for f in model._meta.concrete_fields]
+    key = _key(queryset)
+
+    rows = cache.get(key)
+    if rows is None:
+        stats.record(name, "miss")
+        rows = list(queryset.values_list(*attnames))
+        cache.set(key, rows, settings.QUERY_CACHE_TIMEOUT if timeout is None else timeout)
+    else:
+        stats.record(name, "hit")
+
+    db = queryset.db
+    return [model.from_db(db, attnames, row) for row in rows]
+
+
+def cached_first(queryset, timeout=None, name=None):
+    """Like queryset.first(), through the cache; None when there are no rows."""
+    if not queryset.ordered:
+        queryset = queryset.order_by("pk")
+    objects = cached(queryset[:1], timeout, name)
+    return objects[0] if objects else None
@@ -0,0 +1,124 @@
+# core/queryplans.py
+"""
+Query-plan regression checks for the hot queries.
+
+seed() fills an empty (throwaway) database with enough rows for the planner to
+prefer an index where one applies; check() EXPLAINs every query in
+HOT_QUERIES and reports the ones that read their table with a sequential
+scan. HOT_QUERIES are built by the same functions the views call, so a view
+that changes its filters or ordering is checked as it now is. core.tests
+runs the check against the test database; `manage.py check_query_plans`
+runs it on demand and prints the plans.
+"""
+import re
+from collections import namedtuple
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connections
+
+from archive.lookups import hot_orders
+from cart.models import Order as CartOrder
+
+from . import messaging, views
+from .models import Category, HelpArticle, HelpCategory, Message, Product, SubCategory
+
+HotQuery = namedtuple("HotQuery", "name table build")
+PlanResult = namedtuple("PlanResult", "query plan seq_scans")
+
+# name, table that must not be scanned, and the view's own queryset built from the seeded ids
+HOT_QUERIES = [
+    HotQuery("home: new arrivals", "core_product", lambda s: views.new_arrivals()),
+    HotQuery("home: top deals", "core_product", lambda s: views.top_deals()),
+    HotQuery("home: trending", "core_product", lambda s: views.popular_products()),
+    HotQuery("product: related", "core_product",
+             lambda s: views.related_products(Product(id=s["product"], category_id=s["category"]))),
+    HotQuery("category listing", "core_product", lambda s: views.listed_products(category=s["category"])),
+    HotQuery("subcategory listing", "core_product", lambda s: views.listed_products(subcategory=s["subcategory"])),
+    HotQuery("help category", "core_helparticle", lambda s: views.published_articles(s["help_category"])),
+    HotQuery("product thread", "core_message",
+             lambda s: messaging.conversation_messages(s["user"], s["product"], since=s["message"])),
+    HotQuery("unread messages", "core_message", lambda s: messaging.unread_messages(s["user"], s["product"])),
+    HotQuery("order history", "cart_order", lambda s: hot_orders(s["user"])),
+]
+
+
+def seed(products=5000, messages=20000, orders=5000, articles=2000, users=200):
+    """Bulk-insert a catalog-sized dataset; returns ids the hot queries filter on."""
+    user_objs = User.objects.bulk_create(User(username=f"plan-user-{i}") for i in range(users))
+    categories = Category.objects.bulk_create(Category(name=f"Category {i}", slug=f"plan-cat-{i}") for i in range(20))
+    subcategories = SubCategory.objects.bulk_create(
+        SubCategory(category=categories[i % len(categories)], name=f"Sub {i}", slug=f"plan-sub-{i}")
+        for i in range(100)
+    )
+    product_objs = Product.objects.bulk_create(
+        Product(
+            category=categories[i % len(categories)],
+            subcategory=subcategories[i % len(subcategories)],
+            name=f"Product {i}",
+            description="",
+            base_price=Decimal("1000"),
+            approved=i % 10 != 0,
+        )
+        for i in range(products)
+    )
+    message_objs = Message.objects.bulk_create(
+        Message(
+            sender=user_objs[i % users],
+            receiver=user_objs[(i * 7 + 1) % users],
+            product=product_objs[i % len(product_objs)],
+            content="hello",
+            read=i % 5 != 0,
+        )
+        for i in range(messages)
+    )
+    CartOrder.objects.bulk_create(
+        CartOrder(user=user_objs[i % users], total_price=Decimal("1000"), status="paid") for i in range(orders)
+    )
+    help_categories = HelpCategory.objects.bulk_create(
+        HelpCategory(name=f"Help {i}", slug=f"plan-help-{i}") for i in range(20)
+    )
+    HelpArticle.objects.bulk_create(
+        HelpArticle(
+            category=help_categories[i % len(help_categories)],
+            title=f"Article {i}",
+            slug=f"plan-article-{i}",
+            summary="",
+            content="",
+        )
+        for i in range(articles)
+    )
+    return {
+        "user": user_objs[1].pk,
+        "seller": user_objs[8].pk,
+        "product": product_objs[1].pk,
+        "message": message_objs[len(message_objs) // 2].pk,
+        "category": categories[3].pk,
+        "subcategory": subcategories[7].pk,
+        "help_category": help_categories[2].pk,
+    }
+
+
+def analyze(using="default"):
+    """Refresh planner statistics after seeding."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def _seq_scans(plan, vendor):
+    if vendor == "postgresql":
+        return set(re.findall(r"Seq Scan on (\w+)", plan))
+    # SQLite: "SCAN t" is a full table scan, "SCAN t USING INDEX i" walks an index
+    return {table for table, using in re.findall(r"\bSCAN (\w+)( USING)?", plan) if not using}
+
+
+def check(ids, using="default"):
+    """A PlanResult per hot query; `seq_scans` lists the guarded table if it is scanned."""
+    vendor = connections[using].vendor
+    results = []
+    for query in HOT_QUERIES:
+        plan = query.build(ids).using(using).explain()
+        scanned = _seq_scans(plan, vendor) & {query.table}
+        results.append(PlanResult(query, plan, sorted(scanned)))
+    return results
@@ -0,0 +1,95 @@
+# core/signals.py
+from django.apps import apps
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .freshness import touch_products
+from .pagecache import invalidate_pages
+from .querycache import track
+from .media import queue_uploads, take_uploads
+from archive.tiering import archiving
+
+from .messaging import record_deleted_message, record_new_message
+from .models import (
+    Category, HelpArticle, HelpCategory, Message, PriceOption, Product, ProductImage, Promotion, Review, SubCategory,
+)
+from .thumbnails import schedule_for
+
+
+@receiver(post_save, sender=Message)
+def update_inbox(sender, instance, created, raw=False, **kwargs):
+    # in the same transaction as the message, so the inbox never drifts from it
+    if created and not raw:
+        record_new_message(instance)
+
+
+@receiver(post_delete, sender=Message)
+def update_inbox_on_delete(sender, instance, **kwargs):
+    # archived messages are read and still part of their conversation
+    if not archiving.get():
+        record_deleted_message(instance)
+
+
+# Images are staged and uploaded in the background rather than inside save()
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=ProductImage)
+def defer_image_uploads(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._taken_uploads = take_uploads(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+def queue_image_uploads(sender, instance, raw=False, **kwargs):
+    taken = getattr(instance, "_taken_uploads", None)
+    if taken:
+        instance._taken_uploads = {}
+        queue_uploads(instance, taken)
+
+
+# A product page changes with its images, price options and reviews
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=PriceOption)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=PriceOption)
+@receiver(post_delete, sender=Review)
+def touch_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_products(pk=instance.product_id)
+
+
+# Cached anonymous pages (core.pagecache) go stale when the catalog changes
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_save, sender=Promotion)
+@receiver(post_save, sender=HelpArticle)
+@receiver(post_save, sender=HelpCategory)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+@receiver(post_delete, sender=Promotion)
+@receiver(post_delete, sender=HelpArticle)
+@receiver(post_delete, sender=HelpCategory)
+def invalidate_cached_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_pages()
+
+
+# Cached querysets (core.querycache) over these tables are re-read after a change
+track(*(apps.get_model(label) for label in settings.QUERY_CACHE_MODELS))
+
+
+# Locally stored images get their thumbnails rendered off the request thread
+@receiver(post_save, sender=Review)
+def thumbnail_review_avatar(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_for(instance.avatar)
+
+
+@receiver(post_save, sender=Promotion)
+def thumbnail_promotion_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_for(instance.image)
@@ -0,0 +1,284 @@
+# core/synthetic.py
+"""
+Synthetic catalog at production scale, for benchmarks and plan checks.
+
+CatalogGenerator bulk-inserts users and sellers, categories and subcategories,
+products with price options and gallery images, reviews, cart orders with
+their items, and buyer/seller messages together with the inbox read model
+(Conversation, InboxCounter) that those messages would have produced.
+Everything goes in through bulk_create in batches, so no signals fire:
+nothing is uploaded, no page cache is touched, and the message search index
+is left for `manage.py rebuild_message_search`.
+
+Timestamps are spread over the last two years so that "newest first" pages,
+rollups and archival see realistic data.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from cart.models import Order as CartOrder, OrderItem
+
+from .models import (
+    Category, Conversation, InboxCounter, Message, PriceOption, Product, ProductImage, Review, Seller, SubCategory,
+)
+
+ADJECTIVES = ["Classic", "Premium", "Organic", "Compact", "Wireless", "Handmade", "Durable", "Slim", "Deluxe", "Eco"]
+NOUNS = ["Kettle", "Backpack", "Sandals", "Phone Case", "Blender", "Kitenge Dress", "Solar Lamp", "Coffee Beans",
+         "Headphones", "Jerrycan", "Mattress", "Charger", "Sneakers", "Cooking Pot", "Wall Clock"]
+CATEGORY_NAMES = ["Electronics", "Fashion", "Home", "Kitchen", "Beauty", "Sports", "Groceries", "Baby",
+                  "Automotive", "Books", "Toys", "Garden", "Health", "Office", "Phones", "Computing"]
+COMMENTS = ["Great value.", "Arrived on time.", "Not as described.", "Would buy again.", "Good quality for the price."]
+LINES = ["Is this still available?", "Can you deliver to Kampala?", "Yes, it is in stock.",
+         "What colours do you have?", "I can do a discount for 3 or more.", "Thanks, ordering now."]
+
+DEFAULTS = {
+    "users": 50_000,
+    "sellers": 1_000,
+    "categories": 16,
+    "subcategories": 8,  # per category
+    "products": 100_000,
+    "reviews": 2_000_000,
+    "orders": 1_000_000,
+    "messages": 2_000_000,
+}
+
+
+def scaled(scale):
+    """DEFAULTS multiplied by `scale`, keeping at least one of everything."""
+    return {k: max(1, int(v * scale)) if k not in ("categories", "subcategories") else v for k, v in DEFAULTS.items()}
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the timestamps we set; auto_now_add would overwrite them."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+class CatalogGenerator:
+    def __init__(self, counts, batch_size=5000, seed=0, progress=None):
+        self.counts = counts
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.progress = progress or (lambda label, done, total: None)
+        self.now = timezone.now()
+        self.prefix = f"syn{seed}"
+
+    def _when(self, max_days=730):
+        return self.now - timedelta(seconds=self.rng.randrange(max_days * 86400))
+
+    def _insert(self, model, objects, total, label, keep=False):
+        """bulk_create `objects` in batches; returns the created objects when `keep`."""
+        created, done = [], 0
+        for batch in _batched(objects, self.batch_size):
+            batch = model.objects.bulk_create(batch)
+            if keep:
+                created.extend(batch)
+            done += len(batch)
+            self.progress(label, done, total)
+        return created
+
+    def run(self):
+        fields = [
+            Product._meta.get_field("created_at"),
+            Review._meta.get_field("created_at"),
+            CartOrder._meta.get_field("created_at"),
+            Message._meta.get_field("timestamp"),
+            Conversation._meta.get_field("created_at"),
+        ]
+        with explicit_timestamps(*fields):
+            self.users()
+            self.categories()
+            self.products()
+            self.reviews()
+            self.orders()
+            self.messages()
+
+    def users(self):
+        n = self.counts["users"]
+        users = (
+            User(username=f"{self.prefix}-user-{i}", email=f"{self.prefix}-user-{i}@example.com", password="!")
+            for i in range(n)
+        )
+        self.user_ids = [u.pk for u in self._insert(User, users, n, "users", keep=True)]
+        seller_users = self.user_ids[:self.counts["sellers"]]
+        sellers = (
+            Seller(user_id=uid, business_name=f"Shop {i}", approved=self.rng.random() < 0.9)
+            for i, uid in enumerate(seller_users)
+        )
+        self.sellers = self._insert(Seller, sellers, len(seller_users), "sellers", keep=True)
+        self.buyer_ids = self.user_ids[len(seller_users):] or self.user_ids
+
+    def categories(self):
+        names = [CATEGORY_NAMES[i % len(CATEGORY_NAMES)] + (f" {i}" if i >= len(CATEGORY_NAMES) else "")
+                 for i in range(self.counts["categories"])]
+        categories = [Category(name=name, slug=f"{self.prefix}-cat-{i}") for i, name in enumerate(names)]
+        self.categories_list = self._insert(Category, categories, len(categories), "categories", keep=True)
+        subs = [
+            SubCategory(category=category, name=f"{category.name} {j}", slug=f"{self.prefix}-sub-{category.pk}-{j}")
+            for category in self.categories_list for j in range(self.counts["subcategories"])
+        ]
+        self.subcategories = self._insert(SubCategory, subs, len(subs), "subcategories", keep=True)
+
+    def products(self):
+        n, rng = self.counts["products"], self.rng
+
+        def build():
+            for i in range(n):
+                sub = rng.choice(self.subcategories)
+                price = Decimal(rng.randrange(5, 2000) * 500)
+                seller = rng.choice(self.sellers)
+                yield Product(
+                    seller=seller,
+                    category_id=sub.category_id,
+                    subcategory=sub,
+                    name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+                    description="Synthetic product for benchmarking.",
+                    base_price=price,
+                    initial_price=price * Decimal("1.2") if rng.random() < 0.2 else None,
+                    color_options="Red, Blue, Black" if rng.random() < 0.3 else None,
+                    main_image=f"synthetic/product_{i}",
+                    approved=seller.approved and rng.random() < 0.95,
+                    created_at=self._when(),
+                )
+
+        # (pk, seller user id, price) is all later stages need
+        self.products_list = []
+        for batch in _batched(build(), self.batch_size):
+            batch = Product.objects.bulk_create(batch)
+            self.products_list.extend((p.pk, p.seller.user_id, p.base_price) for p in batch)
+            self._extras(batch)
+            self.progress("products", len(self.products_list), n)
+
+    def _extras(self, products):
+        rng = self.rng
+        options, images = [], []
+        for p in products:
+            low = 1
+            for step in range(rng.randrange(4)):
+                high = low * 5
+                options.append(PriceOption(
+                    product=p, min_quantity=low, max_quantity=high, price=p.base_price * (100 - 5 * (step + 1)) / 100
+                ))
+                low = high + 1
+            for k in range(rng.randrange(5)):
+                images.append(ProductImage(product=p, image=f"synthetic/product_{p.pk}_{k}", color=None))
+        PriceOption.objects.bulk_create(options, batch_size=self.batch_size)
+        ProductImage.objects.bulk_create(images, batch_size=self.batch_size)
+
+    def reviews(self):
+        n, rng = self.counts["reviews"], self.rng
+        reviews = (
+            Review(
+                product_id=rng.choice(self.products_list)[0],
+                user_name=f"Buyer {rng.randrange(100000)}",
+                rating=rng.choices([1, 2, 3, 4, 5], weights=[3, 4, 10, 35, 48])[0],
+                comment=rng.choice(COMMENTS),
+                created_at=self._when(),
+            )
+            for _ in range(n)
+        )
+        self._insert(Review, reviews, n, "reviews")
+
+    def orders(self):
+        n, rng = self.counts["orders"], self.rng
+        statuses = ["pending", "paid", "shipped", "delivered"]
+        done = 0
+        for size in [self.batch_size] * (n // self.batch_size) + [n % self.batch_size]:
+            if not size:
+                continue
+            picks = [[rng.choice(self.products_list) for _ in range(rng.randint(1, 3))] for _ in range(size)]
+            quantities = [[rng.randint(1, 4) for _ in items] for items in picks]
+            orders = CartOrder.objects.bulk_create(
+                CartOrder(
+                    user_id=rng.choice(self.buyer_ids),
+                    total_price=sum(price * q for (_, _, price), q in zip(items, qty)),
+                    status=rng.choices(statuses, weights=[10, 60, 20, 10])[0],
+                    created_at=self._when(),
+                )
+                for items, qty in zip(picks, quantities)
+            )
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(order=order, product_id=pk, quantity=q, price=price)
+                    for order, items, qty in zip(orders, picks, quantities)
+                    for (pk, _, price), q in zip(items, qty)
+                ],
+                batch_size=self.batch_size,
+            )
+            done += size
+            self.progress("orders", done, n)
+
+    def messages(self):
+        """Threads of a few messages each, plus their Conversation rows and unread counters."""
+        n, rng = self.counts["messages"], self.rng
+        seen, unread_by_user, done = set(), {}, 0
+        while done < n:
+            threads, messages = [], []
+            while len(messages) < self.batch_size and done + len(messages) < n:
+                pk, seller_id, _ = rng.choice(self.products_list)
+                buyer_id = rng.choice(self.buyer_ids)
+                if buyer_id == seller_id or (buyer_id, seller_id, pk) in seen:
+                    continue
+                seen.add((buyer_id, seller_id, pk))
+                length = min(rng.randint(1, 19), n - done - len(messages))
+                at = self._when(365)
+                unread = rng.choice([0, 0, 0, 1, 2])
+                thread = []
+                for k in range(length):
+                    from_buyer = k % 2 == 0
+                    at += timedelta(minutes=rng.randint(1, 600))
+                    thread.append(Message(
+                        sender_id=buyer_id if from_buyer else seller_id,
+                        receiver_id=seller_id if from_buyer else buyer_id,
+                        product_id=pk,
+                        content=rng.choice(LINES),
+                        timestamp=at,
+                        read=k < length - unread,
+                    ))
+                threads.append((buyer_id, seller_id, pk, thread))
+                messages.extend(thread)
+
+            Message.objects.bulk_create(messages)
+            conversations = []
+            for buyer_id, seller_id, pk, thread in threads:
+                last = thread[-1]
+                conv = Conversation(
+                    buyer_id=buyer_id, seller_id=seller_id, product_id=pk, last_message=last,
+                    last_message_preview=last.content[:255], last_message_at=last.timestamp,
+                    created_at=thread[0].timestamp,
+                )
+                for msg in thread:
+                    if not msg.read:
+                        if msg.receiver_id == seller_id:
+                            conv.seller_unread += 1
+                        else:
+                            conv.buyer_unread += 1
+                        unread_by_user[msg.receiver_id] = unread_by_user.get(msg.receiver_id, 0) + 1
+                conversations.append(conv)
+            Conversation.objects.bulk_create(conversations)
+            done += len(messages)
+            self.progress("messages", done, n)
+
+        InboxCounter.objects.bulk_create(
+            [InboxCounter(user_id=uid, unread=count) for uid, count in unread_by_user.items()],
+            batch_size=self.batch_size,
+        )
@@ -0,0 +1,60 @@
+from django import template
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from core.images import image_url as _image_url, responsive_urls
+from core.thumbnails import picture_sources
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_attrs(image, variant, lazy=True, meta=None):
+    """
+    src/srcset/sizes (and loading="lazy") attributes for an <img>:
+
+        <img {% image_attrs product.main_image "card" meta=product.main_image_meta %} alt="{{ product.name }}">
+
+    With `meta` (core.placeholders.ImageMeta) the intrinsic width/height and
+    the blurred placeholder are inlined too, so the slot is laid out and
+    filled before the image arrives.
+    """
+    src, srcset, sizes = responsive_urls(image, variant)
+    attrs = format_html('src="{}"', src)
+    if srcset:
+        attrs += format_html(' srcset="{}" sizes="{}"', srcset, sizes)
+    if lazy:
+        attrs += mark_safe(' loading="lazy"')
+    if meta:
+        attrs += format_html(
+            ' width="{}" height="{}" style="background:url({}) center/cover no-repeat"',
+            meta.width, meta.height, meta.placeholder,
+        )
+    return attrs
+
+
+@register.filter
+def image_url(image, variant):
+    """A single sized URL: {{ product.main_image|image_url:"thumb" }}"""
+    return _image_url(image, variant)
+
+
+@register.simple_tag
+def picture(image, alt="", css_class="", lazy=True):
+    """
+    <picture> for a locally stored image with WebP and fallback thumbnails
+    (core.thumbnails); the original is used until the thumbnails exist.
+    """
+    if not image:
+        return ""
+    webp, fallback, src, sizes = picture_sources(image)
+    extra = format_html(' class="{}"', css_class) if css_class else ""
+    if lazy:
+        extra += mark_safe(' loading="lazy"')
+    if not webp:
+        return format_html('<img src="{}" alt="{}"{}>', image.url, alt, extra)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}"{}></picture>',
+        webp, sizes, src, fallback, sizes, alt, extra,
+    )
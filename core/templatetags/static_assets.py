@@ -0,0 +1,16 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.assets import critical_css as _critical_css
+
+register = template.Library()
+
+
+@register.simple_tag
+def critical_css(name):
+    """
+    The contents of a CRITICAL_CSS file (core.assets), for inlining:
+
+        <style>{% critical_css "core/critical.css" %}</style>
+    """
+    return mark_safe(_critical_css(name))
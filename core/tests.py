@@ -1,3 +1,762 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import subprocess
+import sys
+import io
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.finders import AppDirectoriesFinder, FileSystemFinder
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+import cloudinary
+import requests
+from PIL import Image
+
+from . import assets, benchmark, caching, counters, images, media, metrics, placeholders, profiling, thumbnails, tracing
+from .counters import ViewCounter, product_views
+from .messaging import rebuild_inbox, unread_total
+from .models import Category, Conversation, MediaUpload, Message, Product, Review, Seller, SubCategory
+from .queryplans import analyze, check, seed
+from .querycache import cached
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_an_index(self):
+        ids = seed(products=2000, messages=5000, orders=2000, articles=500)
+        analyze()
+        scanned = {r.query.name: r.plan for r in check(ids) if r.seq_scans}
+        self.assertEqual(scanned, {})
+
+
+# time budgets would make the run depend on the machine; the query counts are exact
+@override_settings(
+    VIEW_COUNTER_FLUSH_SECONDS=3600,
+    VIEW_BUDGETS={name: (queries, None) for name, (queries, _) in settings.VIEW_BUDGETS.items()},
+    VIEW_BUDGET_DEFAULT=(settings.VIEW_BUDGET_DEFAULT[0], None),
+)
+class BudgetedViewTests(TestCase):
+    """Every read-only core page, against enough rows that an N+1 goes over its budget."""
+
+    def setUp(self):
+        cache.clear()
+        seed(products=60, messages=200, orders=20, articles=20, users=10)
+        self.arguments = benchmark.sample_arguments(None)
+        product = Product.objects.get(pk=self.arguments["product_id"])
+        Review.objects.bulk_create(
+            Review(product=product, user_name=f"buyer {i}", rating=4, comment="Fine") for i in range(10)
+        )
+
+    # renders register.html, which the project doesn't ship (allauth's signup is used)
+    UNRENDERABLE = {"core:register"}
+
+    def test_pages_stay_within_their_query_budgets(self):
+        without_data = []
+        for name, pattern in benchmark.benchmark_urls():
+            if not name.startswith("core:") or name in benchmark.SKIPPED or name in self.UNRENDERABLE:
+                continue
+            kwargs = benchmark._kwargs(name, pattern, self.arguments)
+            if kwargs is None:
+                without_data.append(name)
+                continue
+            with self.subTest(name):
+                # a page over budget raises BudgetExceeded (VIEW_BUDGET_MODE is "raise")
+                response = self.client.get(reverse(name, kwargs=kwargs))
+                self.assertLess(response.status_code, 500)
+        self.assertEqual(without_data, ["core:request-profile"])
+
+    def test_searches_with_results_stay_within_their_budgets(self):
+        for name, query in (("core:search", "Product"), ("core:search_help", "Article")):
+            with self.subTest(name):
+                self.assertEqual(self.client.get(reverse(name), {"q": query}).status_code, 200)
+
+
+class QueryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Phones", slug="phones")
+        SubCategory.objects.create(category=self.category, name="Android", slug="android")
+
+    def subcategories(self):
+        return cached(SubCategory.objects.filter(category=self.category).order_by("name"))
+
+    def test_a_second_read_runs_no_sql(self):
+        self.subcategories()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual([s.name for s in self.subcategories()], ["Android"])
+        self.assertEqual(len(queries), 0)
+
+    def test_saving_a_row_invalidates_the_table(self):
+        self.subcategories()
+        SubCategory.objects.create(category=self.category, name="iPhone", slug="iphone")
+        self.assertEqual([s.name for s in self.subcategories()], ["Android", "iPhone"])
+
+    def test_deleting_a_row_invalidates_the_table(self):
+        self.subcategories()
+        SubCategory.objects.filter(slug="android").get().delete()
+        self.assertEqual(self.subcategories(), [])
+
+
+class MetricsCompactionTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        override = override_settings(METRICS_DIR=self.dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def exited_worker_file(self, count):
+        worker = subprocess.Popen([sys.executable, "-c", ""])
+        worker.wait()
+        snapshot = {metrics.checkouts.name: {
+            "kind": "counter", "help": "", "labelnames": ["flow", "outcome"],
+            "values": [[["test", "ok"], count]],
+        }}
+        filename = f"{worker.pid}-1.json"
+        with open(os.path.join(self.dir.name, filename), "w") as fh:
+            json.dump(snapshot, fh)
+        return filename
+
+    def checkouts(self):
+        return metrics.collect()[metrics.checkouts.name]["values"].get(("test", "ok"), 0)
+
+    def test_exited_workers_are_folded_into_one_file(self):
+        exited = {self.exited_worker_file(2), self.exited_worker_file(3)}
+        self.assertEqual(self.checkouts(), 5)
+        self.assertEqual(self.checkouts(), 5)  # counted once, not again on the next scrape
+        if metrics.fcntl is not None:
+            self.assertFalse(exited & set(os.listdir(self.dir.name)))
+
+    @override_settings(TESTING=False)
+    @mock.patch.object(metrics.registry, "_served_pid", None)
+    def test_only_processes_that_served_requests_flush_at_exit(self):
+        metrics._flush_at_exit()
+        self.assertEqual(os.listdir(self.dir.name), [])
+        self.client.get(reverse("core:home"))
+        metrics._flush_at_exit()
+        self.assertEqual(len(os.listdir(self.dir.name)), 1)
+
+
+@override_settings(VIEW_COUNTER_FLUSH_SECONDS=3600)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        product_views.flush()
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            category=category, name="Phone", description="", base_price=Decimal("100"), approved=True
+        )
+        self.url = reverse("core:product_detail", args=[self.product.id])
+
+    def test_current_copy_gets_a_304_without_sql(self):
+        etag = self.client.get(self.url)["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+    def test_saving_a_product_changes_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.product.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_only_full_gets_count_as_views(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.get(self.url)  # from the page cache
+        self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.client.head(self.url)
+        self.assertEqual(product_views.pending(self.product.id), 2)
+
+
+@override_settings(VIEW_COUNTER_FLUSH_SECONDS=3600)
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.products = [
+            Product.objects.create(category=category, name=f"Phone {i}", description="", base_price=Decimal("100"))
+            for i in range(2)
+        ]
+        self.counter = ViewCounter(Product)
+
+    def views(self):
+        return list(Product.objects.order_by("pk").values_list("views", flat=True))
+
+    def test_flush_adds_the_buffered_counts(self):
+        self.counter.hit(self.products[0].pk)
+        self.counter.hit(self.products[0].pk)
+        self.counter.hit(self.products[1].pk)
+        self.assertEqual(self.counter.flush(), 2)
+        self.assertEqual(self.views(), [2, 1])
+        self.assertEqual(self.counter.pending(self.products[0].pk), 0)
+
+    def test_failed_flush_is_retried_without_double_counting(self):
+        for product in self.products:
+            self.counter.hit(product.pk)
+        update = QuerySet.update
+        calls = []
+
+        def fail_second(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", fail_second), self.assertLogs("core.counters", "ERROR"):
+            self.assertEqual(self.counter.flush(), 0)
+        self.assertEqual(self.views(), [0, 0])
+
+        self.assertEqual(self.counter.flush(), 2)
+        self.assertEqual(self.views(), [1, 1])
+
+    def test_exit_flush_is_skipped_under_test(self):
+        product_views.flush()  # counts left over from other tests
+        Product.objects.update(views=0)
+        product_views.hit(self.products[0].pk)
+        self.addCleanup(product_views.flush)
+        counters._flush_at_exit()
+        self.assertEqual(self.views(), [0, 0])
+        with override_settings(TESTING=False):
+            counters._flush_at_exit()
+        self.assertEqual(self.views(), [1, 0])
+
+    def test_periodic_flush_survives_a_failure(self):
+        flushes = []
+
+        def flush_all():
+            flushes.append(1)
+            if len(flushes) == 1:
+                raise RuntimeError("connection lost")
+            raise SystemExit  # end the loop
+
+        with mock.patch.object(counters.time, "sleep"), mock.patch.object(counters, "flush_all", flush_all), \
+                self.assertLogs("core.counters", "ERROR"), self.assertRaises(SystemExit):
+            counters._flush_periodically()
+        self.assertEqual(len(flushes), 2)
+
+
+class InboxTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user("buyer")
+        self.seller = User.objects.create_user("seller")
+        seller = Seller.objects.create(user=self.seller, business_name="Phones Ltd")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            category=category, seller=seller, name="Phone", description="", base_price=Decimal("100")
+        )
+
+    def send(self, sender, receiver, content):
+        return Message.objects.create(sender=sender, receiver=receiver, product=self.product, content=content)
+
+    def conversation(self):
+        return Conversation.objects.get(buyer=self.buyer, seller=self.seller, product=self.product)
+
+    def test_new_messages_update_the_conversation(self):
+        self.send(self.buyer, self.seller, "hello")
+        self.send(self.buyer, self.seller, "still there?")
+        conv = self.conversation()
+        self.assertEqual((conv.seller_unread, conv.last_message_preview), (2, "still there?"))
+        self.assertEqual(unread_total(self.seller), 2)
+
+    def test_deleting_the_last_message_falls_back_to_the_one_before(self):
+        self.send(self.buyer, self.seller, "hello")
+        self.send(self.buyer, self.seller, "still there?").delete()
+        conv = self.conversation()
+        self.assertEqual((conv.seller_unread, conv.last_message_preview), (1, "hello"))
+        self.assertEqual(unread_total(self.seller), 1)
+
+    def test_deleting_the_only_message_removes_the_conversation(self):
+        self.send(self.buyer, self.seller, "hello").delete()
+        self.assertFalse(Conversation.objects.exists())
+        self.assertEqual(unread_total(self.seller), 0)
+
+    def test_rebuild_matches_the_incremental_updates(self):
+        self.send(self.buyer, self.seller, "hello")
+        self.send(self.seller, self.buyer, "hi, yes it is")
+        Message.objects.filter(receiver=self.seller).update(read=True)
+        expected = Conversation.objects.values("buyer_unread", "seller_unread", "last_message_preview").get()
+        expected["seller_unread"] = 0  # the update() above bypassed the read model
+
+        self.assertEqual(rebuild_inbox(), 1)
+        conv = Conversation.objects.values("buyer_unread", "seller_unread", "last_message_preview").get()
+        self.assertEqual(conv, expected)
+        self.assertEqual((unread_total(self.buyer), unread_total(self.seller)), (1, 0))
+
+    def fetch(self, user, since=None):
+        if self.client.session.get("_auth_user_id") != str(user.pk):
+            self.client.force_login(user)
+        params = {} if since is None else {"since": since}
+        response = self.client.get(reverse("core:fetch_messages", args=[self.product.id]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_fetch_returns_only_messages_after_since(self):
+        first = self.send(self.buyer, self.seller, "hello")
+        second = self.send(self.seller, self.buyer, "hi")
+        self.assertEqual([m["id"] for m in self.fetch(self.buyer)["messages"]], [first.id, second.id])
+        data = self.fetch(self.buyer, since=first.id)
+        self.assertEqual(([m["id"] for m in data["messages"]], data["last_id"]), ([second.id], second.id))
+        self.assertEqual(self.fetch(self.buyer, since=second.id), {"messages": [], "last_id": second.id})
+
+    def test_fetch_marks_everything_read_with_one_update(self):
+        sent = [self.send(self.buyer, self.seller, f"message {i}") for i in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            data = self.fetch(self.seller)
+        updates = [q["sql"] for q in queries if q["sql"].startswith('UPDATE "core_message"')]
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(all(m["read"] for m in data["messages"]))
+        self.assertEqual(Message.objects.filter(id__in=[m.id for m in sent], read=False).count(), 0)
+        self.assertEqual((self.conversation().seller_unread, unread_total(self.seller)), (0, 0))
+
+    def test_poll_with_nothing_new_writes_nothing(self):
+        last = self.send(self.buyer, self.seller, "hello")
+        self.fetch(self.seller)  # logs in, and reads "hello"
+        with CaptureQueriesContext(connection) as queries:
+            self.fetch(self.seller, since=last.id)
+        self.assertFalse([q for q in queries if not q["sql"].startswith("SELECT")])
+
+    def test_fetch_rejects_a_bad_cursor(self):
+        self.client.force_login(self.buyer)
+        url = reverse("core:fetch_messages", args=[self.product.id])
+        self.assertEqual(self.client.get(url, {"since": "x"}).status_code, 400)
+
+
+class ReviewAvatarTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            category=category, name="Phone", description="", base_price=Decimal("100"), approved=True
+        )
+        png = io.BytesIO()
+        Image.new("RGB", (200, 200), "red").save(png, "PNG")
+        self.review = Review(product=self.product, user_name="amina", rating=5, comment="Works well")
+        self.review.avatar.save("amina.png", ContentFile(png.getvalue()))
+
+    @mock.patch.object(thumbnails, "schedule")
+    def test_evicted_fallback_uses_the_original(self, schedule):
+        thumbnails.generate_variants(self.review.avatar.name, (32, 64))
+        for width in (32, 64):
+            thumbnails.variant_path(self.review.avatar.name, width, "png").unlink()
+
+        webp, fallback, src, _ = thumbnails.picture_sources(self.review.avatar)
+        self.assertIn("32w", webp)
+        self.assertEqual((fallback, src), ("", self.review.avatar.url))
+        schedule.assert_called_once()
+
+    @mock.patch.object(thumbnails, "schedule")
+    def test_product_page_renders_the_avatar(self, schedule):
+        thumbnails.generate_variants(self.review.avatar.name, (32, 64))
+        response = self.client.get(reverse("core:product_detail", args=[self.product.id]))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, 'class="review-avatar"')
+
+
+def png_upload(name="phone.png", size=(400, 200)):
+    png = io.BytesIO()
+    Image.new("RGB", size, "red").save(png, "PNG")
+    return SimpleUploadedFile(name, png.getvalue(), content_type="image/png")
+
+
+class MediaUploadTests(TestCase):
+    def setUp(self):
+        media_root, staging = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.addCleanup(staging.cleanup)
+        override = override_settings(
+            MEDIA_ROOT=media_root.name, MEDIA_STAGING_ROOT=staging.name,
+            MEDIA_UPLOAD_BACKEND="core.media.StubUploader", MEDIA_UPLOAD_MAX_ATTEMPTS=2,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.category = Category.objects.create(name="Phones", slug="phones")
+
+    def create_product(self):
+        # workers are only handed the upload once the transaction commits
+        with self.captureOnCommitCallbacks() as callbacks:
+            product = Product.objects.create(
+                category=self.category, name="Phone", description="", base_price=Decimal("100"),
+                approved=True, main_image=png_upload(),
+            )
+        self.assertEqual(len(callbacks), 1)
+        return product, MediaUpload.objects.get(object_id=product.pk, field="main_image")
+
+    def test_upload_is_staged_then_goes_live(self):
+        product, upload = self.create_product()
+        product.refresh_from_db()
+        self.assertEqual((product.main_image, product.main_image_status), (None, "pending"))
+        self.assertTrue(os.path.exists(upload.staged_path))
+
+        self.assertTrue(media.process_upload(upload.id))
+        product.refresh_from_db()
+        self.assertEqual(product.main_image_status, "ready")
+        self.assertTrue(product.main_image.public_id.startswith("products/"))
+        self.assertEqual((product.main_image_width, product.main_image_height), (400, 200))
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.attempts), ("done", 1))
+        self.assertFalse(os.path.exists(upload.staged_path))
+        # done uploads aren't claimed again
+        self.assertFalse(media.process_upload(upload.id))
+
+    @mock.patch.object(media.StubUploader, "upload", side_effect=OSError("storage is down"))
+    def test_failed_upload_is_retried_until_attempts_run_out(self, upload_to_storage):
+        product, upload = self.create_product()
+        later = timezone.now() + timedelta(seconds=1)
+
+        with self.assertLogs("core.media", "ERROR"):
+            self.assertFalse(media.process_upload(upload.id))
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.error), ("failed", "storage is down"))
+        self.assertEqual(Product.objects.get(pk=product.pk).main_image_status, "pending")
+        self.assertEqual(media.retryable_uploads(later), [upload.id])
+
+        with self.assertLogs("core.media", "ERROR"):
+            self.assertFalse(media.process_upload(upload.id))
+        self.assertEqual(Product.objects.get(pk=product.pk).main_image_status, "failed")
+        self.assertEqual(media.retryable_uploads(later), [])
+
+    def test_upload_left_by_a_dead_worker_is_reclaimed(self):
+        _, upload = self.create_product()
+        now = timezone.now()
+        MediaUpload.objects.filter(id=upload.id).update(
+            status="uploading", attempts=1, started_at=now - timedelta(minutes=media.STALE_UPLOAD_MINUTES + 1)
+        )
+        self.assertEqual(media.retryable_uploads(now + timedelta(seconds=1)), [upload.id])
+        self.assertTrue(media.process_upload(upload.id))
+
+    def test_a_later_upload_for_the_same_field_wins(self):
+        product, first = self.create_product()
+        with self.captureOnCommitCallbacks():
+            product.main_image = png_upload("newer.png", size=(300, 300))
+            product.save()
+        second = MediaUpload.objects.exclude(id=first.id).get()
+
+        self.assertTrue(media.process_upload(second.id))
+        self.assertFalse(media.process_upload(first.id))
+        product.refresh_from_db()
+        staged_name = os.path.splitext(os.path.basename(second.staged_path))[0]
+        self.assertEqual((product.main_image.public_id, product.main_image_width), (f"products/{staged_name}", 300))
+        self.assertEqual(MediaUpload.objects.get(id=first.id).status, "done")
+
+
+class PlaceholderTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_URL_BACKEND="core.images.LocalBackend")
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def image_file(self, size=(400, 200), fmt="PNG", **save_kwargs):
+        path = os.path.join(self.media_root, f"original.{fmt.lower()}")
+        Image.new("RGB", size, "red").save(path, fmt, **save_kwargs)
+        return path
+
+    def test_describe_records_the_size_and_a_tiny_preview(self):
+        meta = placeholders.describe(self.image_file())
+        self.assertEqual((meta.width, meta.height), (400, 200))
+        prefix = "data:image/jpeg;base64,"
+        self.assertTrue(meta.placeholder.startswith(prefix))
+        with Image.open(io.BytesIO(base64.b64decode(meta.placeholder[len(prefix):]))) as preview:
+            self.assertEqual((preview.format, preview.size), ("JPEG", (placeholders.PLACEHOLDER_WIDTH, 10)))
+
+    def test_describe_follows_exif_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90 degrees: a portrait photo stored sideways
+        meta = placeholders.describe(self.image_file(fmt="JPEG", exif=exif))
+        self.assertEqual((meta.width, meta.height), (200, 400))
+
+    def test_backfilled_placeholder_is_inlined_on_the_page(self):
+        resource = media.StubUploader().upload(self.image_file(), folder="products")
+        product = Product.objects.create(
+            category=Category.objects.create(name="Phones", slug="phones"), name="Phone", description="",
+            base_price=Decimal("100"), approved=True, main_image=resource.get_prep_value(),
+        )
+        self.assertIsNone(product.main_image_meta)
+
+        call_command("backfill_image_placeholders", stdout=io.StringIO())
+        product.refresh_from_db()
+        meta = product.main_image_meta
+        self.assertEqual((meta.width, meta.height), (400, 200))
+        response = self.client.get(reverse("core:product_detail", args=[product.id]))
+        self.assertContains(response, f'width="400" height="200" style="background:url({meta.placeholder})')
+
+
+class ResponsiveImageTests(TestCase):
+    image = cloudinary.CloudinaryResource(public_id="products/phone", format="jpg", version="1")
+
+    def test_local_images_get_no_srcset(self):
+        with override_settings(IMAGE_URL_BACKEND="core.images.LocalBackend"):
+            self.assertEqual(images.responsive_urls(self.image, "card"), ("/media/products/phone.jpg", "", ""))
+            attrs = Template('{% load responsive_images %}{% image_attrs image "thumb" %}').render(
+                Context({"image": self.image})
+            )
+        self.assertEqual(attrs, 'src="/media/products/phone.jpg" loading="lazy"')
+
+    @mock.patch.object(cloudinary.config(), "cloud_name", "demo")
+    def test_cloudinary_images_get_a_srcset_of_resized_variants(self):
+        with override_settings(IMAGE_URL_BACKEND="core.images.CloudinaryBackend"):
+            src, srcset, sizes = images.responsive_urls(self.image, "card")
+        candidates = [candidate.rsplit(" ", 1) for candidate in srcset.split(", ")]
+        self.assertEqual([width for _, width in candidates], ["200w", "300w", "400w", "600w"])
+        self.assertTrue(all(f"w_{width[:-1]}" in url for url, width in candidates))
+        self.assertEqual((src, sizes), (candidates[2][0], images.VARIANTS["card"].sizes))
+
+    def test_unknown_variant_is_an_error(self):
+        with self.assertRaises(ValueError):
+            images.responsive_urls(self.image, "poster")
+
+
+class AssetTests(TestCase):
+    def test_css_minifier_keeps_strings(self):
+        css = '.a:before { content: "x  ;  y: z /* kept */"; }  /* dropped */\n.b > .c { color: red; }'
+        self.assertEqual(assets.minify_css(css), '.a:before{content:"x  ;  y: z /* kept */"}.b>.c{color:red}')
+
+    def test_js_minifier_keeps_template_literals(self):
+        js = "  // comment\n  const html = `<ul>\n    <li>${item}</li>\n  </ul>`;\n\n  render(html);\n"
+        self.assertEqual(assets.minify_js(js), "const html = `<ul>\n    <li>${item}</li>\n  </ul>`;\nrender(html);\n")
+
+    def test_js_minifier_ignores_comment_markers_in_strings(self):
+        js = '  var url = "http://example.com/`";\n    next();\n'
+        self.assertEqual(assets.minify_js(js), 'var url = "http://example.com/`";\nnext();\n')
+
+    @mock.patch.object(assets, "_template_names", return_value=({"hero", "btn"}, {"nav"}))
+    def test_critical_css_keeps_rules_the_templates_use(self, _):
+        css = (
+            ".hero, .footer { margin: 0 } #nav .btn { color: red } .footer { padding: 0 }"
+            "@media (max-width: 600px) { .hero { margin: 4px } .footer { margin: 2px } }"
+            "@keyframes spin { to { transform: rotate(1turn) } }"
+        )
+        self.assertEqual(
+            assets.extract_critical_css(css, ["home.html"]),
+            ".hero{margin:0}#nav .btn{color:red}@media (max-width:600px){.hero{margin:4px}}",
+        )
+
+    def test_only_project_files_are_minified(self):
+        project = {path: storage for path, storage in FileSystemFinder().list([])}
+        self.assertTrue(all(assets._project_file(storage, path) for path, storage in project.items()))
+        collected = dict((path, storage) for path, storage in AppDirectoriesFinder().list([]))
+        self.assertTrue(assets._project_file(collected["chat/js/live_chat.js"], "chat/js/live_chat.js"))
+        self.assertFalse(assets._project_file(collected["admin/js/core.js"], "admin/js/core.js"))
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        self.addCleanup(caches["shared"].clear)
+        # two workers sharing one backend
+        self.a, self.b = (
+            caching.TieredCache("", {"OPTIONS": {"SHARED": "shared", "LOCAL_TIMEOUT": 5}}) for _ in range(2)
+        )
+
+    def later(self, seconds):
+        now = time.monotonic()
+        return mock.patch.object(caching.time, "monotonic", return_value=now + seconds)
+
+    def test_reads_are_served_locally_within_the_local_timeout(self):
+        self.a.set("k", 1)
+        caches["shared"].delete("k")
+        self.assertEqual((self.a.get("k"), self.b.get("k")), (1, None))
+        with self.later(6):
+            self.assertIsNone(self.a.get("k"))
+
+    def test_another_workers_write_is_seen_after_the_local_timeout(self):
+        self.a.set("k", 1)
+        self.b.set("k", 2)
+        self.assertEqual(self.a.get("k"), 1)
+        with self.later(6):
+            self.assertEqual(self.a.get("k"), 2)
+
+    def test_a_delete_reaches_the_shared_tier(self):
+        self.a.set("k", 1)
+        self.b.delete("k")
+        with self.later(6):
+            self.assertIsNone(self.a.get("k"))
+        self.a.set("k", 1)
+        self.a.delete("k")
+        self.assertIsNone(self.a.get("k"))
+
+    def test_counters_and_locks_live_in_the_shared_tier(self):
+        self.assertTrue(self.a.add("lock", 1))
+        self.assertFalse(self.b.add("lock", 1))
+        self.a.set("n", 1)
+        self.b.incr("n")
+        self.assertEqual(self.b.get("n"), 2)
+
+
+class GetOrComputeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_value_is_computed_once(self):
+        self.assertEqual(caching.get_or_compute("gc:k", self.compute, 60), 1)
+        self.assertEqual(caching.get_or_compute("gc:k", self.compute, 60), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_refreshes_early_as_expiry_nears(self):
+        cache.set("gc:k", {"value": "old", "delta": 10, "expires": time.time() + 1}, 60)
+        with mock.patch.object(caching.random, "random", return_value=0.5):
+            self.assertEqual(caching.get_or_compute("gc:k", self.compute, 60), 1)
+        cache.set("gc:k", {"value": "old", "delta": 0.01, "expires": time.time() + 60}, 60)
+        self.assertEqual(caching.get_or_compute("gc:k", self.compute, 60), "old")
+
+    def test_serves_the_stale_value_while_another_worker_refreshes(self):
+        cache.set("gc:k", {"value": "old", "delta": 10, "expires": time.time() - 1}, 60)
+        cache.add("gc:k:lock", 1)
+        self.assertEqual(caching.get_or_compute("gc:k", self.compute, 60), "old")
+        self.assertEqual(self.calls, 0)
+
+    def test_waits_at_most_max_wait_then_computes(self):
+        cache.add("gc:k:lock", 1)  # held by a worker that never finishes
+        started = time.monotonic()
+        self.assertEqual(caching.get_or_compute("gc:k", self.compute, 60, max_wait=0.2), 1)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(cache.get("gc:k:lock"))  # not ours to release
+
+
+class RequestProfileTests(TestCase):
+    def clock(self, *times):
+        return mock.patch.object(profiling.time, "perf_counter", side_effect=times)
+
+    def test_nested_calls_count_towards_the_innermost(self):
+        # template 0-4 s with SQL 1-3 s inside it; a cache call within a cache call is one call
+        with self.clock(0, 0, 1, 3, 4, 5, 6, 7, 9):
+            profile = profiling.RequestProfile()
+            with profile.timing("template", "home.html"):
+                with profile.timing("db", "SELECT 1"):
+                    pass
+            with profile.timing("cache", "get"):
+                with profile.timing("cache", "get_many"):
+                    pass
+        self.assertEqual((profile.seconds["template"], profile.seconds["db"], profile.seconds["cache"]), (2, 2, 4))
+        self.assertEqual((profile.calls["template"], profile.calls["db"], profile.calls["cache"]), (1, 1, 1))
+        self.assertEqual(profile.slowest[0][1:], ("template", "home.html"))
+
+    @override_settings(REQUEST_PROFILE_BUFFER_SIZE=3)
+    def test_ring_buffer_keeps_the_newest(self):
+        cache.clear()
+        ids = [profiling.save({"path": f"/{i}/"}) for i in range(5)]
+        self.assertEqual([r["id"] for r in profiling.recent()], ids[:1:-1])
+        self.assertIsNone(profiling.get(ids[1]))  # its slot now holds a newer profile
+        self.assertEqual(profiling.get(ids[4])["path"], "/4/")
+
+    def test_staff_header_profiles_the_request(self):
+        cache.clear()
+        staff = User.objects.create_user("ops", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse("core:terms"), HTTP_X_PROFILE="1")
+        record = profiling.get(int(response["X-Profile-Id"]))
+        self.assertEqual((record["view"], record["trigger"]), ("core:terms", "header"))
+
+        self.client.force_login(User.objects.create_user("shopper"))
+        self.assertNotIn("X-Profile-Id", self.client.get(reverse("core:terms"), HTTP_X_PROFILE="1"))
+
+
+@override_settings(TRACE_SAMPLE_RATE=0, TRACE_TRUSTED_PROXIES=["10.0.0.1"])
+class TracingTests(TestCase):
+    TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+    TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+    def setUp(self):
+        self.seen = {}
+        self.middleware = tracing.TracingMiddleware(self.view)
+        exporter = mock.patch.object(tracing, "exporter")
+        self.exporter = exporter.start()
+        self.addCleanup(exporter.stop)
+
+    def view(self, request):
+        self.seen["trace"] = tracing._current.get()
+        if "outbound" in request.GET:
+            with mock.patch.object(requests.adapters.HTTPAdapter, "send", side_effect=self.respond) as send:
+                requests.get("https://gateway.example/verify")
+            self.seen["headers"] = send.call_args.args[0].headers
+        return HttpResponse()
+
+    @staticmethod
+    def respond(prepared, **kwargs):
+        response = requests.Response()
+        response.status_code, response.request = 200, prepared
+        return response
+
+    def get(self, path="/", remote_addr="203.0.113.9", **headers):
+        return self.middleware(RequestFactory().get(path, REMOTE_ADDR=remote_addr, **headers))
+
+    def test_traceparent_is_continued_but_only_trusted_proxies_set_sampling(self):
+        self.get(HTTP_TRACEPARENT=self.TRACEPARENT)
+        trace = self.seen["trace"]
+        self.assertEqual((trace.trace_id, trace.root.parent_id, trace.sampled),
+                         (self.TRACE_ID, "00f067aa0ba902b7", False))
+        self.exporter.export.assert_not_called()
+
+        self.get(remote_addr="10.0.0.1", HTTP_TRACEPARENT=self.TRACEPARENT)
+        self.assertTrue(self.seen["trace"].sampled)
+        self.exporter.export.assert_called_once()
+
+    def test_malformed_traceparent_starts_a_new_trace(self):
+        self.get(remote_addr="10.0.0.1", HTTP_TRACEPARENT="00-xyz-00f067aa0ba902b7-01")
+        trace = self.seen["trace"]
+        self.assertNotEqual(trace.trace_id, self.TRACE_ID)
+        self.assertEqual((len(trace.trace_id), trace.root.parent_id, trace.sampled), (32, None, False))
+
+    def test_request_id_is_taken_from_the_header_when_valid(self):
+        self.assertEqual(self.get(HTTP_X_REQUEST_ID="lb-1234")["X-Request-ID"], "lb-1234")
+        response = self.get(HTTP_X_REQUEST_ID="not valid!")
+        self.assertEqual(response["X-Request-ID"], self.seen["trace"].trace_id)
+
+    def test_outbound_calls_carry_the_request_id(self):
+        self.get("/?outbound=1", HTTP_X_REQUEST_ID="lb-1234")
+        headers = self.seen["headers"]
+        self.assertEqual(headers["X-Request-ID"], "lb-1234")
+        self.assertRegex(headers["traceparent"], rf"^00-{self.seen['trace'].trace_id}-[0-9a-f]{{16}}-00$")
+
+    @override_settings(TRACE_SAMPLE_RATE=1)
+    def test_sampled_request_exports_a_span_per_outbound_call(self):
+        self.get("/?outbound=1")
+        spans = self.exporter.export.call_args.args[0]
+        self.assertEqual([span.kind for span in spans], ["server", "client"])
+        http = spans[1]
+        self.assertEqual(self.seen["headers"]["traceparent"], f"00-{http.trace_id}-{http.span_id}-01")
+
+
+class JsonLinesExporterTests(TestCase):
+    def test_rotates_at_max_bytes_and_keeps_backups(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "traces.jsonl")
+        # every span line is over a byte, so each export after the first rotates
+        exporter = tracing.JsonLinesExporter(path, max_bytes=1, backups=2)
+        span = tracing.Span("a" * 32, None, "request", "server")
+        span.end_ns = span.start_ns
+        for _ in range(4):
+            exporter.export([span])
+        self.assertEqual(sorted(os.listdir(directory.name)), ["traces.jsonl", "traces.jsonl.1", "traces.jsonl.2"])
+        with open(path) as fh:
+            self.assertEqual(json.loads(fh.readline())["trace_id"], "a" * 32)
@@ -0,0 +1,230 @@
+# core/thumbnails.py
+"""
+Thumbnails for images kept on local MEDIA_ROOT (review avatars, promotion
+banners).
+
+When one of these images is uploaded, a background thread renders a fixed set
+of widths as WebP plus a JPEG (or PNG, for images with transparency) fallback,
+with EXIF and other metadata stripped. Variants live in an on-disk cache under
+MEDIA_ROOT/THUMBNAIL_DIR that is capped at THUMBNAIL_CACHE_MAX_BYTES: when it
+grows past the cap the least recently used variants are evicted, and a
+variant that is asked for again after eviction is simply regenerated.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+Spec = namedtuple("Spec", "widths sizes")
+
+# (model label, field) -> widths to render
+SPECS = {
+    ("core.Review", "avatar"): Spec((32, 64), "32px"),  # .review-avatar on the product page
+    ("core.Promotion", "image"): Spec((480, 960, 1440), "(max-width: 768px) 100vw, 50vw"),
+}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# a touch only counts as "recently used" again after this long, so busy
+# pages don't rewrite file times on every render
+TOUCH_INTERVAL_SECONDS = 300
+
+
+def spec_for(fieldfile):
+    instance = fieldfile.instance
+    return SPECS.get((instance._meta.label, fieldfile.field.name))
+
+
+# ---------- CACHE LAYOUT ----------
+def _cache_root():
+    return Path(settings.MEDIA_ROOT) / settings.THUMBNAIL_DIR
+
+
+def _key(name):
+    return hashlib.sha1(name.encode()).hexdigest()[:16]
+
+
+def _fallback_format(name):
+    return "png" if os.path.splitext(name)[1].lower() in (".png", ".gif") else "jpg"
+
+
+def variant_name(name, width, fmt):
+    """Storage-relative name of one variant of the original `name`."""
+    return f"{settings.THUMBNAIL_DIR}/{_key(name)}/{width}.{fmt}"
+
+
+def variant_path(name, width, fmt):
+    return Path(settings.MEDIA_ROOT) / variant_name(name, width, fmt)
+
+
+# ---------- GENERATION ----------
+def _save(image, path, fmt):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    if fmt == "webp":
+        image.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+    elif fmt == "png":
+        image.save(tmp, "PNG", optimize=True)
+    else:
+        image.convert("RGB").save(tmp, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    # readers never see a half-written file
+    os.replace(tmp, path)
+
+
+def generate_variants(name, widths):
+    """Render every width of the stored image `name`; returns the paths written."""
+    written = []
+    fallback = _fallback_format(name)
+    with default_storage.open(name, "rb") as f:
+        with Image.open(f) as original:
+            # apply the EXIF orientation, then drop all metadata by re-encoding pixels only
+            image = ImageOps.exif_transpose(original)
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+            image.info.clear()
+
+            for width in widths:
+                resized = image
+                if image.width > width:
+                    height = max(1, round(image.height * width / image.width))
+                    resized = image.resize((width, height), Image.LANCZOS)
+                for fmt in ("webp", fallback):
+                    path = variant_path(name, width, fmt)
+                    _save(resized, path, fmt)
+                    written.append(path)
+
+    enforce_cache_cap()
+    return written
+
+
+def enforce_cache_cap(max_bytes=None):
+    """Evict least recently used variants until the cache fits; returns bytes freed."""
+    max_bytes = settings.THUMBNAIL_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    root = _cache_root()
+    if not root.exists():
+        return 0
+
+    files = []
+    total = 0
+    for path in root.rglob("*"):
+        if path.is_file() and not path.name.endswith(".tmp"):
+            stat = path.stat()
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return 0
+
+    # evict down to 90% of the cap so we don't evict again on the next write
+    target = max_bytes * 0.9
+    freed = 0
+    for _, size, path in sorted(files, key=lambda f: f[0]):
+        if total - freed <= target:
+            break
+        try:
+            path.unlink()
+            freed += size
+        except OSError:
+            pass
+    return freed
+
+
+# ---------- BACKGROUND QUEUE ----------
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = set()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix="thumbnails")
+        return _executor
+
+
+def _run(name, widths):
+    try:
+        generate_variants(name, widths)
+    except Exception:
+        logger.exception("Failed to generate thumbnails for %s", name)
+    finally:
+        with _executor_lock:
+            _in_flight.discard(name)
+
+
+def schedule(name, widths):
+    """Queue variant generation for `name` unless it is already queued."""
+    with _executor_lock:
+        if name in _in_flight:
+            return None
+        _in_flight.add(name)
+    return _pool().submit(_run, name, tuple(widths))
+
+
+def _missing(name, widths):
+    fallback = _fallback_format(name)
+    return any(
+        not variant_path(name, width, fmt).exists() for width in widths for fmt in ("webp", fallback)
+    )
+
+
+def schedule_for(fieldfile):
+    """Generate a field's variants once the current transaction commits."""
+    spec = spec_for(fieldfile) if fieldfile else None
+    if spec and _missing(fieldfile.name, spec.widths):
+        name = fieldfile.name
+        transaction.on_commit(lambda: schedule(name, spec.widths))
+
+
+# ---------- LOOKUP ----------
+def _touch(path, stat):
+    now = time.time()
+    if now - stat.st_mtime > TOUCH_INTERVAL_SECONDS:
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+
+def picture_sources(fieldfile):
+    """
+    (webp_srcset, fallback_srcset, fallback_src, sizes) for a local image, using
+    whichever variants are on disk. Missing variants (new, or evicted) are queued
+    for generation and left out, so the caller falls back to the original.
+    """
+    spec = spec_for(fieldfile) if fieldfile else None
+    if spec is None:
+        return "", "", "", ""
+
+    name = fieldfile.name
+    fallback = _fallback_format(name)
+    webp, fallback_set = [], []
+    missing = False
+    for width in spec.widths:
+        for fmt, bucket in (("webp", webp), (fallback, fallback_set)):
+            path = variant_path(name, width, fmt)
+            try:
+                stat = path.stat()
+            except OSError:
+                missing = True
+                continue
+            _touch(path, stat)
+            bucket.append(f"{default_storage.url(variant_name(name, width, fmt))} {width}w")
+    if missing:
+        schedule(name, spec.widths)
+
+    # the original when the fallback variants are missing, so <img src> is never empty
+    src = fallback_set[len(fallback_set) // 2].split(" ")[0] if fallback_set else fieldfile.url
+    return ", ".join(webp), ", ".join(fallback_set), src, spec.sizes
@@ -0,0 +1,320 @@
+# core/tracing.py
+"""
+Request tracing.
+
+TracingMiddleware gives every request an ID. It takes the ID from the
+incoming X-Request-ID header or W3C traceparent when there is one, sets it
+as request.request_id and echoes it in the X-Request-ID response header.
+Outbound HTTP calls carry the ID in X-Request-ID and a traceparent header,
+sampled or not, so a slow checkout can be followed into the DPO gateway's
+logs. Sampled requests (TRACE_SAMPLE_RATE, or a traceparent whose sampled
+flag is set, from one of TRACE_TRUSTED_PROXIES) also get a trace: a root
+span for the request, and child spans for every SQL statement, cache call,
+template render, outbound `requests` call and email send, all taken from
+the core.instrumentation hooks.
+
+When the request ends, its spans go to the exporter named by TRACE_EXPORTER
+(a dotted path, constructed with TRACE_EXPORTER_OPTIONS):
+
+    core.tracing.JsonLinesExporter  one JSON object per span, appended to a rotated file
+    core.tracing.OtlpHttpExporter   OTLP/HTTP JSON to a collector, from a background thread
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+REQUEST_ID = re.compile(r"^[\w.:-]{1,128}$")
+INTERNAL_KINDS = {"template", "cloudinary"}  # in-process work; the rest are client calls
+
+
+def _hex_id(nbytes):
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id, parent_id, name, kind):
+        self.trace_id = trace_id
+        self.span_id = _hex_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self.error = None
+
+    def as_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    def __init__(self, trace_id, request_id, parent_id=None, sampled=True):
+        self.trace_id = trace_id
+        self.request_id = request_id
+        self.sampled = sampled
+        self.root = Span(trace_id, parent_id, "request", "server")
+        self.spans = [self.root]
+        self.dropped = 0
+        self._open = [self.root]
+
+    def propagate(self, request, span_id):
+        """Add the trace context headers to an outgoing PreparedRequest."""
+        request.headers["traceparent"] = f"00-{self.trace_id}-{span_id}-{'01' if self.sampled else '00'}"
+        request.headers["X-Request-ID"] = self.request_id
+
+    @contextmanager
+    def child(self, kind, label, info):
+        label = str(label)
+        if kind == "template":
+            name = f"render {label}"
+        elif kind == "http":
+            name = label
+        else:
+            name = kind
+        span = Span(self.trace_id, self._open[-1].span_id, name, "internal" if kind in INTERNAL_KINDS else "client")
+        span.attributes["component"] = kind
+        span.attributes["label"] = label[:1000]
+        if "request" in info:
+            self.propagate(info["request"], span.span_id)
+        self._open.append(span)
+        try:
+            yield span
+        finally:
+            self._open.pop()
+            span.end_ns = time.time_ns()
+            span.error = info.get("error")
+            if "status" in info:
+                span.attributes["status"] = info["status"]
+            if len(self.spans) < settings.TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+
+_current = contextvars.ContextVar("request_trace", default=None)
+
+
+def current_request_id():
+    trace = _current.get()
+    return trace.request_id if trace is not None else None
+
+
+def _observer(kind, label, info):
+    trace = _current.get()
+    if trace is None:
+        return None
+    if trace.sampled:
+        return trace.child(kind, label, info)
+    if "request" in info:
+        trace.propagate(info["request"], trace.root.span_id)
+    return None
+
+
+# -- exporters --
+
+class JsonLinesExporter:
+    """Appends to `path`; once it reaches max_bytes it becomes path.1 (path.1 becomes path.2, ...)."""
+
+    def __init__(self, path, max_bytes=None, backups=3):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def _rotate(self):
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+            for n in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{n}"):
+                    os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+            if self.backups:
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+        except FileNotFoundError:
+            pass  # not written yet, or another worker is rotating it right now
+
+    def export(self, spans):
+        lines = "".join(json.dumps(span.as_dict()) + "\n" for span in spans)
+        with self._lock:
+            if self.max_bytes:
+                self._rotate()
+            with open(self.path, "a") as fh:
+                fh.write(lines)
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP with JSON encoding; batches are posted by a daemon thread so requests never wait."""
+
+    KINDS = {"internal": 1, "server": 2, "client": 3}
+
+    def __init__(self, endpoint, headers=None, service_name="wazitrade", timeout=5, max_queue=10000):
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces" if not endpoint.endswith("/v1/traces") else endpoint
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.service_name = service_name
+        self.timeout = timeout
+        self._queue = queue.Queue(max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        self._start()
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                return  # the collector is down or slow; drop rather than grow
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        import requests
+
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 512:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                requests.post(self.endpoint, data=json.dumps(self._payload(batch)), headers=self.headers,
+                              timeout=self.timeout).raise_for_status()
+            except requests.RequestException:
+                logger.warning("Dropped %d spans: OTLP export to %s failed", len(batch), self.endpoint)
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def _payload(self, spans):
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "core.tracing"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                    "name": span.name,
+                    "kind": self.KINDS[span.kind],
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [{"key": k, "value": self._value(v)} for k, v in span.attributes.items()],
+                    "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                } for span in spans],
+            }],
+        }]}
+
+
+exporter = SimpleLazyObject(lambda: import_string(settings.TRACE_EXPORTER)(**settings.TRACE_EXPORTER_OPTIONS))
+
+
+# -- middleware --
+
+class TracingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrumentation.install()
+        instrumentation.add_observer(_observer)
+
+    def _start(self, request):
+        """The request's Trace, from the incoming headers and the sample rate."""
+        parent = TRACEPARENT.match(request.headers.get("traceparent", ""))
+        request_id = request.headers.get("X-Request-ID", "")
+        if not REQUEST_ID.match(request_id):
+            request_id = None
+
+        if parent:
+            trace_id, parent_id = parent.group(1), parent.group(2)
+        else:
+            trace_id, parent_id = _hex_id(16), None
+        if parent and request.META.get("REMOTE_ADDR") in settings.TRACE_TRUSTED_PROXIES:
+            sampled = bool(int(parent.group(3), 16) & 1)
+        else:
+            # an untrusted caller's trace is continued, but we decide whether to record it
+            sampled = random.random() < settings.TRACE_SAMPLE_RATE
+        return Trace(trace_id, request_id or trace_id, parent_id, sampled)
+
+    def __call__(self, request):
+        trace = self._start(request)
+        request.request_id = trace.request_id
+        token = _current.set(trace)
+        response = None
+        try:
+            response = self.get_response(request)
+        except Exception as exc:
+            trace.root.error = type(exc).__name__
+            raise
+        finally:
+            _current.reset(token)
+            if trace.sampled:
+                self._finish(request, trace, response)
+        response["X-Request-ID"] = trace.request_id
+        return response
+
+    def _finish(self, request, trace, response):
+        root = trace.root
+        root.end_ns = time.time_ns()
+        match = request.resolver_match
+        root.name = f"{request.method} {match.view_name if match and match.view_name else request.path}"
+        root.attributes.update({
+            "http.method": request.method,
+            "http.target": request.path[:500],
+            "request_id": trace.request_id,
+        })
+        if match and match.view_name:
+            root.attributes["http.route"] = match.view_name
+        if response is not None:
+            root.attributes["http.status_code"] = response.status_code
+            if response.status_code >= 500:
+                root.error = root.error or f"HTTP {response.status_code}"
+        user = getattr(request, "_cached_user", None)  # only if the request loaded it anyway
+        if user is not None and user.is_authenticated:
+            root.attributes["user.id"] = user.pk
+        if trace.dropped:
+            root.attributes["spans.dropped"] = trace.dropped
+        try:
+            exporter.export(trace.spans)
+        except Exception:
+            logger.exception("Trace export failed")
@@ -92,6 +92,12 @@ path(
     name="search_help"
 ),
 
+path("ops/cache-stats/", views.cache_stats_view, name="cache-stats"),
+path("ops/profiles/", views.request_profiles_view, name="request-profiles"),
+path("ops/profiles.json", views.request_profiles_json, name="request-profiles-json"),
+path("ops/profiles/<int:profile_id>/", views.request_profile_detail, name="request-profile"),
+path("ops/metrics/", views.metrics_view, name="metrics"),
+
 path("terms/", views.terms_page, name="terms"),
 path("privacy/", views.privacy_page, name="privacy"),
 path("returns/", views.returns_page, name="returns"),
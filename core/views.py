@@ -1,11 +1,13 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Category, Product, SubCategory
+from .models import Category, Product, ProductImage, SubCategory
 import json
 from django.db.models import Q
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
 
 
 # core/views.py — replace your new_products_by_path with this
@@ -31,14 +33,12 @@ from django.contrib.auth.backends import ModelBackend
 
 # core/views.py
 from django.http import JsonResponse
-from .models import Message
 from django.views.decorators.csrf import csrf_exempt
 
-from django.db.models import F, Count
+from django.db.models import F, Count, Prefetch
 
 
 from django.db.models import Sum, Q
-from django.core.cache import cache
 from django.utils import timezone
 
 
@@ -52,30 +52,84 @@ from django.db.models import Q
 from .models import HelpCategory, HelpArticle
 
 from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from reports.rollups import daily_series
+from . import metrics, profiling
+from .caching import get_or_compute, stats as cache_stats
+from .counters import count_view, help_article_views, product_views
+from .querycache import cached, cached_first, stats as query_cache_stats
+from .freshness import (
+    category_stamps, conditional, new_products_stamps, product_stamps, subcategories_stamps, subcategory_stamps,
+)
+from .images import image_url
+from .messaging import MessagingError, send_product_message, serialize_message, sync_conversation, unread_total
+from .models import Conversation
+from django.core.paginator import Paginator
+from search.index import search_conversations
+from chat.realtime import push_product_read
+from django.conf import settings
+
+
+def seller_profile(user):
+    """The user's Seller (through the query cache), or None if they aren't one."""
+    return cached_first(Seller.objects.filter(user_id=user.pk), name="seller")
 
 
 # ---------- HOME & PRODUCTS ----------
+# The listing querysets are shared with core.queryplans, which checks that they stay indexed.
+def listed_products(**filters):
+    """Approved products matching `filters`, newest first."""
+    return Product.objects.filter(approved=True, **filters).order_by("-created_at")
+
+
+def new_arrivals():
+    return listed_products()[:10]
+
+
+def top_deals():
+    """Discounted approved products, newest first."""
+    return listed_products(initial_price__isnull=False, initial_price__gt=F('base_price'))[:10]
+
+
+def popular_products():
+    """Approved products with the most page views."""
+    return Product.objects.filter(approved=True).order_by("-views")[:10]
+
+
+def related_products(product):
+    """Other approved products in the product's category, newest first."""
+    return listed_products(category_id=product.category_id).exclude(id=product.id)[:8]
+
+
+def published_articles(category_id):
+    return HelpArticle.objects.filter(category_id=category_id, is_published=True)
+
+
 def home(request):
-    all_categories = Category.objects.all()  # <-- add this
-    new_arrivals = Product.objects.filter(approved=True).order_by("-created_at")[:10]
-    top_deals = Product.objects.filter(approved=True, initial_price__isnull=False, initial_price__gt=F('base_price')).order_by("-created_at")[:10]
+    all_categories = Category.objects.prefetch_related("subcategories")  # <-- add this
+    arrivals = new_arrivals()
+    deals = top_deals()
     best_sellers = Product.objects.filter(approved=True).annotate(reviews_count=Count("reviews")).order_by("-reviews_count")[:10]
-    popular_products = Product.objects.all()[0:10]  # example
-    promotions = Promotion.objects.filter(active=True).first()
+    trending = popular_products().prefetch_related(
+        Prefetch("images", queryset=ProductImage.objects.filter(status="ready").order_by("id"), to_attr="ready_image_list")
+    )  # trending by page views
+    promotions = cached_first(Promotion.objects.filter(active=True), timeout=300)
     context = {
         "all_categories": all_categories,   # <-- pass it
-        "new_arrivals": new_arrivals,
-        "top_deals": top_deals,
+        "new_arrivals": arrivals,
+        "top_deals": deals,
         "best_sellers": best_sellers,
-        "popular_products": popular_products,
+        "popular_products": trending,
         "promotions": promotions,   # <-- ADD THIS
     }
     return render(request, "home.html", context)
 
 
+@conditional(category_stamps, private=True, max_age=0, must_revalidate=True)
 def products_by_category(request, category_id):
     category = get_object_or_404(Category, id=category_id)
-    products = Product.objects.filter(category=category)
+    products = listed_products(category=category)
 
     return render(request, "products_by_category.html", {
         "current_category": category,
@@ -84,32 +138,19 @@ def products_by_category(request, category_id):
     })
 
 
-def products_by_subcategory(request, subcategory_id):
-    subcategory = get_object_or_404(SubCategory, id=subcategory_id)
-    products = Product.objects.filter(subcategory=subcategory)
-
-    return render(request, "products_by_subcategory.html", {
-        "subcategory": subcategory,
-        "products": products,
-        "category": subcategory.category,
-    })
-
-
+@conditional(product_stamps, private=True, max_age=0, must_revalidate=True)
 def product_detail(request, product_id):
     product = get_object_or_404(Product, id=product_id)
+    # counted here, not in the validator, so revalidated (304) requests aren't views
+    count_view(request, product_views, product.id)
     color_images = {}
-    for img in product.images.all():
-        color_images.setdefault(img.color or "default", []).append(img.image.url)
+    for img in product.ready_images:
+        color_images.setdefault(img.color or "default", []).append(image_url(img.image, "gallery"))
     if product.main_image:
-        color_images.setdefault("default", []).insert(0, product.main_image.url)
+        color_images.setdefault("default", []).insert(0, image_url(product.main_image, "gallery"))
 
     colors = [c.strip() for c in product.color_options.split(',')] if product.color_options else []
-    related_products = Product.objects.filter(
-    category=product.category,
-    approved=True
-        ).exclude(
-         id=product.id
-       )[:8]
+    related = cached(related_products(product))
     context = {
         'product': product,
         'color_images_json': json.dumps(color_images),
@@ -120,7 +161,7 @@ def product_detail(request, product_id):
         'recommended_supplier': product.recommended_from_supplier.all(),
         "colors": colors,
         "transport_fee": getattr(product, "transport_fee", 0),
-        "related_products": related_products,
+        "related_products": related,
     }
     return render(request, "product_detail.html", context)
 
@@ -230,12 +271,11 @@ def seller_pending_view(request):
     user = request.user
 
     # Ensure user is a seller
-    if not hasattr(user, 'seller_profile'):
+    seller = seller_profile(user)
+    if seller is None:
         messages.error(request, "You need a seller account to access this page.")
         return redirect('core:seller-login')
 
-    seller = user.seller_profile
-
     # If approved, redirect to dashboard
     if seller.approved:
         return redirect('core:seller-dashboard')
@@ -311,12 +351,11 @@ def buy_now(request, product_id):
 def seller_dashboard(request):
     user = request.user
 
-    if not hasattr(user, 'seller_profile'):
+    seller = seller_profile(user)
+    if seller is None:
         messages.error(request, "You need a seller account to access this page.")
         return redirect('core:seller-login')
 
-    seller = user.seller_profile
-
     if not seller.approved:
         # Pending seller → go to pending page
         return redirect('core:seller-pending')
@@ -324,23 +363,26 @@ def seller_dashboard(request):
     products = seller.products.all()
     
     # Count unread messages for this seller
-    unread_count = Message.objects.filter(receiver=request.user, read=False).count()
+    unread_count = unread_total(request.user)
+
+    # Sales chart comes from the daily rollups, not the order tables
+    sales = daily_series(seller.daily_sales.all())
 
     return render(request, "seller/dashboard.html", {
         "products": products,
-        "unread_count": unread_count  # Pass unread count to template
+        "unread_count": unread_count,  # Pass unread count to template
+        "sales": sales,
     })
 
 @login_required(login_url='/seller/login/')
 def seller_add_product(request):
 
     # --- 1. Check if user is a seller ---
-    if not hasattr(request.user, 'seller_profile'):
+    seller = seller_profile(request.user)
+    if seller is None:
         messages.error(request, "Only sellers can add products.")
         return redirect("core:seller-login")
 
-    seller = request.user.seller_profile
-
     # --- 2. Check if seller is approved ---
     if not seller.approved:
         return redirect("core:seller-pending-view")
@@ -366,35 +408,21 @@ def seller_add_product(request):
 @login_required
 def send_message(request):
     if request.method == "POST":
-        content = request.POST.get("content")
-        product_id = request.POST.get("product_id")
-        receiver_id = request.POST.get("receiver_id")  # <-- new field from frontend
-
-        product = Product.objects.filter(id=product_id).first()
-        if not product:
-            return JsonResponse({"error": "Invalid product"}, status=400)
-
-        # Determine receiver dynamically
-        if receiver_id:
-            receiver = User.objects.filter(id=receiver_id).first()
-            if not receiver:
-                return JsonResponse({"error": "Receiver not found"}, status=400)
-        else:
-            # fallback: send to seller
-            receiver = product.seller.user if product.seller else None
-            if not receiver:
-                return JsonResponse({"error": "Seller not found"}, status=400)
-
-        msg = Message.objects.create(
-            sender=request.user,
-            receiver=receiver,
-            product=product,
-            content=content
-        )
-
+        try:
+            msg = send_product_message(
+                request.user,
+                request.POST.get("product_id"),
+                request.POST.get("content"),
+                receiver_id=request.POST.get("receiver_id"),  # <-- new field from frontend
+            )
+        except MessagingError as e:
+            return JsonResponse({"error": e.message}, status=e.status)
+
+        # WebSocket clients get the message pushed by chat.signals
         return JsonResponse({
+            "id": msg.id,
             "sender": request.user.username,
-            "receiver": receiver.username,
+            "receiver": msg.receiver.username,
             "content": msg.content,
             "timestamp": msg.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
         })
@@ -402,47 +430,54 @@ def send_message(request):
 
 @login_required
 def fetch_messages(request, product_id):
+    """
+    Incremental sync of the user's conversation about a product, for clients
+    without a WebSocket (those get new messages pushed by chat.signals).
+
+    ?since=<message id>  only return newer messages (0 = whole conversation)
+
+    A poll with nothing new costs two indexed lookups and no writes.
+    """
     product = Product.objects.filter(id=product_id).first()
     if not product:
         return JsonResponse({"error": "Invalid product"}, status=400)
 
-    # Only fetch messages for this user
-    messages_qs = Message.objects.filter(
-        product=product
-    ).filter(
-        Q(sender=request.user) | Q(receiver=request.user)
-    ).order_by("timestamp")
-
-    data = []
-    for msg in messages_qs:
-        data.append({
-            "id": msg.id,
-            "sender": msg.sender.username,
-            "receiver": msg.receiver.username,
-            "content": msg.content,
-            "timestamp": msg.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-        })
+    try:
+        since = max(0, int(request.GET.get("since", 0)))
+    except ValueError:
+        return JsonResponse({"error": "Invalid since"}, status=400)
 
-        if msg.receiver == request.user and not msg.read:
-            msg.read = True
-            msg.save()
+    messages_list, read_ids, senders = sync_conversation(request.user, product, since)
+    push_product_read(request.user, product.id, read_ids, senders)
 
-    return JsonResponse({"messages": data})
+    data = [serialize_message(msg) for msg in messages_list]
+    return JsonResponse({
+        "messages": data,
+        "last_id": data[-1]["id"] if data else since,
+    })
 
 
 @login_required(login_url='/seller/login/')
 def seller_messages(request):
     user = request.user
-    if not hasattr(user, 'seller_profile'):
+    if seller_profile(user) is None:
         messages.error(request, "You need a seller account to access this page.")
         return redirect('core:seller-login')
 
-    seller = user.seller_profile
-    messages_qs = Message.objects.filter(receiver=user).order_by('-timestamp')
+    # one row per buyer/product thread, newest first, from the inbox read model
+    conversations = (
+        Conversation.objects.filter(seller=user)
+        .select_related('buyer', 'product')
+        .order_by(F('last_message_at').desc(nulls_last=True), '-id')
+    )
+    page = Paginator(conversations, 20).get_page(request.GET.get('page'))
 
+    query = request.GET.get('q', '').strip()
     return render(request, 'seller/messages.html', {
-        'messages': messages_qs,
-        'unread_count': messages_qs.filter(read=False).count()
+        'conversations': page,
+        'unread_count': unread_total(user),
+        'query': query,
+        'search_hits': search_conversations(user, query) if query else None,
     })
 
 
@@ -450,17 +485,19 @@ def seller_messages(request):
 
 
 
+@conditional(subcategories_stamps, public=True, max_age=300)
 def get_subcategories(request, category_id):
-    subs = SubCategory.objects.filter(category_id=category_id)
+    subs = cached(SubCategory.objects.filter(category_id=category_id))
     data = {
         "subcategories": [{"id": s.id, "name": s.name} for s in subs]
     }
     return JsonResponse(data)
 
 
+@conditional(subcategory_stamps, private=True, max_age=0, must_revalidate=True)
 def products_by_subcategory(request, subcategory_id):
     subcat = get_object_or_404(SubCategory, id=subcategory_id)
-    products = Product.objects.filter(subcategory=subcat, approved=True)
+    products = listed_products(subcategory=subcat)
 
     return render(request, "products_by_category.html", {
         "current_category": subcat,
@@ -470,6 +507,7 @@ def products_by_subcategory(request, subcategory_id):
 
 
 
+@conditional(new_products_stamps, private=True, max_age=0, must_revalidate=True)
 def new_products_page(request):
     # Fetch newest products first (only approved products)
     products = Product.objects.filter(approved=True).order_by('-created_at')[:100]
@@ -498,6 +536,7 @@ def new_products_by_category(request, category_slug):
 
 
 
+@conditional(new_products_stamps, private=True, max_age=0, must_revalidate=True)
 def new_products_by_path(request, slug_path):
     """
     Dynamic resolver for /new/<...>/<...>/
@@ -562,20 +601,20 @@ def new_products_by_path(request, slug_path):
 def best_sellers(request):
     """
     Show automatic best sellers. Uses Order.items -> CartItem.quantity summed
-    only for paid orders. Cached for 10 minutes.
+    only for paid orders. Cached for 10 minutes, computed by one worker at a time.
     """
-    cache_key = "core:best_sellers_v1"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return render(request, "best_sellers.html", {"top_products": cached})
+    top_list = get_or_compute("core:best_sellers_v1", _best_sellers, 600)
+    return render(request, "best_sellers.html", {"top_products": top_list})
+
 
+def _best_sellers():
     # annotate each product with sold_count = sum of quantities for cartitems that belong to paid orders
     products_qs = Product.objects.filter(approved=True).annotate(
         sold_count=Sum(
             "cart_items__quantity",
             filter=Q(cart_items__orders__paid=True)
         ),
-        reviews_count=Count("reviews")
+        reviews_count=Count("reviews", distinct=True)
     )
 
     # Ensure sold_count default 0 and order
@@ -586,11 +625,7 @@ def best_sellers(request):
     for p in products:
         p.sold_count = p.sold_count or 0
         top_list.append(p)
-
-    # cache for 10 minutes (600s)
-    cache.set(cache_key, top_list, 600)
-
-    return render(request, "best_sellers.html", {"top_products": top_list})
+    return top_list
 
 
 def contact_page(request):
@@ -611,10 +646,11 @@ def contact_page(request):
 
 
 
+@conditional(subcategories_stamps, public=True, max_age=300)
 def subcategories_json(request):
     category_id = request.GET.get('category')
-    subcategories = SubCategory.objects.filter(category_id=category_id).values('id', 'name')
-    return JsonResponse(list(subcategories), safe=False)
+    subcategories = cached(SubCategory.objects.filter(category_id=category_id))
+    return JsonResponse([{"id": s.id, "name": s.name} for s in subcategories], safe=False)
 
 
 
@@ -622,9 +658,8 @@ def subcategories_json(request):
 
 
 def help_center(request):
-    categories = HelpCategory.objects.prefetch_related(
-        "articles"
-    ).order_by("order")
+    # the page lists category cards only; their articles aren't rendered
+    categories = cached(HelpCategory.objects.order_by("order"))
 
     popular_articles = HelpArticle.objects.filter(
         is_published=True,
@@ -648,7 +683,7 @@ def help_center(request):
 def help_category(request, slug):
     category = get_object_or_404(HelpCategory, slug=slug)
 
-    articles = category.articles.filter(is_published=True)
+    articles = published_articles(category.id)
 
     print("VIEW EXECUTED")
     print("Category:", category.name)
@@ -673,8 +708,8 @@ def help_detail(request, slug):
         is_published=True
     )
 
-    article.views += 1
-    article.save(update_fields=["views"])
+    # buffered: written back in batches by core.counters
+    count_view(request, help_article_views, article.id)
 
     related_articles = HelpArticle.objects.filter(
         category=article.category,
@@ -742,4 +777,48 @@ def sell_on_wazitrade(request):
                 return redirect("core:seller-dashboard")
             return redirect("core:seller-pending-view")
 
-    return render(request, "sell_on_wazitrade.html")
\ No newline at end of file
+    return render(request, "sell_on_wazitrade.html")
+
+
+@staff_member_required
+def cache_stats_view(request):
+    """Hit/miss counts of this worker's caches (core.caching, core.querycache)."""
+    def flat(counts):
+        return {f"{name}.{outcome}": n for (name, outcome), n in sorted(counts.items())}
+    return JsonResponse({
+        "cache": flat(cache_stats.snapshot()),
+        "query_cache": flat(query_cache_stats.snapshot()),
+    })
+
+
+@staff_member_required
+def request_profiles_view(request):
+    """Recent request profiles (core.profiling), in the admin's look."""
+    return render(request, "admin/request_profiles.html", {
+        **admin.site.each_context(request),
+        "title": "Request profiles",
+        "profiles": profiling.recent(),
+        "header": settings.REQUEST_PROFILE_HEADER,
+    })
+
+
+@staff_member_required
+def request_profiles_json(request):
+    return JsonResponse({"profiles": profiling.recent()})
+
+
+@staff_member_required
+def request_profile_detail(request, profile_id):
+    record = profiling.get(profile_id)
+    if record is None:
+        raise Http404("Profile not found or already overwritten.")
+    return JsonResponse(record)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint (core.metrics): a METRICS_TOKEN bearer token, or a staff session."""
+    token = settings.METRICS_TOKEN
+    bearer = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not ((token and constant_time_compare(bearer, token)) or request.user.is_staff):
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.exposition(metrics.collect()), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,5 +1,7 @@
 from pathlib import Path
 import os
+import sys
+import tempfile
 from dotenv import load_dotenv
 import dj_database_url
 
@@ -25,6 +27,7 @@ DATABASE_URL = os.environ.get("DATABASE_URL")
 SECRET_KEY = os.environ.get("SECRET_KEY", "fallback-secret-key")
 
 DEBUG = os.getenv("DEBUG", "True").lower() == "true"
+TESTING = sys.argv[1:2] == ["test"]
 
 ALLOWED_HOSTS = [ '127.0.0.1','localhost','ecomm-site-production.up.railway.app']
 CSRF_TRUSTED_ORIGINS = ['https://ecomm-site-production.up.railway.app']
@@ -56,6 +59,13 @@ INSTALLED_APPS = [
     'core',
     'payments',
     'chat',
+    'reports',
+    'archive',
+    'search',
+    'notifications',
+
+    # WebSockets (live chat)
+    'channels',
 
     # 👇 add these later
     "cloudinary",
@@ -74,19 +84,32 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',   
+    'core.tracing.TracingMiddleware',  # request IDs and sampled traces, see TRACE_*
+    'core.metrics.MetricsMiddleware',  # Prometheus metrics, see /ops/metrics/
+    'core.budgets.BudgetMiddleware',  # per-view query/time budgets, see VIEW_BUDGETS
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',  # sampled/staff-requested profiles; needs auth
 
     # Allauth middleware (required)
     'allauth.account.middleware.AccountMiddleware',
 
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.pagecache.PageCacheMiddleware',  # anonymous pages; needs session, auth and messages
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STORAGES = {
+    # media stays on local disk; CloudinaryField images upload through core.media
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    # minify, bundle, extract critical CSS, fingerprint, then gzip + brotli (core.assets)
+    "staticfiles": {"BACKEND": "core.assets.StaticAssetStorage"},
+}
+if TESTING:
+    # tests render pages without running collectstatic first
+    STORAGES["staticfiles"] = {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}
 
 
 # --------------------------
@@ -146,6 +169,32 @@ SOCIALACCOUNT_PROVIDERS = {
 }
 
 
+# --------------------------
+# ASGI / CHANNELS (live chat over WebSockets)
+# --------------------------
+ASGI_APPLICATION = 'mysite.asgi.application'
+
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    # shared layer so every worker/node sees every message
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [REDIS_URL]},
+        }
+    }
+else:
+    # single process (local development, tests)
+    CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+    }
+
+
+# chat pages render this many of the latest messages; older ones load on scroll
+CHAT_PAGE_SIZE = 50
+
+
 # --------------------------
 # CART SETTINGS
 # --------------------------
@@ -184,6 +233,202 @@ else:
     }
 
 
+# --------------------------
+# CACHES (core.caching): in-process LRU in front of a shared backend
+# --------------------------
+CACHES = {
+    "default": {
+        "BACKEND": "core.caching.TieredCache",
+        "OPTIONS": {
+            "SHARED": "shared",
+            "MAX_ENTRIES": 2000,
+            "LOCAL_TIMEOUT": 5,  # how long a worker may serve its own copy
+        },
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    } if REDIS_URL and not TESTING else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    } if TESTING else {
+        # local development: shared by every process on this machine
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("CACHE_DIR", BASE_DIR / ".cache"),
+    },
+}
+
+
+# query cache (core.querycache): saving a row of these models invalidates
+# every cached queryset that reads its table
+QUERY_CACHE_MODELS = [
+    "core.Category",  # its generation is also a catalog ETag stamp (core.freshness)
+    "core.Promotion",
+    "core.HelpCategory",
+    "core.SubCategory",
+    "core.Product",
+    "core.Seller",
+]
+QUERY_CACHE_TIMEOUT = 600
+
+
+# --------------------------
+# CONDITIONAL GET (core.freshness)
+# --------------------------
+# part of every catalog ETag, so a new deploy (new templates) is never answered with 304
+CATALOG_ETAG_SALT = os.environ.get("RAILWAY_DEPLOYMENT_ID", "dev")
+
+
+# --------------------------
+# VIEW BUDGETS (core.budgets): url name -> (max queries, max ms), None = unlimited
+# --------------------------
+# "raise" fails tests on an overrun, "log" only warns
+VIEW_BUDGET_MODE = os.environ.get("VIEW_BUDGET_MODE", "raise" if TESTING else "log")
+VIEW_BUDGET_DEFAULT = (20, 1000)
+VIEW_BUDGETS = {
+    # catalog
+    "core:home": (15, 500),
+    "core:products_by_category": (12, 400),
+    "core:products_by_subcategory": (12, 400),
+    "core:product_detail": (20, 500),
+    "core:new-products": (10, 400),
+    "core:new-products-by-path": (12, 400),
+    "core:best-sellers": (10, 500),
+    "core:deals-page": (12, 400),
+    "core:search": (10, 500),
+    "core:get_subcategories": (4, 100),
+    "core:subcategories_json": (4, 100),
+    # help and static pages
+    "core:help-center": (8, 300),
+    "core:help-category": (8, 300),
+    "core:help-detail": (8, 300),
+    "core:search_help": (8, 500),
+    "core:terms": (6, 200),
+    "core:privacy": (6, 200),
+    "core:returns": (6, 200),
+    "core:cookies": (6, 200),
+    "core:contact": (8, 300),
+    "core:sell-on-wazitrade": (8, 300),
+    # accounts (password hashing dominates the time)
+    "core:login": (12, 1500),
+    "core:register": (15, 1500),
+    "core:logout": (8, 300),
+    "core:seller-login": (12, 1500),
+    "core:seller-register": (15, 1500),
+    "core:seller-logout": (8, 300),
+    "core:seller-pending-view": (8, 300),
+    # seller area
+    "core:seller-dashboard": (20, 800),
+    "core:seller-add-product": (25, 1500),
+    "core:seller-messages": (20, 800),
+    "core:cache-stats": (6, 200),
+    "core:request-profiles": (6, 300),
+    "core:request-profiles-json": (6, 300),
+    "core:request-profile": (6, 200),
+    "core:metrics": (4, 500),
+    # chat
+    "core:send_message": (15, 500),
+    "core:fetch_messages": (15, 500),
+    "core:buy_now": (10, 300),
+    "chat:chat": (15, 500),
+    "chat:chat_session": (20, 500),
+    "chat:session_messages": (15, 500),
+    "chat:send_message": (15, 500),
+    # cart and checkout; the gateway calls are network-bound
+    "cart:cart_detail": (15, 500),
+    "cart:cart_add": (10, 300),
+    "cart:cart_remove": (10, 300),
+    "cart:cart_json": (10, 300),
+    "cart:checkout": (30, 1000),
+    "cart:dpo_pay": (30, None),
+    "cart:dpo_callback": (30, None),
+    "cart:order_detail": (15, 500),
+    "cart:order_confirmation": (15, 500),
+    "cart:order_history": (15, 500),
+    "payments:dpo_payment": (30, None),
+    "payments:dpo_payment_cart": (30, None),
+    "payments:dpo_callback": (30, None),
+}
+
+
+# --------------------------
+# ANONYMOUS PAGE CACHE (core.pagecache)
+# --------------------------
+PAGE_CACHE_VIEWS = {
+    "core:home",
+    "core:products_by_category",
+    "core:products_by_subcategory",
+    "core:product_detail",
+    "core:new-products",
+    "core:new-products-by-path",
+    "core:help-center",
+    "core:help-category",
+    "core:help-detail",
+}
+PAGE_CACHE_SECONDS = int(os.environ.get("PAGE_CACHE_SECONDS", 60))  # fresh
+PAGE_CACHE_STALE_SECONDS = 60 * 60  # served while one request re-renders, or when the DB is down
+PAGE_CACHE_LOCK_SECONDS = 30
+PAGE_CACHE_IGNORED_PARAMS = {"fbclid", "gclid"}  # and utm_*
+
+
+# --------------------------
+# REQUEST PROFILING (core.profiling)
+# --------------------------
+REQUEST_PROFILE_SAMPLE_RATE = float(os.environ.get("REQUEST_PROFILE_SAMPLE_RATE", 0))  # fraction of all requests
+REQUEST_PROFILE_HEADER = "X-Profile"  # "1" or "cprofile"; honoured for staff users
+REQUEST_PROFILE_BUFFER_SIZE = 200  # ring buffer slots in the shared cache
+REQUEST_PROFILE_TTL = 24 * 60 * 60
+
+
+# --------------------------
+# METRICS (core.metrics, scraped from /ops/metrics/)
+# --------------------------
+# one snapshot file per worker; workers on a host must share the directory.
+# Tests get their own, so a test run never shows up in a local server's metrics.
+METRICS_DIR = os.environ.get(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "wazitrade-metrics-test" if TESTING else "wazitrade-metrics")
+)
+METRICS_FLUSH_SECONDS = int(os.environ.get("METRICS_FLUSH_SECONDS", 5))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")  # scrapers send "Authorization: Bearer <token>"
+
+
+# --------------------------
+# TRACING (core.tracing)
+# --------------------------
+# off unless asked for
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0))
+# a traceparent's sampled flag is only followed when the request comes from one of these
+# addresses (REMOTE_ADDR), e.g. a tracing load balancer; anyone else could force full tracing
+TRACE_TRUSTED_PROXIES = [ip for ip in os.environ.get("TRACE_TRUSTED_PROXIES", "").split(",") if ip]
+TRACE_MAX_SPANS = 1000  # per request; further spans are only counted
+OTEL_EXPORTER_OTLP_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+if OTEL_EXPORTER_OTLP_ENDPOINT:
+    TRACE_EXPORTER = "core.tracing.OtlpHttpExporter"
+    TRACE_EXPORTER_OPTIONS = {"endpoint": OTEL_EXPORTER_OTLP_ENDPOINT}
+else:
+    TRACE_EXPORTER = "core.tracing.JsonLinesExporter"
+    # outside the checkout by default; rotated at max_bytes, keeping `backups` old files
+    TRACE_EXPORTER_OPTIONS = {
+        "path": os.environ.get("TRACE_FILE", os.path.join(tempfile.gettempdir(), "wazitrade-traces.jsonl")),
+        "max_bytes": 50 * 1024 * 1024,
+        "backups": 3,
+    }
+
+
+# --------------------------
+# VIEW COUNTERS (core.counters)
+# --------------------------
+VIEW_COUNTER_FLUSH_SECONDS = int(os.environ.get("VIEW_COUNTER_FLUSH_SECONDS", 30))
+HELP_POPULAR_ARTICLES = 8  # most viewed articles flagged is_popular
+
+
+# --------------------------
+# ARCHIVAL (manage.py archive_cold_data)
+# --------------------------
+# messages, orders and payments older than this move to the archive tables
+ARCHIVE_HORIZON_DAYS = int(os.environ.get("ARCHIVE_HORIZON_DAYS", 365))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", 1000))
+
+
 # --------------------------
 # STATIC & MEDIA FILES
 # --------------------------
@@ -191,6 +436,16 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# built by collectstatic (core.assets.StaticAssetStorage)
+STATIC_BUNDLES = {}  # "bundle name": ["source", ...], concatenated in order
+# above-the-fold rules of a stylesheet, inlined by {% critical_css %} in base.html
+CRITICAL_CSS = {
+    "core/critical.css": {
+        "source": "core/styles.css",
+        "templates": ["base.html", "home.html"],
+    },
+}
+
 
 # --------------------------
 # EMAIL SETTINGS
@@ -203,14 +458,24 @@ EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = f"WaziTrade Marketplace <{EMAIL_HOST_USER}>"
 
+# absolute links in emails
+SITE_URL = os.environ.get("SITE_URL", "https://ecomm-site-production.up.railway.app")
+
+# new-message digests (manage.py send_message_digests, run from cron)
+MESSAGE_DIGEST_DELAY_MINUTES = int(os.environ.get("MESSAGE_DIGEST_DELAY_MINUTES", 15))  # give live chat a chance first
+MESSAGE_DIGEST_MIN_INTERVAL_MINUTES = int(os.environ.get("MESSAGE_DIGEST_MIN_INTERVAL_MINUTES", 60))  # per user
+MESSAGE_DIGEST_MAX_ATTEMPTS = 5
+
 # --------------------------
 # DPO PAYMENT SETTINGS
 # --------------------------
 DPO_MERCHANT_ID = os.environ.get("DPO_MERCHANT_ID", "")
 DPO_API_KEY = os.environ.get("DPO_API_KEY", "")
 DPO_SITE_NAME = os.environ.get("DPO_SITE_NAME", "")
-DPO_PAYMENT_URL = 'https://payments.dpo.co.ug/v1/checkout'
-DPO_END_POINT = "https://sandbox.dpo.co.ke/"
+# overridable so load tests can point at the local simulator (manage.py dpo_simulator)
+DPO_PAYMENT_URL = os.environ.get("DPO_PAYMENT_URL", 'https://payments.dpo.co.ug/v1/checkout')
+DPO_VERIFY_URL = os.environ.get("DPO_VERIFY_URL", "https://payments.dpo.co.ug/v1/verify/")
+DPO_END_POINT = os.environ.get("DPO_END_POINT", "https://sandbox.dpo.co.ke/")
 DPO_PUBLIC_KEY = os.environ.get("DPO_PUBLIC_KEY", "")
 DPO_SECRET_KEY = os.environ.get("DPO_SECRET_KEY", "")
 DPO_COMPANY_TOKEN = os.environ.get("DPO_COMPANY_TOKEN", "")
@@ -231,3 +496,25 @@ DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# background image ingestion (core.media): uploads are staged on local disk,
+# then pushed to storage by a bounded pool. Staging must be on a disk every
+# web worker and `manage.py process_media_uploads` can see.
+MEDIA_STAGING_ROOT = Path(os.environ.get("MEDIA_STAGING_ROOT", BASE_DIR / "media_staging"))
+MEDIA_UPLOAD_BACKEND = os.environ.get(
+    "MEDIA_UPLOAD_BACKEND",
+    "core.media.CloudinaryUploader" if os.getenv("CLOUDINARY_CLOUD_NAME") else "core.media.StubUploader",
+)
+MEDIA_UPLOAD_WORKERS = int(os.environ.get("MEDIA_UPLOAD_WORKERS", 4))
+MEDIA_UPLOAD_MAX_ATTEMPTS = 5
+
+# thumbnails of locally stored images (core.thumbnails), an LRU cache on disk
+THUMBNAIL_DIR = "thumbs"
+THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get("THUMBNAIL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+THUMBNAIL_WORKERS = 2
+
+# how responsive image URLs are built (core.images); the local backend needs no network
+IMAGE_URL_BACKEND = os.environ.get(
+    "IMAGE_URL_BACKEND",
+    "core.images.CloudinaryBackend" if os.getenv("CLOUDINARY_CLOUD_NAME") else "core.images.LocalBackend",
+)
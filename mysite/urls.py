@@ -29,6 +29,7 @@ urlpatterns = [
     path('payments/', include('payments.urls', namespace='payments')),
     #path('chat/', include('chat.urls', namespace='chat')),
     path("chat/", include(("chat.urls", "chat"), namespace="chat")),
+    path('search/', include('search.urls', namespace='search')),
 
 ]
 
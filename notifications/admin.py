@@ -0,0 +1,22 @@
+from django.contrib import admin
+
+from .models import DigestCursor, MessageDigest
+
+
+@admin.register(MessageDigest)
+class MessageDigestAdmin(admin.ModelAdmin):
+    list_display = ("user", "status", "message_count", "conversation_count", "attempts", "created_at", "sent_at")
+    list_filter = ("status", "created_at")
+    list_select_related = ("user",)
+    search_fields = ("user__username", "user__email")
+    readonly_fields = [f.name for f in MessageDigest._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DigestCursor)
+class DigestCursorAdmin(admin.ModelAdmin):
+    list_display = ("user", "product_message_id", "session_message_id", "last_digest_at")
+    search_fields = ("user__username",)
+    readonly_fields = ("user", "product_message_id", "session_message_id")
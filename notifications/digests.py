@@ -0,0 +1,245 @@
+# notifications/digests.py
+"""
+Batched new-message notifications.
+
+Instead of an email per message, a periodic job (manage.py send_message_digests)
+collects each user's unread messages since their last digest, renders one
+summary per user and sends all of them over a single SMTP connection.
+
+A digest is claimed before it is sent: the user's cursor advances in the same
+transaction that records the digest, so a rerun (or a crash mid-send) retries
+digests that failed but never builds a second one for the same messages.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from chat.models import Message as SessionMessage
+from core.models import Message as ProductMessage
+
+from .models import DigestCursor, MessageDigest
+
+logger = logging.getLogger(__name__)
+
+# a pending digest this old was claimed by a run that never got to send it
+STALE_PENDING_MINUTES = 30
+
+
+def _absolute(path):
+    return settings.SITE_URL.rstrip("/") + path
+
+
+# ---------- COLLECTING ----------
+def recipients_with_unread(cutoff):
+    """Ids of users with unread messages sent before `cutoff`."""
+    user_ids = set(
+        ProductMessage.objects.filter(read=False, timestamp__lte=cutoff)
+        .values_list("receiver_id", flat=True).distinct()
+    )
+    session_rows = (
+        SessionMessage.objects.filter(read=False, timestamp__lte=cutoff)
+        .values_list("sender_id", "session__user_id", "session__product__seller__user_id")
+        .distinct()
+    )
+    for sender_id, buyer_id, seller_user_id in session_rows:
+        user_ids.update(uid for uid in (buyer_id, seller_user_id) if uid and uid != sender_id)
+    return user_ids
+
+
+def _unread_product_messages(user, cursor, cutoff):
+    return list(
+        ProductMessage.objects.filter(
+            receiver=user, read=False, id__gt=cursor.product_message_id, timestamp__lte=cutoff
+        )
+        .select_related("sender", "product__seller")
+        .order_by("id")
+    )
+
+
+def _unread_session_messages(user, cursor, cutoff):
+    return list(
+        SessionMessage.objects.filter(
+            Q(session__user=user) | Q(session__product__seller__user=user),
+            read=False, id__gt=cursor.session_message_id, timestamp__lte=cutoff,
+        )
+        .exclude(sender=user)
+        .select_related("sender", "session__product")
+        .order_by("id")
+    )
+
+
+def _conversations(user, product_messages, session_messages):
+    """Group messages into one summary line per conversation, latest first."""
+    conversations = {}
+
+    for msg in product_messages:
+        product = msg.product
+        if product is not None and product.seller and product.seller.user_id == user.id:
+            url = reverse("core:seller-messages")
+        elif product is not None:
+            url = reverse("core:product_detail", args=[product.id])
+        else:
+            url = reverse("core:home")
+        key = ("product", msg.product_id, msg.sender_id)
+        conversations.setdefault(key, {"sender": msg.sender, "product": product, "url": _absolute(url), "messages": []})
+        conversations[key]["messages"].append(msg)
+
+    for msg in session_messages:
+        product = msg.session.product
+        url = reverse("chat:chat_session", args=[product.id]) if product else reverse("chat:chat")
+        key = ("session", msg.session_id, msg.sender_id)
+        conversations.setdefault(key, {"sender": msg.sender, "product": product, "url": _absolute(url), "messages": []})
+        conversations[key]["messages"].append(msg)
+
+    summaries = []
+    for conv in conversations.values():
+        latest = max(conv["messages"], key=lambda m: (m.timestamp, m.id))
+        summaries.append({
+            "sender": conv["sender"],
+            "product": conv["product"],
+            "url": conv["url"],
+            "count": len(conv["messages"]),
+            "latest": latest.content,
+            "latest_at": latest.timestamp,
+        })
+    summaries.sort(key=lambda s: s["latest_at"], reverse=True)
+    return summaries
+
+
+def render_digest(user, conversations):
+    message_count = sum(c["count"] for c in conversations)
+    context = {
+        "user": user,
+        "conversations": conversations,
+        "message_count": message_count,
+        "site_url": settings.SITE_URL,
+    }
+    subject = f"You have {message_count} unread message{'s' if message_count != 1 else ''} on WaziTrade"
+    body = render_to_string("notifications/message_digest.txt", context)
+    html_body = render_to_string("notifications/message_digest.html", context)
+    return subject, body, html_body
+
+
+# ---------- CLAIMING ----------
+def claim_digest(user, now=None):
+    """
+    Build and record the user's next digest, advancing their cursor past the
+    messages it covers. Returns None when the user is throttled or has nothing new.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(minutes=settings.MESSAGE_DIGEST_DELAY_MINUTES)
+    throttle = timedelta(minutes=settings.MESSAGE_DIGEST_MIN_INTERVAL_MINUTES)
+
+    with transaction.atomic():
+        DigestCursor.objects.get_or_create(user=user)
+        # lock the cursor so two overlapping runs can't claim the same messages
+        cursor = DigestCursor.objects.select_for_update().get(user=user)
+        if cursor.last_digest_at and now - cursor.last_digest_at < throttle:
+            return None
+
+        product_messages = _unread_product_messages(user, cursor, cutoff)
+        session_messages = _unread_session_messages(user, cursor, cutoff)
+        if not product_messages and not session_messages:
+            return None
+
+        conversations = _conversations(user, product_messages, session_messages)
+        subject, body, html_body = render_digest(user, conversations)
+        digest = MessageDigest.objects.create(
+            user=user,
+            subject=subject,
+            body=body,
+            html_body=html_body,
+            message_count=len(product_messages) + len(session_messages),
+            conversation_count=len(conversations),
+        )
+
+        if product_messages:
+            cursor.product_message_id = product_messages[-1].id
+        if session_messages:
+            cursor.session_message_id = session_messages[-1].id
+        cursor.last_digest_at = now
+        cursor.save()
+
+    return digest
+
+
+def claim_digests(now=None, limit=None):
+    now = now or timezone.now()
+    cutoff = now - timedelta(minutes=settings.MESSAGE_DIGEST_DELAY_MINUTES)
+    throttled = DigestCursor.objects.filter(
+        last_digest_at__gt=now - timedelta(minutes=settings.MESSAGE_DIGEST_MIN_INTERVAL_MINUTES)
+    ).values_list("user_id", flat=True)
+
+    users = (
+        User.objects.filter(id__in=recipients_with_unread(cutoff), is_active=True)
+        .exclude(email="")
+        .exclude(id__in=throttled)
+        .order_by("id")
+    )
+    if limit:
+        users = users[:limit]
+
+    return [digest for digest in (claim_digest(user, now) for user in users) if digest]
+
+
+# ---------- SENDING ----------
+def _email(digest):
+    email = EmailMultiAlternatives(
+        subject=digest.subject,
+        body=digest.body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[digest.user.email],
+    )
+    if digest.html_body:
+        email.attach_alternative(digest.html_body, "text/html")
+    return email
+
+
+def send_digests(digests):
+    """Send digests over one SMTP connection; returns (sent, failed)."""
+    if not digests:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    connection.open()
+    try:
+        for digest in digests:
+            digest.attempts += 1
+            try:
+                connection.send_messages([_email(digest)])
+            except Exception:
+                logger.exception("Failed to send message digest %s", digest.pk)
+                digest.status = "failed"
+                failed += 1
+            else:
+                digest.status = "sent"
+                digest.sent_at = timezone.now()
+                sent += 1
+            digest.save(update_fields=["attempts", "status", "sent_at"])
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def retryable_digests(now=None):
+    """
+    Claimed digests that have not gone out: SMTP failures, and pending ones
+    old enough that the run which claimed them must have died.
+    """
+    now = now or timezone.now()
+    stale = now - timedelta(minutes=STALE_PENDING_MINUTES)
+    return list(
+        MessageDigest.objects.filter(Q(status="failed") | Q(status="pending", created_at__lt=stale))
+        .filter(attempts__lt=settings.MESSAGE_DIGEST_MAX_ATTEMPTS)
+        .select_related("user")
+        .order_by("created_at")
+    )
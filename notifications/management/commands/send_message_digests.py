@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from notifications.digests import claim_digests, retryable_digests, send_digests
+
+
+class Command(BaseCommand):
+    help = "Email each user one summary of their unread messages (run every few minutes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            help="Build at most this many new digests in this run.",
+        )
+        parser.add_argument(
+            "--no-retry",
+            action="store_true",
+            help="Don't resend digests that failed or were left pending by an earlier run.",
+        )
+
+    def handle(self, *args, **options):
+        # retries first, so they are not mistaken for this run's fresh digests
+        retries = [] if options["no_retry"] else retryable_digests()
+        digests = claim_digests(limit=options["limit"])
+
+        sent, failed = send_digests(retries + digests)
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {len(digests)} digests, retried {len(retries)}: {sent} sent, {failed} failed."
+        ))
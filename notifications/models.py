@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.db import models
+
+
+class DigestCursor(models.Model):
+    """
+    How far a user's message digests have got. Messages up to these ids have
+    been claimed by a digest, so a rerun never picks them up again.
+    """
+    user = models.OneToOneField(User, primary_key=True, related_name='digest_cursor', on_delete=models.CASCADE)
+    product_message_id = models.BigIntegerField(default=0)  # core.Message
+    session_message_id = models.BigIntegerField(default=0)  # chat.Message
+    last_digest_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user} digest cursor"
+
+
+class MessageDigest(models.Model):
+    """One summary email: claimed (cursor advanced) first, sent afterwards."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, related_name='message_digests', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    message_count = models.PositiveIntegerField(default=0)
+    conversation_count = models.PositiveIntegerField(default=0)
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Digest for {self.user} ({self.status})"
@@ -0,0 +1,136 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+from smtplib import SMTPRecipientsRefused
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from chat.models import ChatSession, Message as SessionMessage
+from core.models import Category, Message as ProductMessage, Product, Seller
+
+from .digests import STALE_PENDING_MINUTES, claim_digest, claim_digests, retryable_digests, send_digests
+from .models import DigestCursor, MessageDigest
+
+
+class DigestTemplateTests(SimpleTestCase):
+    def test_plain_text_digest_is_not_html_escaped(self):
+        body = render_to_string("notifications/message_digest.txt", {
+            "user": User(username="o'brien"),
+            "message_count": 1,
+            "conversations": [{
+                "sender": User(username="tom&jerry"),
+                "product": None,
+                "count": 1,
+                "latest": 'Is it "new" & <boxed>?',
+                "url": "https://example.com/chat/?a=1&b=2",
+            }],
+        })
+        self.assertIn("Hi o'brien,", body)
+        self.assertIn('- tom&jerry (1): "Is it "new" & <boxed>?"', body)
+        self.assertIn("https://example.com/chat/?a=1&b=2", body)
+        self.assertTrue(body.startswith("Hi "))
+
+
+class DigestTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user("buyer", email="buyer@example.com", password="pw")
+        self.seller = User.objects.create_user("seller", email="seller@example.com", password="pw")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            category=category, seller=Seller.objects.create(user=self.seller, business_name="Phones Ltd"),
+            name="Phone", description="", base_price=Decimal("100"), approved=True,
+        )
+        # messages are only digested once they are MESSAGE_DIGEST_DELAY_MINUTES old
+        self.now = timezone.now() + timedelta(minutes=settings.MESSAGE_DIGEST_DELAY_MINUTES + 1)
+        self.interval = timedelta(minutes=settings.MESSAGE_DIGEST_MIN_INTERVAL_MINUTES)
+
+    def message(self, content="still available?"):
+        return ProductMessage.objects.create(
+            sender=self.buyer, receiver=self.seller, product=self.product, content=content
+        )
+
+    def test_claim_advances_the_cursor_past_its_messages(self):
+        first = self.message()
+        session = ChatSession.objects.create(user=self.buyer, product=self.product)
+        chat = SessionMessage.objects.create(session=session, sender=self.buyer, content="hello?")
+
+        digest = claim_digest(self.seller, self.now)
+        self.assertEqual((digest.message_count, digest.conversation_count, digest.status), (2, 2, "pending"))
+        cursor = DigestCursor.objects.get(user=self.seller)
+        self.assertEqual((cursor.product_message_id, cursor.session_message_id), (first.id, chat.id))
+
+        later = self.now + self.interval
+        self.assertIsNone(claim_digest(self.seller, later))
+        second = self.message("and the charger?")
+        digest = claim_digest(self.seller, later + timedelta(minutes=settings.MESSAGE_DIGEST_DELAY_MINUTES + 1))
+        self.assertEqual(digest.message_count, 1)
+        self.assertIn("and the charger?", digest.body)
+        self.assertEqual(DigestCursor.objects.get(user=self.seller).product_message_id, second.id)
+
+    def test_recent_messages_wait_for_live_chat(self):
+        self.message()
+        self.assertIsNone(claim_digest(self.seller, timezone.now()))
+        self.assertFalse(MessageDigest.objects.exists())
+
+    def test_users_are_throttled_between_digests(self):
+        self.message()
+        self.assertEqual(len(claim_digests(self.now)), 1)
+        self.message("hello again")
+        soon = self.now + self.interval / 2
+        self.assertEqual(claim_digests(soon), [])
+        self.assertIsNone(claim_digest(self.seller, soon))
+        self.assertEqual([d.user for d in claim_digests(self.now + self.interval * 2)], [self.seller])
+
+    def test_failed_and_stale_pending_digests_are_retried(self):
+        def digest(**fields):
+            return MessageDigest.objects.create(user=self.seller, subject="s", body="b", **fields)
+
+        failed = digest(status="failed", attempts=1)
+        stale = digest()
+        digest()  # pending, its run may still be sending it
+        digest(status="failed", attempts=settings.MESSAGE_DIGEST_MAX_ATTEMPTS)
+        digest(status="sent", attempts=1)
+        MessageDigest.objects.filter(id__in=[failed.id, stale.id]).update(
+            created_at=timezone.now() - timedelta(minutes=STALE_PENDING_MINUTES + 1)
+        )
+        self.assertEqual({d.id for d in retryable_digests()}, {failed.id, stale.id})
+
+    def test_one_smtp_failure_does_not_stop_the_rest(self):
+        self.message()
+        ProductMessage.objects.create(sender=self.seller, receiver=self.buyer, product=self.product, content="yes")
+        digests = claim_digests(self.now)
+        send = EmailBackend.send_messages
+
+        def refuse_the_seller(backend, messages):
+            if messages[0].to == [self.seller.email]:
+                raise SMTPRecipientsRefused({self.seller.email: (550, b"mailbox unavailable")})
+            return send(backend, messages)
+
+        with mock.patch.object(EmailBackend, "send_messages", refuse_the_seller), \
+                self.assertLogs("notifications.digests", "ERROR"):
+            self.assertEqual(send_digests(digests), (1, 1))
+        self.assertEqual([m.to for m in mail.outbox], [[self.buyer.email]])
+        statuses = {d.user_id: (d.status, d.attempts, d.sent_at is not None) for d in MessageDigest.objects.all()}
+        self.assertEqual(statuses, {self.buyer.id: ("sent", 1, True), self.seller.id: ("failed", 1, False)})
+
+        self.assertEqual(send_digests(retryable_digests()), (1, 0))
+        self.assertEqual(mail.outbox[-1].to, [self.seller.email])
+        self.assertEqual(MessageDigest.objects.get(user=self.seller).attempts, 2)
+
+    @override_settings(MESSAGE_DIGEST_DELAY_MINUTES=0)
+    def test_command_sends_one_digest_per_user(self):
+        self.message()
+        self.message("and the charger?")
+        call_command("send_message_digests", stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "You have 2 unread messages on WaziTrade")
+        call_command("send_message_digests", stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,219 @@
+# payments/loadtest.py
+"""
+Concurrent checkout load harness.
+
+Each virtual user runs cart_add -> checkout -> payment -> callback against the
+local DPO simulator, through the Django test client, and we record per-step
+latency, DB queries per flow and any orders/payments created more than once.
+"""
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from cart.models import Order as CartOrder
+from core.models import Category, Order as CoreOrder, Product, Seller
+
+from .models import Payment
+
+FLOWS = ("cart", "payments")
+STEPS = ("cart_add", "checkout", "payment", "callback")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; 0 for an empty list."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 2) if values else 0,
+        "p50": round(percentile(values, 50), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values), 2) if values else 0,
+    }
+
+
+def seed_fixtures(users, prefix="loadtest"):
+    """A seller, one product and `users` buyers for the run."""
+    seller_user, _ = User.objects.get_or_create(username=f"{prefix}-seller")
+    seller, _ = Seller.objects.get_or_create(
+        user=seller_user, defaults={"business_name": "Load Test Seller", "approved": True}
+    )
+    category, _ = Category.objects.get_or_create(slug=f"{prefix}-category", defaults={"name": "Load Test"})
+    product, _ = Product.objects.get_or_create(
+        name=f"{prefix} product",
+        seller=seller,
+        category=category,
+        defaults={"description": "load test", "base_price": 10000, "approved": True},
+    )
+
+    buyers = []
+    for i in range(users):
+        buyer, _ = User.objects.get_or_create(
+            username=f"{prefix}-buyer-{i}", defaults={"email": f"{prefix}-buyer-{i}@example.com"}
+        )
+        buyers.append(buyer)
+    return product, buyers
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class LoadHarness:
+    def __init__(self, flow="cart", users=10, iterations=5, callback_repeats=1):
+        if flow not in FLOWS:
+            raise ValueError(f"flow must be one of {FLOWS}")
+        self.flow = flow
+        self.users = users
+        self.iterations = iterations
+        self.callback_repeats = callback_repeats
+
+        self._lock = threading.Lock()
+        self.step_latency = {step: [] for step in STEPS}
+        self.flow_latency = []
+        self.flow_queries = []
+        self.status_codes = {step: {} for step in STEPS}
+        self.completed = 0
+        self.failed = 0
+        self.errors = {}
+        self.duplicate_orders = 0
+        self.duplicate_payments = 0
+
+    # ---------- one flow ----------
+    def _owned(self, user):
+        orders = CartOrder.objects.filter(user=user).count() + CoreOrder.objects.filter(user=user).count()
+        return orders, Payment.objects.filter(user=user).count()
+
+    def _step(self, timings, codes, step, func):
+        started = time.perf_counter()
+        response = func()
+        timings[step] = (time.perf_counter() - started) * 1000
+        codes.append((step, response.status_code))
+        return response
+
+    def _follow_to_site(self, client, location):
+        """Replay a redirect that points back at the site through the test client."""
+        url = urlparse(location)
+        return client.get(url.path, dict(parse_qsl(url.query)))
+
+    def _run_flow(self, client, product):
+        timings, codes = {}, []
+
+        self._step(timings, codes, "cart_add", lambda: client.get(reverse("cart:cart_add", args=[product.id])))
+
+        if self.flow == "cart":
+            checkout = lambda: client.get(reverse("cart:dpo_pay"))
+        else:
+            checkout = lambda: client.post(reverse("payments:dpo_payment", args=[product.id]), {"quantity": 1})
+        response = self._step(timings, codes, "checkout", checkout)
+
+        location = response.get("Location", "") if response.status_code in (301, 302) else ""
+        if not location.startswith("http"):
+            # the view bailed out before reaching the gateway
+            return timings, codes
+
+        # the customer pays on the gateway's hosted page and is redirected back
+        gateway = self._step(
+            timings, codes, "payment", lambda: requests.get(location, allow_redirects=False, timeout=30)
+        )
+        if gateway.status_code != 302:
+            return timings, codes
+
+        for _ in range(self.callback_repeats):
+            self._step(timings, codes, "callback", lambda: self._follow_to_site(client, gateway.headers["Location"]))
+
+        return timings, codes
+
+    def _run_user(self, user, product):
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+
+        try:
+            for _ in range(self.iterations):
+                before = self._owned(user)
+                counter = QueryCounter()
+                started = time.perf_counter()
+                error = None
+                try:
+                    with connection.execute_wrapper(counter):
+                        timings, codes = self._run_flow(client, product)
+                except Exception as exc:  # record and keep going, like a real client would
+                    timings, codes, error = {}, [], f"{type(exc).__name__}: {exc}"
+                elapsed = (time.perf_counter() - started) * 1000
+                after = self._owned(user)
+
+                self._record(timings, codes, elapsed, counter.count, error, before, after)
+        finally:
+            connection.close()
+
+    def _record(self, timings, codes, elapsed, queries, error, before, after):
+        ok = error is None and len({step for step, _ in codes}) == len(STEPS) and all(
+            status < 400 for _, status in codes
+        )
+        with self._lock:
+            for step, ms in timings.items():
+                self.step_latency[step].append(ms)
+            for step, status in codes:
+                bucket = self.status_codes[step]
+                bucket[str(status)] = bucket.get(str(status), 0) + 1
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+            self.flow_latency.append(elapsed)
+            self.flow_queries.append(queries)
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self.duplicate_orders += max(0, after[0] - before[0] - 1)
+            self.duplicate_payments += max(0, after[1] - before[1] - 1)
+
+    # ---------- whole run ----------
+    def run(self):
+        product, buyers = seed_fixtures(self.users)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.users) as pool:
+            for future in [pool.submit(self._run_user, buyer, product) for buyer in buyers]:
+                future.result()
+        duration = time.perf_counter() - started
+
+        flows = self.completed + self.failed
+        return {
+            "flow": self.flow,
+            "users": self.users,
+            "iterations": self.iterations,
+            "callback_repeats": self.callback_repeats,
+            "duration_s": round(duration, 3),
+            "flows": flows,
+            "completed": self.completed,
+            "failed": self.failed,
+            "throughput_per_s": round(flows / duration, 2) if duration else 0,
+            "latency_ms": {
+                "flow": summarize(self.flow_latency),
+                **{step: summarize(values) for step, values in self.step_latency.items()},
+            },
+            "queries_per_flow": summarize(self.flow_queries),
+            "status_codes": self.status_codes,
+            "errors": self.errors,
+            "duplicate_orders": self.duplicate_orders,
+            "duplicate_payments": self.duplicate_payments,
+        }
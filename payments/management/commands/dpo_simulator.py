@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from payments.simulator import DPOSimulator, gateway_settings, make_server
+
+
+class Command(BaseCommand):
+    help = "Run a local DPO gateway simulator (createToken, checkout, verify) for load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8050)
+        parser.add_argument("--latency-ms", type=float, default=0, help="Mean added latency per call.")
+        parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform +/- jitter on the latency.")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of API calls that error (0-1).")
+        parser.add_argument("--decline-rate", type=float, default=0.0, help="Fraction of payments declined (0-1).")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        simulator = DPOSimulator(
+            latency_ms=options["latency_ms"],
+            jitter_ms=options["jitter_ms"],
+            failure_rate=options["failure_rate"],
+            decline_rate=options["decline_rate"],
+            seed=options["seed"],
+        )
+        server = make_server(simulator, options["host"], options["port"])
+        base_url = f"http://{options['host']}:{server.server_address[1]}"
+
+        self.stdout.write(self.style.SUCCESS(f"DPO simulator listening on {base_url}"))
+        self.stdout.write("Point the site at it with:")
+        for name, value in gateway_settings(base_url).items():
+            self.stdout.write(f"  export {name}={value}")
+        self.stdout.write(f"Gateway stats: {base_url}/stats")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
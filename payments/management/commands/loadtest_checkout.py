@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from payments.loadtest import FLOWS, LoadHarness
+from payments.simulator import DPOSimulator, gateway_settings, start_in_thread
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive cart_add -> checkout -> payment -> callback concurrently against the "
+        "local DPO simulator and report throughput, latency, query counts and duplicates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--flow", choices=FLOWS, default="cart",
+                            help="cart: cart.views DPOGateway flow, payments: payments.views JSON flow.")
+        parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users.")
+        parser.add_argument("--iterations", type=int, default=5, help="Checkouts per user.")
+        parser.add_argument("--callback-repeats", type=int, default=1,
+                            help="Hit the payment callback this many times per checkout (refresh/replay).")
+        parser.add_argument("--latency-ms", type=float, default=50)
+        parser.add_argument("--jitter-ms", type=float, default=20)
+        parser.add_argument("--failure-rate", type=float, default=0.0)
+        parser.add_argument("--decline-rate", type=float, default=0.0)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--gateway-url", help="Use an already running simulator instead of starting one.")
+        parser.add_argument("--use-current-db", action="store_true",
+                            help="Run against the configured database instead of a throwaway test database.")
+        parser.add_argument("--json", dest="json_path", help="Also write the report to this file.")
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["iterations"] < 1:
+            raise CommandError("--users and --iterations must be at least 1")
+
+        simulator = server = None
+        base_url = options["gateway_url"]
+        if not base_url:
+            simulator = DPOSimulator(
+                latency_ms=options["latency_ms"],
+                jitter_ms=options["jitter_ms"],
+                failure_rate=options["failure_rate"],
+                decline_rate=options["decline_rate"],
+                seed=options["seed"],
+            )
+            server, base_url = start_in_thread(simulator)
+
+        setup_test_environment()  # locmem email, testserver host
+        old_name = None
+        if not options["use_current_db"]:
+            if connection.vendor == "sqlite":
+                # a file database so worker threads get real concurrent connections
+                fd, path = tempfile.mkstemp(suffix=".sqlite3", prefix="loadtest-")
+                os.close(fd)
+                connection.settings_dict["TEST"]["NAME"] = path
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            with override_settings(**gateway_settings(base_url)):
+                report = LoadHarness(
+                    flow=options["flow"],
+                    users=options["users"],
+                    iterations=options["iterations"],
+                    callback_repeats=options["callback_repeats"],
+                ).run()
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if server:
+                server.shutdown()
+
+        if simulator:
+            report["gateway"] = simulator.stats()
+
+        self._print(report)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['json_path']}")
+
+    def _print(self, report):
+        self.stdout.write(
+            f"{report['flow']} flow: {report['flows']} checkouts by {report['users']} users "
+            f"in {report['duration_s']}s ({report['throughput_per_s']}/s), "
+            f"{report['completed']} completed, {report['failed']} failed"
+        )
+        for name, stats in report["latency_ms"].items():
+            self.stdout.write(f"  {name:<10} p50 {stats['p50']:>8} ms   p99 {stats['p99']:>8} ms   n={stats['count']}")
+        queries = report["queries_per_flow"]
+        self.stdout.write(f"  queries/flow mean {queries['mean']}  p99 {queries['p99']}  max {queries['max']}")
+        self.stdout.write(f"  status codes: {report['status_codes']}")
+        if report["errors"]:
+            self.stdout.write(self.style.WARNING(f"  errors: {report['errors']}"))
+
+        duplicates = f"duplicate orders: {report['duplicate_orders']}, duplicate payments: {report['duplicate_payments']}"
+        if report["duplicate_orders"] or report["duplicate_payments"]:
+            self.stdout.write(self.style.ERROR(f"  {duplicates}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"  {duplicates}"))
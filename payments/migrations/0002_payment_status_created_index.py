@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:55
+
+from django.db import migrations, models
+
+from core.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False  # CREATE INDEX CONCURRENTLY on PostgreSQL
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created_at'], name='payment_status_created'),
+        ),
+    ]
@@ -17,5 +17,8 @@ class Payment(models.Model):
     reference = models.CharField(max_length=100, unique=True, default='temp-ref')  # Add this!
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'], name='payment_status_created')]
+
     def __str__(self):
         return f"Payment #{self.id} ({self.status})"
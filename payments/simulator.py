@@ -0,0 +1,252 @@
+# payments/simulator.py
+"""
+Local stand-in for the DPO gateway, for load tests and offline development.
+
+It speaks both APIs the site uses:
+  - the XML API3G endpoint used by django_dpo.DPOGateway (cart.views):
+    createToken / verifyToken / cancelToken, plus the ``?ID=<token>`` payment page
+  - the JSON API used by payments.views: POST checkout, GET verify/<reference>
+
+Point DPO_END_POINT, DPO_PAYMENT_URL and DPO_VERIFY_URL at a running simulator
+(see the ``dpo_simulator`` management command).
+"""
+import json
+import random
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+class DPOSimulator:
+    """In-memory gateway state plus the knobs that shape its behaviour."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, failure_rate=0.0, decline_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate    # gateway errors (HTTP 500 / Result 999)
+        self.decline_rate = decline_rate    # customer payments that do not go through
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.transactions = {}
+        self.calls = {}
+
+    # ---------- behaviour ----------
+    def delay(self):
+        if not (self.latency_ms or self.jitter_ms):
+            return
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    # ---------- transactions ----------
+    def create(self, reference, amount, redirect_url, kind):
+        token = uuid.uuid4().hex.upper()
+        with self._lock:
+            self.transactions[token] = {
+                "reference": reference,
+                "amount": amount,
+                "redirect_url": redirect_url,
+                "kind": kind,
+                "status": "PENDING",
+            }
+        return token
+
+    def find(self, token_or_reference):
+        with self._lock:
+            if token_or_reference in self.transactions:
+                return token_or_reference, self.transactions[token_or_reference]
+            for token, txn in self.transactions.items():
+                if txn["reference"] == token_or_reference:
+                    return token, txn
+        return None, None
+
+    def pay(self, token):
+        """The customer completes (or abandons) the hosted payment page."""
+        token, txn = self.find(token)
+        if txn is None:
+            return None
+        with self._lock:
+            if txn["status"] == "PENDING":
+                declined = self._random.random() < self.decline_rate
+                txn["status"] = "FAILED" if declined else "SUCCESS"
+        return token, txn
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for txn in self.transactions.values():
+                statuses[txn["status"]] = statuses.get(txn["status"], 0) + 1
+            return {"calls": dict(self.calls), "transactions": statuses}
+
+
+def _xml(**fields):
+    body = "".join(f"<{tag}>{value}</{tag}>" for tag, value in fields.items())
+    return f'<?xml version="1.0" encoding="utf-8"?><API3G>{body}</API3G>'
+
+
+def _parse_api3g(raw):
+    """django_dpo sends the XML declaration after leading whitespace, so be lenient."""
+    text = raw.decode("utf-8", "replace").strip()
+    if text.startswith("<?xml"):
+        text = text[text.index("?>") + 2:]
+    root = ET.fromstring(text)
+    return {
+        "request": root.findtext("Request"),
+        "token": root.findtext("TransactionToken"),
+        "amount": root.findtext("Transaction/PaymentAmount"),
+        "reference": root.findtext("Transaction/CompanyRef"),
+        "redirect_url": root.findtext("Transaction/RedirectURL"),
+    }
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    simulator = None  # set by make_server()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status, data):
+        self._send(status, json.dumps(data).encode())
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length)
+
+    def do_POST(self):
+        sim = self.simulator
+        sim.delay()
+        body = self._body()
+
+        if "xml" in (self.headers.get("Content-Type") or ""):
+            return self._api3g(body)
+
+        # JSON checkout (payments.views.dpo_payment)
+        sim.count("json_checkout")
+        if sim.should_fail():
+            return self._json(500, {"error": "simulated gateway failure"})
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return self._json(400, {"error": "invalid json"})
+
+        token = sim.create(
+            reference=payload.get("merchant_reference"),
+            amount=payload.get("amount"),
+            redirect_url=payload.get("site_redirect_url"),
+            kind="json",
+        )
+        host = f"http://{self.headers.get('Host')}"
+        self._json(200, {"payment_url": f"{host}{urlparse(self.path).path}?ID={token}", "token": token})
+
+    def _api3g(self, body):
+        sim = self.simulator
+        try:
+            req = _parse_api3g(body)
+        except ET.ParseError:
+            return self._send(400, _xml(Result="999", ResultExplanation="Malformed XML").encode(), "application/xml")
+
+        sim.count(req["request"] or "unknown")
+        if sim.should_fail():
+            return self._send(200, _xml(Result="999", ResultExplanation="Simulated failure").encode(), "application/xml")
+
+        if req["request"] == "createToken":
+            token = sim.create(req["reference"], req["amount"], req["redirect_url"], kind="xml")
+            reply = _xml(Result="000", ResultExplanation="Transaction created", TransToken=token, TransRef=token[:8])
+        elif req["request"] == "verifyToken":
+            _, txn = sim.find(req["token"] or "")
+            if txn is None:
+                reply = _xml(Result="904", ResultExplanation="No transaction found")
+            else:
+                passed = txn["status"] == "SUCCESS"
+                reply = _xml(
+                    Result="000",
+                    ResultExplanation="Transaction paid" if passed else "Transaction not paid",
+                    TransactionStatus="Passed" if passed else "Failed",
+                    TransactionAmount=txn["amount"],
+                    CompanyRef=txn["reference"],
+                )
+        elif req["request"] == "cancelToken":
+            reply = _xml(Result="000", ResultExplanation="Transaction cancelled")
+        else:
+            reply = _xml(Result="999", ResultExplanation="Unsupported request")
+
+        self._send(200, reply.encode(), "application/xml")
+
+    def do_GET(self):
+        sim = self.simulator
+        sim.delay()
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        # hosted payment page: the customer pays and is sent back to the shop
+        if "ID" in query:
+            sim.count("payment_page")
+            result = sim.pay(query["ID"][0])
+            if result is None:
+                return self._send(404, b"unknown transaction", "text/plain")
+            token, txn = result
+            if txn["kind"] == "json":
+                params = {"merchant_reference": txn["reference"]}
+            else:
+                params = {"TransID": token, "CompanyRef": txn["reference"]}
+            separator = "&" if "?" in (txn["redirect_url"] or "") else "?"
+            return self._send(302, headers={"Location": f"{txn['redirect_url']}{separator}{urlencode(params)}"})
+
+        # JSON verify (payments.views.dpo_callback): .../verify/<reference>
+        if "/verify/" in url.path:
+            sim.count("json_verify")
+            if sim.should_fail():
+                return self._json(500, {"error": "simulated gateway failure"})
+            _, txn = sim.find(url.path.rstrip("/").rsplit("/", 1)[-1])
+            if txn is None:
+                return self._json(404, {"status": "NOT_FOUND"})
+            return self._json(200, {"status": txn["status"], "amount": txn["amount"]})
+
+        if url.path.rstrip("/") == "/stats":
+            return self._json(200, sim.stats())
+
+        self._send(404, b"not found", "text/plain")
+
+
+def make_server(simulator, host="127.0.0.1", port=0):
+    """Build a threaded HTTP server for `simulator`; port 0 picks a free port."""
+    handler = type("BoundSimulatorHandler", (SimulatorHandler,), {"simulator": simulator})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(simulator, host="127.0.0.1", port=0):
+    """Start the simulator in a daemon thread; returns (server, base_url)."""
+    server = make_server(simulator, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def gateway_settings(base_url):
+    """Settings overrides that route every DPO call to a simulator at base_url."""
+    return {
+        "DPO_END_POINT": f"{base_url}/API/v6/",
+        "DPO_PAYMENT_URL": f"{base_url}/v1/checkout",
+        "DPO_VERIFY_URL": f"{base_url}/v1/verify/",
+    }
@@ -3,6 +3,8 @@ from django.urls import reverse
 from django.conf import settings
 import requests
 from django.db import transaction
+from archive.lookups import get_payment
+from core.metrics import checkouts
 from core.models import Product, Order, CartItem
 from .models import Payment
 from django.contrib.auth.decorators import login_required
@@ -27,6 +29,7 @@ def dpo_payment(request, product_id=None):
     else:
         items = CartItem.objects.filter(user=request.user)
         if not items.exists():
+            checkouts.inc(flow="payments", outcome="empty")
             messages.error(request, "Your cart is empty. Please add items before paying.")
             return redirect('cart:cart_detail')
         total_amount = sum(item.total_price for item in items)
@@ -51,6 +54,7 @@ def dpo_payment(request, product_id=None):
                 status='PENDING'
             )
     except Exception as e:
+        checkouts.inc(flow="payments", outcome="order_error")
         messages.error(request, f"Failed to create order/payment: {e}")
         return redirect('cart:cart_detail')
 
@@ -79,20 +83,24 @@ def dpo_payment(request, product_id=None):
         payment_url = data.get('payment_url')
         if payment_url:
             # ✅ Redirect to DPO payment page
+            checkouts.inc(flow="payments", outcome="redirected")
             return redirect(payment_url)
         else:
+            checkouts.inc(flow="payments", outcome="no_payment_link")
             messages.error(request, "Payment gateway did not return a valid payment link.")
             payment.status = 'FAILED'
             payment.save()
             return redirect('cart:order_confirmation', order_id=order.id)
 
     except requests.RequestException as e:
+        checkouts.inc(flow="payments", outcome="gateway_error")
         messages.error(request, f"Network error: {e}")
         payment.status = 'FAILED'
         payment.save()
         return redirect('cart:order_confirmation', order_id=order.id)
 
     except Exception as e:
+        checkouts.inc(flow="payments", outcome="error")
         messages.error(request, f"Unexpected error: {e}")
         payment.status = 'FAILED'
         payment.save()
@@ -108,9 +116,20 @@ def dpo_callback(request):
     merchant_reference = request.GET.get('merchant_reference')
     if not merchant_reference:
         messages.error(request, "Invalid payment callback.")
-        return redirect('core:cart_detail')
+        return redirect('cart:cart_detail')
+
+    payment = get_payment(reference=merchant_reference)
+    if payment is None:
+        messages.error(request, "Payment record not found.")
+        return redirect('cart:cart_detail')
+    if getattr(payment, "is_archived", False):
+        # only settled payments are archived; a replayed callback changes nothing
+        if payment.status == 'SUCCESS':
+            return redirect('cart:order_confirmation', order_id=payment.order_id)
+        messages.error(request, "Payment failed or was cancelled.")
+        return redirect('cart:cart_detail')
 
-    verification_url = f"https://payments.dpo.co.ug/v1/verify/{merchant_reference}"
+    verification_url = f"{settings.DPO_VERIFY_URL}{merchant_reference}"
 
     try:
         resp = requests.get(
@@ -121,24 +140,21 @@ def dpo_callback(request):
         resp.raise_for_status()
         result = resp.json()
     except requests.RequestException:
+        checkouts.inc(flow="payments_callback", outcome="verify_error")
         messages.error(request, "Payment verification failed. Please contact support.")
-        return redirect('core:cart_detail')
-
-    try:
-        payment = Payment.objects.get(reference=merchant_reference)
-    except Payment.DoesNotExist:
-        messages.error(request, "Payment record not found.")
-        return redirect('core:cart_detail')
+        return redirect('cart:cart_detail')
 
     if result.get('status') == 'SUCCESS':
         payment.status = 'SUCCESS'
         payment.save()
         payment.order.paid = True
         payment.order.save()
+        checkouts.inc(flow="payments_callback", outcome="paid")
         messages.success(request, f"Payment successful for Order #{payment.order.id}.")
-        return redirect('core:order_confirmation', order_id=payment.order.id)
+        return redirect('cart:order_confirmation', order_id=payment.order.id)
     else:
         payment.status = 'FAILED'
         payment.save()
+        checkouts.inc(flow="payments_callback", outcome="failed")
         messages.error(request, "Payment failed or was cancelled.")
-        return redirect('core:cart_detail')
+        return redirect('cart:cart_detail')
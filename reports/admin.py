@@ -0,0 +1,56 @@
+from django.contrib import admin
+
+from .models import CategoryDailySales, ProductDailySales, RolledUpOrder, SellerDailySales
+from .rollups import daily_series
+
+
+class DailySalesAdmin(admin.ModelAdmin):
+    """Read-only rollup list with a 30-day revenue chart of the filtered rows."""
+    change_list_template = "admin/reports/sales_change_list.html"
+    date_hierarchy = "date"
+    list_filter = ("date",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context=extra_context)
+        try:
+            queryset = response.context_data["cl"].queryset
+        except (AttributeError, KeyError):
+            # redirects / permission errors have no changelist
+            return response
+
+        response.context_data["sales"] = daily_series(queryset)
+        return response
+
+
+@admin.register(ProductDailySales)
+class ProductDailySalesAdmin(DailySalesAdmin):
+    list_display = ("date", "product", "units", "revenue", "orders")
+    search_fields = ("product__name",)
+    list_select_related = ("product",)
+
+
+@admin.register(SellerDailySales)
+class SellerDailySalesAdmin(DailySalesAdmin):
+    list_display = ("date", "seller", "units", "revenue", "orders")
+    search_fields = ("seller__business_name",)
+    list_select_related = ("seller",)
+
+
+@admin.register(CategoryDailySales)
+class CategoryDailySalesAdmin(DailySalesAdmin):
+    list_display = ("date", "category", "units", "revenue", "orders")
+    search_fields = ("category__name",)
+    list_select_related = ("category",)
+
+
+@admin.register(RolledUpOrder)
+class RolledUpOrderAdmin(admin.ModelAdmin):
+    list_display = ("source", "order_id", "date", "created_at")
+    list_filter = ("source", "date")
+    search_fields = ("order_id",)
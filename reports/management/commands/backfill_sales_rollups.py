@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.rollups import clear_rollups, paid_orders, record_paid_order
+
+
+class Command(BaseCommand):
+    help = "Roll every paid order that has not been counted yet into the daily sales tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="Only consider orders paid on or after this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Wipe all rollups first and recompute them from scratch.",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format")
+
+        if options["rebuild"]:
+            clear_rollups()
+            self.stdout.write("Cleared existing rollups.")
+
+        added = skipped = 0
+        for order in paid_orders(since=since):
+            if record_paid_order(order):
+                added += 1
+            else:
+                skipped += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {added} orders ({skipped} already counted)."
+        ))
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0004_promotion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RolledUpOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('cart', 'cart.Order'), ('core', 'core.Order')], max_length=10)),
+                ('order_id', models.PositiveBigIntegerField()),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source', 'order_id'), name='uniq_rolled_up_order')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='core.category')),
+            ],
+            options={
+                'verbose_name_plural': 'category daily sales',
+                'ordering': ['-date'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('category', 'date'), name='uniq_category_daily_sales')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='core.product')),
+            ],
+            options={
+                'verbose_name_plural': 'product daily sales',
+                'ordering': ['-date'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('product', 'date'), name='uniq_product_daily_sales')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SellerDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='core.seller')),
+            ],
+            options={
+                'verbose_name_plural': 'seller daily sales',
+                'ordering': ['-date'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('seller', 'date'), name='uniq_seller_daily_sales')],
+            },
+        ),
+    ]
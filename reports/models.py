@@ -0,0 +1,76 @@
+from django.db import models
+
+from core.models import Category, Product, Seller
+
+
+# ---------- DAILY SALES ROLLUPS ----------
+class DailySales(models.Model):
+    """Units, revenue and order count for one day, kept up to date as orders are paid."""
+    date = models.DateField(db_index=True)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ["-date"]
+
+
+class ProductDailySales(DailySales):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_sales")
+
+    class Meta(DailySales.Meta):
+        verbose_name_plural = "product daily sales"
+        constraints = [
+            models.UniqueConstraint(fields=["product", "date"], name="uniq_product_daily_sales"),
+        ]
+
+    def __str__(self):
+        return f"{self.product} on {self.date}"
+
+
+class SellerDailySales(DailySales):
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name="daily_sales")
+
+    class Meta(DailySales.Meta):
+        verbose_name_plural = "seller daily sales"
+        constraints = [
+            models.UniqueConstraint(fields=["seller", "date"], name="uniq_seller_daily_sales"),
+        ]
+
+    def __str__(self):
+        return f"{self.seller} on {self.date}"
+
+
+class CategoryDailySales(DailySales):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="daily_sales")
+
+    class Meta(DailySales.Meta):
+        verbose_name_plural = "category daily sales"
+        constraints = [
+            models.UniqueConstraint(fields=["category", "date"], name="uniq_category_daily_sales"),
+        ]
+
+    def __str__(self):
+        return f"{self.category} on {self.date}"
+
+
+class RolledUpOrder(models.Model):
+    """Marks an order as already counted so a paid order is never rolled up twice."""
+    SOURCE_CHOICES = (
+        ("cart", "cart.Order"),
+        ("core", "core.Order"),
+    )
+
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    order_id = models.PositiveBigIntegerField()
+    date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "order_id"], name="uniq_rolled_up_order"),
+        ]
+
+    def __str__(self):
+        return f"{self.source} order #{self.order_id} ({self.date})"
@@ -0,0 +1,31 @@
+# reports/signals.py
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from cart.models import Order as CartOrder
+from core.models import Order as CoreOrder
+
+from .rollups import is_paid, record_paid_order
+
+
+def _roll_up_on_commit(order):
+    # after commit, so items added later in the same transaction are counted;
+    # a failure is logged (robust) and left for backfill_sales_rollups
+    transaction.on_commit(lambda: record_paid_order(order), robust=True)
+
+
+@receiver(post_save, sender=CartOrder)
+@receiver(post_save, sender=CoreOrder)
+def roll_up_paid_order(sender, instance, raw=False, **kwargs):
+    """Fold an order into the daily sales tables the first time it is saved as paid."""
+    if raw or not is_paid(instance):
+        return
+    _roll_up_on_commit(instance)
+
+
+@receiver(m2m_changed, sender=CoreOrder.items.through)
+def roll_up_paid_order_items(sender, instance, action, reverse, **kwargs):
+    """A core.Order marked paid before its items were set is rolled up once they are."""
+    if action == "post_add" and not reverse and is_paid(instance):
+        _roll_up_on_commit(instance)
@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase
+
+from cart.models import Order as CartOrder, OrderItem
+from core.models import CartItem, Category, Order as CoreOrder, Product
+
+from .models import ProductDailySales, RolledUpOrder
+
+
+class PaidOrderRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("buyer")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            category=category, name="Phone", description="", base_price=Decimal("100")
+        )
+
+    def sales(self):
+        return list(ProductDailySales.objects.values_list("units", "revenue", "orders"))
+
+    def test_items_added_after_marking_paid_are_counted(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            order = CartOrder.objects.create(user=self.user, total_price=Decimal("300"), status="paid")
+            OrderItem.objects.create(order=order, product=self.product, quantity=3, price=Decimal("100"))
+        self.assertEqual(self.sales(), [(3, Decimal("300"), 1)])
+
+    def test_core_order_is_counted_once_its_items_are_set(self):
+        item = CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = CoreOrder.objects.create(user=self.user, total_price=Decimal("200"), paid=True)
+        self.assertFalse(RolledUpOrder.objects.exists())  # nothing to count yet
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.items.set([item])
+        self.assertEqual(self.sales(), [(2, Decimal("200"), 1)])
+
+    def test_saving_a_paid_order_again_counts_it_once(self):
+        order = CartOrder.objects.create(user=self.user, total_price=Decimal("100"))
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, price=Decimal("100"))
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = "paid"
+            order.save()
+            order.status = "shipped"
+            order.save()
+        self.assertEqual(self.sales(), [(1, Decimal("100"), 1)])
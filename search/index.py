@@ -0,0 +1,280 @@
+# search/index.py
+"""
+Full-text index over product messages (core.Message) and chat session
+messages (chat.Message).
+
+Both kinds live in one ``message_search`` table that is written when a message
+is inserted: an FTS5 virtual table on SQLite, a generated tsvector column with
+a GIN index on Postgres. Each row carries the ids of the users allowed to see
+it, so searches are scoped to one user inside the index instead of being
+filtered afterwards. Archiving a message leaves its row alone, which keeps old
+conversations findable; deleting one removes its row (search.signals).
+
+rebuild() recreates the whole index from the hot and archived messages. The
+0002 migration runs it once for the messages sent before search existed;
+`manage.py rebuild_message_search` runs it again to repair the index.
+"""
+import re
+from collections import namedtuple
+
+from django.apps import apps as global_apps
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from chat.models import ChatSession
+from core.messaging import conversation_sides
+from core.models import Product
+
+TABLE = "message_search"
+
+PRODUCT = "product"
+SESSION = "session"
+
+# snippet highlight markers; swapped for <mark> after the text is escaped
+MARK_START, MARK_END = "\x02", "\x03"
+
+# rows fetched per conversation hit asked for, before grouping
+CANDIDATES_PER_HIT = 10
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+Entry = namedtuple("Entry", "kind message_id conversation users sender_id sent_at body")
+
+
+def supported():
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+# ---------- ENTRIES ----------
+def product_entry(msg, seller_user_id):
+    """Index entry for a core.Message (or its archived copy)."""
+    buyer_id, seller_id = conversation_sides(seller_user_id, msg.sender_id, msg.receiver_id)
+    return Entry(
+        PRODUCT, msg.id, f"{PRODUCT}:{msg.product_id or 0}:{buyer_id}:{seller_id}",
+        {msg.sender_id, msg.receiver_id}, msg.sender_id, msg.timestamp, msg.content,
+    )
+
+
+def session_entry(msg, participants):
+    """Index entry for a chat.Message (or its archived copy)."""
+    return Entry(
+        SESSION, msg.id, f"{SESSION}:{msg.session_id}",
+        set(participants) | {msg.sender_id}, msg.sender_id, msg.timestamp, msg.content,
+    )
+
+
+def add(entries):
+    entries = list(entries)
+    if not entries or not supported():
+        return
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (body, users, kind, message_id, conversation, sender_id, sent_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                [
+                    (e.body, " ".join(f"u{uid}" for uid in sorted(e.users)), e.kind, e.message_id,
+                     e.conversation, e.sender_id, e.sent_at.isoformat())
+                    for e in entries
+                ],
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (kind, message_id, conversation, users, sender_id, sent_at, body) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s) ON CONFLICT (kind, message_id) DO NOTHING",
+                [
+                    (e.kind, e.message_id, e.conversation, sorted(e.users), e.sender_id, e.sent_at, e.body)
+                    for e in entries
+                ],
+            )
+
+
+def remove(kind, message_ids):
+    message_ids = list(message_ids)
+    if not message_ids or not supported():
+        return
+
+    with connection.cursor() as cursor:
+        placeholders = ", ".join(["%s"] * len(message_ids))
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE kind = %s AND message_id IN ({placeholders})", [kind, *message_ids]
+        )
+
+
+def clear():
+    if supported():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+
+
+def _add_all(model, batch_size, to_entry):
+    count = 0
+    batch = []
+    for msg in model.objects.order_by("pk").iterator(chunk_size=batch_size):
+        batch.append(to_entry(msg))
+        if len(batch) >= batch_size:
+            add(batch)
+            count += len(batch)
+            batch = []
+    add(batch)
+    return count + len(batch)
+
+
+def rebuild(batch_size=1000, apps=global_apps):
+    """
+    Replace the index with entries for every hot and archived message; returns
+    how many were indexed. `apps` is a migration's historical app registry when
+    run from one.
+    """
+    if not supported():
+        return 0
+
+    seller_of = dict(apps.get_model("core", "Product").objects.values_list("id", "seller__user_id"))
+    participants = {
+        session_id: [uid for uid in (user_id, seller_user_id) if uid]
+        for session_id, user_id, seller_user_id in apps.get_model("chat", "ChatSession").objects.values_list(
+            "id", "user_id", "product__seller__user_id"
+        )
+    }
+
+    # one transaction, so searches never see a half-built index
+    with transaction.atomic():
+        clear()
+        total = 0
+        for model in (apps.get_model("core", "Message"), apps.get_model("archive", "ArchivedCoreMessage")):
+            total += _add_all(model, batch_size, lambda msg: product_entry(msg, seller_of.get(msg.product_id)))
+        for model in (apps.get_model("chat", "Message"), apps.get_model("archive", "ArchivedChatMessage")):
+            total += _add_all(
+                model, batch_size, lambda msg: session_entry(msg, participants.get(msg.session_id, []))
+            )
+    return total
+
+
+# ---------- QUERIES ----------
+def _terms(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+def _fts5_match(terms, user_id=None):
+    # every term as a quoted prefix, so user input is never parsed as FTS5 syntax
+    match = "body : (" + " ".join(f'"{term}"*' for term in terms) + ")"
+    if user_id is not None:
+        match = f"users : u{user_id} AND {match}"
+    return match
+
+
+def _tsquery(terms):
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _raw_hits(user_id, terms, limit):
+    """(kind, message_id, conversation, sender_id, sent_at, snippet, rank), best first."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"SELECT kind, message_id, conversation, sender_id, sent_at, "
+                f"snippet({TABLE}, 0, %s, %s, '…', 12), bm25({TABLE}, 1.0, 0.0) AS rank "
+                f"FROM {TABLE} WHERE {TABLE} MATCH %s ORDER BY rank LIMIT %s",
+                [MARK_START, MARK_END, _fts5_match(terms, user_id), limit],
+            )
+        else:
+            cursor.execute(
+                f"SELECT kind, message_id, conversation, sender_id, sent_at, "
+                f"ts_headline('english', body, q, %s), ts_rank(document, q) AS rank "
+                f"FROM {TABLE}, to_tsquery('english', %s) q "
+                f"WHERE users @> ARRAY[%s]::integer[] AND document @@ q "
+                f"ORDER BY rank DESC LIMIT %s",
+                [
+                    f'StartSel="{MARK_START}", StopSel="{MARK_END}", MinWords=8, MaxWords=24',
+                    _tsquery(terms), user_id, limit,
+                ],
+            )
+        return cursor.fetchall()
+
+
+def highlight(snippet):
+    """Escape a raw snippet and turn the match markers into <mark> tags."""
+    return mark_safe(escape(snippet).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>"))
+
+
+def search_conversations(user, query, limit=20):
+    """
+    The user's conversations whose messages match `query`, best match first.
+
+    Each hit is a dict describing the conversation and its best matching
+    message, with a highlighted snippet and the number of matching messages.
+    """
+    terms = _terms(query)
+    if not terms or not supported():
+        return []
+
+    hits = {}
+    for kind, message_id, conversation, sender_id, sent_at, snippet, _ in _raw_hits(
+        user.id, terms, limit * CANDIDATES_PER_HIT
+    ):
+        if conversation in hits:
+            hits[conversation]["matches"] += 1
+            continue
+        if isinstance(sent_at, str):
+            sent_at = parse_datetime(sent_at)
+        hit = {
+            "kind": kind,
+            "conversation": conversation,
+            "message_id": int(message_id),
+            "sender_id": int(sender_id),
+            "sent_at": sent_at,
+            "snippet": highlight(snippet),
+            "matches": 1,
+        }
+        if kind == PRODUCT:
+            product_id, buyer_id, seller_id = (int(part) for part in conversation.split(":")[1:])
+            hit["product_id"] = product_id or None
+            hit["other_user_id"] = seller_id if buyer_id == user.id else buyer_id
+        else:
+            hit["session_id"] = int(conversation.split(":")[1])
+        hits[conversation] = hit
+
+    hits = list(hits.values())[:limit]
+    _attach_objects(hits)
+    return hits
+
+
+def _attach_objects(hits):
+    """Fill in the other user, product and session of each hit, one query per model."""
+    users = User.objects.in_bulk({h["other_user_id"] for h in hits if h["kind"] == PRODUCT})
+    products = Product.objects.in_bulk({h["product_id"] for h in hits if h.get("product_id")})
+    sessions = ChatSession.objects.select_related("product").in_bulk(
+        {h["session_id"] for h in hits if h["kind"] == SESSION}
+    )
+    for hit in hits:
+        if hit["kind"] == PRODUCT:
+            hit["other_user"] = users.get(hit["other_user_id"])
+            hit["product"] = products.get(hit["product_id"])
+        else:
+            hit["session"] = sessions.get(hit["session_id"])
+            hit["product"] = hit["session"].product if hit["session"] else None
+
+
+def message_ids(kind, query, limit=1000):
+    """Ids of messages of one kind matching `query`, for any user (admin search)."""
+    terms = _terms(query)
+    if not terms or not supported():
+        return []
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"SELECT message_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s LIMIT %s",
+                [_fts5_match(terms), kind, limit],
+            )
+        else:
+            cursor.execute(
+                f"SELECT message_id FROM {TABLE} "
+                f"WHERE document @@ to_tsquery('english', %s) AND kind = %s LIMIT %s",
+                [_tsquery(terms), kind, limit],
+            )
+        return [int(row[0]) for row in cursor.fetchall()]
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from search import index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the message search index from hot and archived messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not index.supported():
+            self.stdout.write(self.style.WARNING("Message search is not available on this database."))
+            return
+
+        total = index.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} messages."))
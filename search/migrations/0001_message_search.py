@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# The index is a plain table outside the ORM: its shape depends on the database.
+SQLITE = [
+    """
+    CREATE VIRTUAL TABLE message_search USING fts5(
+        body, users,
+        kind UNINDEXED, message_id UNINDEXED, conversation UNINDEXED,
+        sender_id UNINDEXED, sent_at UNINDEXED,
+        tokenize = 'porter unicode61'
+    )
+    """,
+]
+
+POSTGRES = [
+    """
+    CREATE TABLE message_search (
+        kind varchar(10) NOT NULL,
+        message_id bigint NOT NULL,
+        conversation varchar(64) NOT NULL,
+        users integer[] NOT NULL,
+        sender_id integer NOT NULL,
+        sent_at timestamp with time zone NOT NULL,
+        body text NOT NULL,
+        document tsvector GENERATED ALWAYS AS (to_tsvector('english', body)) STORED,
+        PRIMARY KEY (kind, message_id)
+    )
+    """,
+    "CREATE INDEX message_search_document ON message_search USING GIN (document)",
+    "CREATE INDEX message_search_users ON message_search USING GIN (users)",
+]
+
+
+def create_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE, 'postgresql': POSTGRES}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS message_search")
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def backfill_message_search(apps, schema_editor):
+    """Index the messages sent before the search index existed (and drop anything half-indexed)."""
+    from search.index import rebuild
+
+    rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_message_search'),
+        ('archive', '0001_initial'),
+        ('chat', '0002_chatsession_unique'),
+        ('core', '0011_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_message_search, migrations.RunPython.noop),
+    ]
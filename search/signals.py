@@ -0,0 +1,37 @@
+# search/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from archive.tiering import archiving
+from chat.models import Message as SessionMessage
+from chat.realtime import session_participants
+from core.models import Message as ProductMessage
+
+from . import index
+
+
+@receiver(post_save, sender=ProductMessage)
+def index_product_message(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        product = instance.product
+        seller_user_id = product.seller.user_id if product is not None and product.seller_id else None
+        index.add([index.product_entry(instance, seller_user_id)])
+
+
+@receiver(post_save, sender=SessionMessage)
+def index_session_message(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        index.add([index.session_entry(instance, session_participants(instance.session))])
+
+
+# archiving deletes the hot rows too, but archived messages stay searchable
+@receiver(post_delete, sender=ProductMessage)
+def unindex_product_message(sender, instance, **kwargs):
+    if not archiving.get():
+        index.remove(index.PRODUCT, [instance.pk])
+
+
+@receiver(post_delete, sender=SessionMessage)
+def unindex_session_message(sender, instance, **kwargs):
+    if not archiving.get():
+        index.remove(index.SESSION, [instance.pk])
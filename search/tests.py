@@ -0,0 +1,48 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from archive.tiering import archive_table, get_tier
+from core.models import Category, Message, Product
+
+from . import index
+
+
+class MessageIndexTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user("buyer")
+        self.seller = User.objects.create_user("seller")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            category=category, name="Phone", description="", base_price=Decimal("100")
+        )
+
+    def send(self, content, read=False):
+        return Message.objects.create(
+            sender=self.buyer, receiver=self.seller, product=self.product, content=content, read=read
+        )
+
+    def test_sent_message_is_searchable(self):
+        msg = self.send("is the charger included")
+        self.assertEqual(index.message_ids(index.PRODUCT, "charger"), [msg.id])
+        self.assertEqual(len(index.search_conversations(self.seller, "charger")), 1)
+
+    def test_deleted_message_leaves_the_index(self):
+        msg = self.send("is the charger included")
+        msg.delete()
+        self.assertEqual(index.message_ids(index.PRODUCT, "charger"), [])
+
+    def test_archived_message_stays_searchable(self):
+        msg = self.send("is the charger included", read=True)
+        archive_table(get_tier(Message._meta.db_table), cutoff=timezone.now() + timedelta(seconds=1))
+        self.assertFalse(Message.objects.filter(id=msg.id).exists())
+        self.assertEqual(index.message_ids(index.PRODUCT, "charger"), [msg.id])
+
+    def test_rebuild_indexes_every_message(self):
+        self.send("is the charger included")
+        index.clear()
+        self.assertEqual(index.rebuild(), 1)
+        self.assertEqual(len(index.message_ids(index.PRODUCT, "charger")), 1)
@@ -0,0 +1,34 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from .index import PRODUCT, search_conversations
+
+
+# ---------- MESSAGE SEARCH ----------
+@login_required
+def message_search(request):
+    """The signed-in user's conversations matching ?q=, best first, as JSON."""
+    query = request.GET.get("q", "").strip()
+    hits = search_conversations(request.user, query) if query else []
+
+    results = []
+    for hit in hits:
+        product = hit["product"]
+        result = {
+            "kind": hit["kind"],
+            "message_id": hit["message_id"],
+            "sender_id": hit["sender_id"],
+            "sent_at": hit["sent_at"].strftime("%Y-%m-%d %H:%M:%S") if hit["sent_at"] else None,
+            "snippet": str(hit["snippet"]),
+            "matches": hit["matches"],
+            "product_id": product.id if product else None,
+            "product": product.name if product else None,
+        }
+        if hit["kind"] == PRODUCT:
+            result["other_user_id"] = hit["other_user_id"]
+            result["other_user"] = hit["other_user"].username if hit["other_user"] else None
+        else:
+            result["session_id"] = hit["session_id"]
+        results.append(result)
+
+    return JsonResponse({"query": query, "results": results})